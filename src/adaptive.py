@@ -0,0 +1,265 @@
+"""
+Adaptive sampling of smooth fields on a pixel grid
+
+A field is evaluated on a coarse lattice first. Every lattice cell is checked
+at its edge midpoints and center: where bilinear interpolation of the corners
+is within `tolerance` of the true values the cell is done, otherwise it is
+split in four and checked again at half the step. Done cells are filled
+bilinearly, so most pixels are never evaluated where the field is smooth.
+
+Cells on the last rows and columns are cut to the grid, and a grid one pixel
+high or wide has flat cells refined along the other axis only, so no point
+outside the grid is evaluated and none twice.
+
+`progressive` yields a filled preview after every level, `adaptive` only the
+final field
+"""
+
+from types import SimpleNamespace
+from typing import Any, Callable, Iterator, NamedTuple
+
+import numpy as np
+
+# Evaluates the field at arrays of row and column indices of the grid
+FieldFunction = Callable[[np.ndarray, np.ndarray], Any]
+
+# (row, column) of the points checked in a cell: 0 is its first row or column,
+# 1 the middle one and 2 the last
+MIDPOINTS = np.array([(1, 0), (0, 1), (1, 1), (2, 1), (1, 2)])
+
+
+class Sampled(SimpleNamespace):
+    """
+    `values` of the grid, `evaluations` of the field so far and the lattice
+    `step` of the cells still being refined (1 once sampling is done)
+    """
+
+    values: np.ndarray
+    evaluations: int
+    step: int
+
+
+class Cells(NamedTuple):
+    """
+    Cells from (`rows`, `cols`) to (`rows + heights`, `cols + widths`), corners
+    included. A height or width of 0 is a cell one pixel high or wide
+    """
+
+    rows: np.ndarray
+    cols: np.ndarray
+    heights: np.ndarray
+    widths: np.ndarray
+
+    def select(self, index: np.ndarray) -> "Cells":
+        return Cells(*(a[index] for a in self))
+
+
+def fraction(offsets: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+    """
+    `offsets / sizes`, 0 across cells of size 0
+    """
+    return np.divide(
+        offsets,
+        sizes,
+        out=np.zeros(np.broadcast(offsets, sizes).shape),
+        where=sizes > 0,
+    )
+
+
+def bilinear(corners: list[np.ndarray], ty: np.ndarray, tx: np.ndarray) -> np.ndarray:
+    v00, v01, v10, v11 = corners
+    return (v00 * (1 - tx) + v01 * tx) * (1 - ty) + (v10 * (1 - tx) + v11 * tx) * ty
+
+
+class Sampler:
+    """
+    The state of one adaptive sampling of a grid of `shape`
+    """
+
+    def __init__(self, function: FieldFunction, shape: tuple[int, int]):
+        self.function = function
+        self.shape = shape
+        self.values = np.full(shape, np.nan)
+        self.known = np.zeros(shape, dtype=bool)
+        self.evaluations = 0
+
+    def evaluate(self, rows: np.ndarray, cols: np.ndarray):
+        """
+        Evaluates the points not known yet, each once
+        """
+        if rows.size == 0:
+            return
+        flat = np.unique(np.ravel_multi_index((rows, cols), self.values.shape))
+        flat = flat[~self.known.flat[flat]]
+        if len(flat) == 0:
+            return
+        r, c = np.unravel_index(flat, self.values.shape)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.values[r, c] = np.broadcast_to(self.function(r, c), r.shape)
+        self.known[r, c] = True
+        self.evaluations += len(flat)
+
+    def corners(self, cells: Cells) -> list[np.ndarray]:
+        v = self.values
+        ci, cj, h, w = cells
+        return [v[ci, cj], v[ci, cj + w], v[ci + h, cj], v[ci + h, cj + w]]
+
+    def error(self, cells: Cells) -> np.ndarray:
+        """
+        Largest difference between the true values at the midpoints of every
+        cell and bilinear interpolation of its corners, infinite for NaN
+        """
+        ci, cj, h, w = cells
+        zero = np.zeros_like(h)
+        dy = np.stack([zero, h // 2, h], axis=1)[:, MIDPOINTS[:, 0]]
+        dx = np.stack([zero, w // 2, w], axis=1)[:, MIDPOINTS[:, 1]]
+        rows, cols = ci[:, None] + dy, cj[:, None] + dx
+        self.evaluate(rows.ravel(), cols.ravel())
+
+        corners = [v[:, None] for v in self.corners(cells)]
+        interpolated = bilinear(
+            corners, fraction(dy, h[:, None]), fraction(dx, w[:, None])
+        )
+        error = np.abs(self.values[rows, cols] - interpolated).max(axis=1)
+        return np.where(np.isnan(error), np.inf, error)
+
+    def fill(self, out: np.ndarray, cells: list[Cells]) -> np.ndarray:
+        """
+        `out` with the unknown points of `cells` interpolated bilinearly from
+        their corners
+        """
+        for group in cells:
+            # Cells of one size at a time: all of them but those cut to the grid
+            sizes, which = np.unique(
+                np.stack([group.heights, group.widths], axis=1),
+                axis=0,
+                return_inverse=True,
+            )
+            for k, (height, width) in enumerate(sizes):
+                if height <= 1 and width <= 1:
+                    continue
+                same = group.select(which.ravel() == k)
+                dy, dx = np.arange(height + 1), np.arange(width + 1)
+                rows, cols = np.broadcast_arrays(
+                    same.rows[:, None, None] + dy[None, :, None],
+                    same.cols[:, None, None] + dx[None, None, :],
+                )
+                corners = [v[:, None, None] for v in self.corners(same)]
+                interpolated = bilinear(
+                    corners,
+                    fraction(dy, height)[None, :, None],
+                    fraction(dx, width)[None, None, :],
+                )
+                unknown = ~self.known[rows, cols]
+                out[rows[unknown], cols[unknown]] = interpolated[unknown]
+        return out
+
+    def result(self, cells: list[Cells], step: int) -> Sampled:
+        return Sampled(
+            values=self.fill(self.values.copy(), cells),
+            evaluations=self.evaluations,
+            step=step,
+        )
+
+
+def lattice(n: int, step: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Origins and sizes of the cells of `step` along an axis of `n` pixels, the
+    last one cut to the axis
+    """
+    origins = np.arange(0, max(n - 1, 1), step) if n else np.arange(0)
+    return origins, np.minimum(step, n - 1 - origins)
+
+
+def refine(
+    sampler: Sampler, tolerance: float, step: int
+) -> Iterator[tuple[list[Cells], int]]:
+    """
+    Refines level by level, yielding every cell (done and still refined) and
+    the step of the level about to be refined
+    """
+    (ri, hi), (rj, wj) = (lattice(n, step) for n in sampler.shape)
+    ci, cj = (a.ravel() for a in np.meshgrid(ri, rj, indexing="ij"))
+    h, w = (a.ravel() for a in np.meshgrid(hi, wj, indexing="ij"))
+    cells = Cells(ci, cj, h, w)
+    sampler.evaluate(
+        np.concatenate([ci, ci, ci + h, ci + h]),
+        np.concatenate([cj, cj + w, cj, cj + w]),
+    )
+
+    done: list[Cells] = []
+    while step > 1:
+        yield done + [cells], step
+
+        ok = sampler.error(cells) <= tolerance
+        done.append(cells.select(ok))
+
+        # The others split in four, or in two across a side of one pixel
+        step //= 2
+        ci, cj, h, w = cells.select(~ok)
+        every = np.ones(len(ci), dtype=bool)
+        rows = [
+            (ci, np.where(h > 1, h // 2, h), every),
+            (ci + h // 2, h - h // 2, h > 1),
+        ]
+        cols = [
+            (cj, np.where(w > 1, w // 2, w), every),
+            (cj + w // 2, w - w // 2, w > 1),
+        ]
+        parts = [
+            Cells(r, c, hr, wc).select(kr & kc)
+            for r, hr, kr in rows
+            for c, wc, kc in cols
+        ]
+        cells = Cells(*(np.concatenate(a) for a in zip(*parts)))
+        # Cells with every point a corner have nothing left to check
+        cells = cells.select((cells.heights > 1) | (cells.widths > 1))
+
+    yield done, 1
+
+
+def coarse_step(coarse: int) -> int:
+    """
+    `coarse` rounded up to a power of two
+    """
+    return 1 << max(0, int(coarse) - 1).bit_length()
+
+
+def progressive(
+    function: FieldFunction,
+    shape: tuple[int, int],
+    tolerance: float,
+    coarse: int = 32,
+) -> Iterator[Sampled]:
+    """
+    Samples `function` on a grid of `shape` (rows, columns), yielding the
+    whole grid after every level of refinement, from the `coarse` lattice
+    (rounded up to a power of two) down to single pixels.
+
+    `function(rows, cols)` gets index arrays and returns the field there.
+    Interpolated values are within about `tolerance` of the field wherever it
+    is smooth at the scale of the cells
+    """
+    step = coarse_step(coarse)
+    sampler = Sampler(function, shape)
+    for cells, level in refine(sampler, tolerance, step):
+        yield sampler.result(cells, level)
+
+
+def adaptive(
+    function: FieldFunction,
+    shape: tuple[int, int],
+    tolerance: float,
+    coarse: int = 32,
+) -> Sampled:
+    """
+    The final result of `progressive`, without filling the previews
+    """
+    step = coarse_step(coarse)
+    sampler = Sampler(function, shape)
+    for cells, level in refine(sampler, tolerance, step):
+        pass
+    return sampler.result(cells, level)
+
+
+__all__ = ["Sampled", "adaptive", "progressive"]
@@ -0,0 +1,98 @@
+"""
+Checks of `adaptive` and `progressive` against the field evaluated at every
+pixel. Runs with pytest or as a script from src/
+"""
+
+import numpy as np
+
+from adaptive import adaptive, progressive
+
+SHAPES = [(1, 300), (300, 1), (1, 1), (2, 2), (3, 256), (100, 100), (129, 70)]
+
+
+def exact(function, shape: tuple[int, int]) -> np.ndarray:
+    rows, cols = np.mgrid[: shape[0], : shape[1]]
+    return function(rows, cols)
+
+
+def bowl(rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    # Bilinear interpolation of a quadric is worst at the checked midpoints
+    return ((rows - 40) ** 2 + 0.5 * (cols - 70) ** 2) / 1e4
+
+
+def wave(rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    return np.sin(rows / 40 + 1) * np.cos(cols / 30)
+
+
+def step(rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    return np.where(rows + 2 * cols > 150, 1.0, 0.0)
+
+
+def test_within_tolerance():
+    for shape in SHAPES:
+        for coarse in [8, 32, 64]:
+            for tolerance in [1e-2, 1e-4]:
+                sampled = adaptive(bowl, shape, tolerance, coarse)
+                error = np.abs(sampled.values - exact(bowl, shape)).max()
+                # Up to rounding of the interpolation
+                assert error <= tolerance * (1 + 1e-9), (shape, coarse, tolerance)
+
+
+def test_step_edge_exact():
+    for shape in SHAPES:
+        sampled = adaptive(step, shape, 1e-3)
+        assert np.array_equal(sampled.values, exact(step, shape)), shape
+
+
+def test_nan_propagates():
+    # Any cell with part of a half plane has a corner in it
+    def holes(rows, cols):
+        return np.where(3 * rows + cols > 200, np.nan, wave(rows, cols))
+
+    for shape in SHAPES:
+        expected = exact(holes, shape)
+        sampled = adaptive(holes, shape, 1e-3)
+        # NaN stays where the field is NaN and nowhere else
+        assert np.array_equal(np.isnan(sampled.values), np.isnan(expected)), shape
+        valid = ~np.isnan(expected)
+        error = np.abs(sampled.values[valid] - expected[valid])
+        assert error.max(initial=0) < 2e-3
+
+
+def test_evaluations_inside_grid():
+    def checked(rows, cols):
+        assert rows.min() >= 0 and rows.max() < shape[0]
+        assert cols.min() >= 0 and cols.max() < shape[1]
+        return wave(rows, cols)
+
+    for shape in SHAPES:
+        for coarse in [8, 32, 64]:
+            sampled = adaptive(checked, shape, 1e-6, coarse)
+            assert sampled.evaluations <= shape[0] * shape[1], (shape, coarse)
+            assert not np.isnan(sampled.values).any()
+
+
+def test_empty():
+    for shape in [(0, 10), (10, 0), (0, 0)]:
+        sampled = adaptive(wave, shape, 1e-3)
+        assert sampled.values.shape == shape
+        assert sampled.evaluations == 0
+
+
+def test_progressive_ends_with_adaptive():
+    for shape in SHAPES:
+        levels = list(progressive(wave, shape, 1e-3))
+        assert [level.step for level in levels] == [32, 16, 8, 4, 2, 1]
+        final = adaptive(wave, shape, 1e-3)
+        assert np.array_equal(levels[-1].values, final.values)
+        assert levels[-1].evaluations == final.evaluations
+
+
+if __name__ == "__main__":
+    test_within_tolerance()
+    test_step_edge_exact()
+    test_nan_propagates()
+    test_evaluations_inside_grid()
+    test_empty()
+    test_progressive_ends_with_adaptive()
+    print(f"adaptive sampling checks passed on {len(SHAPES)} shapes")
@@ -0,0 +1,265 @@
+"""
+Tabulated air properties, a `Turbojet` backend in place of the curve fits of
+`jet_engine`
+
+Reduced pressure and enthalpy are kept as monotone cubic (PCHIP) curves
+resampled on uniform grids, so a lookup is one multiply and a few
+multiply-adds with no search. Tables can be built from the curve fits over any
+temperature range or from real air-table data
+"""
+
+import hashlib
+from typing import Any
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+import jet_engine
+from dual import Dual
+
+
+def pchip_slopes(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Fritsch-Butland slopes, which keep the cubic monotone between points
+    """
+    h = np.diff(x)
+    delta = np.diff(y) / h
+    slopes = np.empty_like(y)
+    slopes[0], slopes[-1] = delta[0], delta[-1]
+
+    w1 = 2 * h[1:] + h[:-1]
+    w2 = h[1:] + 2 * h[:-1]
+    same = delta[:-1] * delta[1:] > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = (w1 + w2) / (w1 / delta[:-1] + w2 / delta[1:])
+    slopes[1:-1] = np.where(same, mean, 0)
+    return slopes
+
+
+class Curve:
+    """
+    Cubic Hermite curve through (x, y) with `slopes` (PCHIP by default).
+    NaN outside [x[0], x[-1]]
+    """
+
+    def __init__(self, x: ArrayLike, y: ArrayLike, slopes: ArrayLike | None = None):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if len(x) < 2 or np.any(np.diff(x) <= 0):
+            raise ValueError("Curve points must be increasing")
+        slopes = pchip_slopes(x, y) if slopes is None else np.asarray(slopes, float)
+
+        self.x = x
+        self.step = (x[-1] - x[0]) / (len(x) - 1)
+        self.uniform = bool(np.allclose(np.diff(x), self.step, rtol=1e-9, atol=0))
+
+        # Polynomial of every interval in t = (q - x[i]) / (x[i + 1] - x[i]),
+        # one row per power so a lookup gathers from four contiguous arrays
+        h = np.diff(x)
+        m0, m1 = slopes[:-1] * h, slopes[1:] * h
+        dy = np.diff(y)
+        self.coefficients = np.stack(
+            [y[:-1], m0, 3 * dy - 2 * m0 - m1, m0 + m1 - 2 * dy]
+        )
+        self.widths = h
+
+    @staticmethod
+    def resampled(curve: "Curve", start: float, stop: float, points: int) -> "Curve":
+        """
+        `curve` on `points` evenly spaced points, for lookups without search
+        """
+        x = np.linspace(start, stop, points)
+        y, slopes = curve.evaluate(x, derivative=True)
+        return Curve(x, y, slopes)
+
+    def evaluate(self, q: ArrayLike, derivative: bool = False) -> Any:
+        """
+        Values at q, and derivatives with `derivative`
+        """
+        q = np.asarray(q, dtype=float)
+        last = len(self.x) - 2
+        if self.uniform:
+            u = (q - self.x[0]) * (1 / self.step)
+            i = np.clip(u.astype(np.intp), 0, last)
+            t = u - i
+        else:
+            i = np.clip(np.searchsorted(self.x, q, side="right") - 1, 0, last)
+            t = (q - self.x[i]) / self.widths[i]
+        outside = (q < self.x[0]) | (q > self.x[-1])
+
+        c0, c1, c2, c3 = (np.take(c, i) for c in self.coefficients)
+        value = ((c3 * t + c2) * t + c1) * t + c0
+        if outside.any():
+            value = np.where(outside, np.nan, value)
+        if not derivative:
+            return value
+
+        slope = ((3 * c3 * t + 2 * c2) * t + c1) / np.take(self.widths, i)
+        return value, np.where(outside, np.nan, slope)
+
+
+def lookup(
+    curve: Curve, x: Any, log_input: bool = False, log_output: bool = False
+) -> Any:
+    """
+    `curve` at x, a float, array or `dual.Dual`. With `log_input` or
+    `log_output` the curve works on the logarithm of that side
+    """
+    dual = isinstance(x, Dual)
+    value = np.asarray(x.value if dual else x, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        q = np.log(value) if log_input else value
+        if not dual:
+            y = curve.evaluate(q)
+            return (np.exp(y) if log_output else y)[()]
+
+        y, slope = curve.evaluate(q, derivative=True)
+        if log_input:
+            slope = slope / value
+        if log_output:
+            y = np.exp(y)
+            slope = slope * y
+    return Dual(y, x.tangent * slope)
+
+
+class PropertyTable:
+    """
+    Reduced pressure and enthalpy of air by temperature (K), with inverse
+    lookups. Has the same `temp_to_p_r`, `p_r_to_temp`, `temp_to_h` and
+    `h_to_temp` as `jet_engine`, vectorized and differentiable with duals.
+    Inputs outside the table give NaN
+    """
+
+    def __init__(
+        self,
+        temperature: ArrayLike,
+        p_r: ArrayLike,
+        h: ArrayLike,
+        points: int = 4096,
+        name: str = "table",
+    ):
+        """
+        `temperature`, `p_r` and `h` are the rows of an air table, increasing
+        in temperature, and are resampled on `points` points
+        """
+        temperature = np.asarray(temperature, dtype=float)
+        ln_p_r = np.log(np.asarray(p_r, dtype=float))
+        h = np.asarray(h, dtype=float)
+        if np.any(np.diff(ln_p_r) <= 0) or np.any(np.diff(h) <= 0):
+            raise ValueError("p_r and h must increase with temperature")
+
+        low, high = temperature[0], temperature[-1]
+        self.name = name
+        self.range = (float(low), float(high))
+
+        # Reduced pressure spans orders of magnitude, so it is kept as a logarithm
+        self.ln_p_r = Curve.resampled(Curve(temperature, ln_p_r), low, high, points)
+        self.h = Curve.resampled(Curve(temperature, h), low, high, points)
+        self.ln_p_r_temperature = Curve.resampled(
+            Curve(ln_p_r, temperature), ln_p_r[0], ln_p_r[-1], points
+        )
+        self.h_temperature = Curve.resampled(Curve(h, temperature), h[0], h[-1], points)
+
+        digest = hashlib.sha1()
+        for array in (temperature, ln_p_r, h):
+            digest.update(array.tobytes())
+        self.digest = f"{digest.hexdigest()[:12]}-{points}"
+
+    @classmethod
+    def from_curve_fits(
+        cls, low: float = 150, high: float = 2500, points: int = 4096
+    ) -> "PropertyTable":
+        """
+        Table of the `jet_engine` approximations between `low` and `high` K
+        """
+        temperature = np.linspace(low, high, points)
+        return cls(
+            temperature,
+            jet_engine.temp_to_p_r(temperature),
+            jet_engine.temp_to_h(temperature),
+            points,
+            name="curve fits",
+        )
+
+    @classmethod
+    def from_file(cls, path: str, points: int = 4096) -> "PropertyTable":
+        """
+        Reads an air table from a CSV file with a header row naming the
+        `temperature`, `h` and `p_r` columns, in any order
+        """
+        data = np.genfromtxt(path, delimiter=",", names=True)
+        return cls(data["temperature"], data["p_r"], data["h"], points, name=path)
+
+    def __repr__(self) -> str:
+        return f"PropertyTable({self.name!r}, {self.range}, {self.digest})"
+
+    def temp_to_p_r(self, temperature: Any) -> Any:
+        return lookup(self.ln_p_r, temperature, log_output=True)
+
+    def p_r_to_temp(self, p_r: Any) -> Any:
+        return lookup(self.ln_p_r_temperature, p_r, log_input=True)
+
+    def temp_to_h(self, temperature: Any) -> Any:
+        return lookup(self.h, temperature)
+
+    def h_to_temp(self, h: Any) -> Any:
+        return lookup(self.h_temperature, h)
+
+
+if __name__ == "__main__":
+    import time
+
+    from jet_engine import OUTPUTS, Turbojet
+
+    def best_time(function: Any, runs: int = 5) -> float:
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    table = PropertyTable.from_curve_fits(150, 2500)
+    print(table)
+
+    rng = np.random.default_rng(0)
+    temperature = rng.uniform(200, 2000, 1_000_000)
+    p_r = jet_engine.temp_to_p_r(temperature)
+    h = jet_engine.temp_to_h(temperature)
+
+    checks = [
+        ("temp_to_p_r", temperature, p_r),
+        ("p_r_to_temp", p_r, temperature),
+        ("temp_to_h", temperature, h),
+        ("h_to_temp", h, temperature),
+    ]
+    print(f"{'':12} {'max rel error':>14} {'closed form':>12} {'table':>8}")
+    for name, x, expected in checks:
+        # Errors are against the exact values (jet_engine.h_to_temp is only an
+        # approximate inverse of temp_to_h), times against the closed forms
+        exact = getattr(jet_engine, name)
+        error = np.max(np.abs(getattr(table, name)(x) / expected - 1))
+        closed = best_time(lambda: exact(x))
+        tabulated = best_time(lambda: getattr(table, name)(x))
+        print(
+            f"{name:12} {error:14.1e} {closed * 1000:10.1f}ms {tabulated * 1000:6.1f}ms"
+        )
+
+    shape = (1000, 1000)
+    area = np.linspace(0.1, 10, shape[1])
+    ratio = np.linspace(2, 50, shape[0])[:, None]
+    engines = {
+        "curve fits": Turbojet(0.6, 0.4, 50_000, 50_000, 9, 847 + 273, 30_000),
+        "table": Turbojet(0.6, 0.4, 50_000, 50_000, 9, 847 + 273, 30_000, table),
+    }
+    results = {}
+    for name, engine in engines.items():
+        grid = lambda: engine.calculate_grid(
+            273 - 33, 200, inlet_area=area, compresser_ratio=ratio
+        )
+        results[name] = grid()
+        print(f"{name} backend, 1000x1000 grid: {best_time(grid) * 1000:.1f}ms")
+    for output in OUTPUTS:
+        a = getattr(results["curve fits"], output)
+        b = getattr(results["table"], output)
+        print(f"  {output}: max rel difference {np.nanmax(np.abs(b / a - 1)):.1e}")
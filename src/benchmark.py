@@ -0,0 +1,583 @@
+"""
+Benchmarks of the hot paths, with saved baselines
+
+    python benchmark.py generate [--scales 1 10 100]
+    python benchmark.py run [--scales 1 10] [--filter TEXT] [--save NAME]
+    python benchmark.py compare BASELINE [CURRENT] [--threshold 0.1]
+
+Dataset benchmarks (loading, lookups, the fleet) run on synthetic data folders
+`scale` times the size of the bundled JSON, generated from a fixed seed into
+`benchmarks/data` on first use. Others (engine grids, `Gas` chains, heatmap
+rendering) do not depend on a dataset.
+
+A result is the best time of several runs, like `air_tables.py` reports.
+`compare` runs the benchmarks of a baseline again (or reads a second saved
+run) and exits with status 1 if any got slower by more than the threshold
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Callable, NamedTuple
+
+import numpy as np
+
+from db import AircraftType, load
+from jet_engine import PARAMETERS, Turbojet
+
+SRC = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(SRC)
+DATA = os.path.join(ROOT, "benchmarks", "data")
+BASELINES = os.path.join(ROOT, "benchmarks", "baselines")
+
+# Bumped whenever `generate` changes, so old datasets are not reused
+GENERATOR_VERSION = 1
+SEED = 0
+
+# Records per 1x dataset, the sizes of the bundled files
+BASE_SIZES = {
+    "manufacturers": 389,
+    "engine_models": 1400,
+    "aircraft_types": 1391,
+    "aircraft_models": 1391,
+}
+
+# A run's setup (untimed, may be None) and the timed function
+Timed = tuple[Callable[[], Any] | None, Callable[[], Any]]
+
+
+class Benchmark(NamedTuple):
+    name: str
+    # Gets the dataset folder for dataset benchmarks, nothing otherwise
+    prepare: Callable[..., Timed]
+    dataset: bool
+    repeat: int
+
+
+BENCHMARKS: list[Benchmark] = []
+
+
+def benchmark(name: str, dataset: bool = False, repeat: int = 5):
+    """
+    Registers a function returning the (setup, run) of a benchmark
+    """
+
+    def register(prepare: Callable[..., Timed]) -> Callable[..., Timed]:
+        BENCHMARKS.append(Benchmark(name, prepare, dataset, repeat))
+        return prepare
+
+    return register
+
+
+# ============= DATASETS ================
+
+
+def dataset_path(scale: int) -> str:
+    return os.path.join(DATA, f"v{GENERATOR_VERSION}-x{scale}")
+
+
+def generate(scale: int) -> str:
+    """
+    Writes the synthetic dataset of `scale` unless it exists, returns its folder
+    """
+    path = dataset_path(scale)
+    if os.path.exists(os.path.join(path, "complete")):
+        return path
+    os.makedirs(path, exist_ok=True)
+
+    rng = random.Random(SEED)
+    with open(os.path.join(ROOT, "data", "properties.json"), encoding="utf8") as file:
+        properties = json.load(file)
+    numeric = [p["id"] for p in properties if p["type"] in ("integer", "float")]
+    engine = AircraftType.get_engine_properties()
+    sizes = {name: size * scale for name, size in BASE_SIZES.items()}
+
+    manufacturers = [
+        {
+            "id": f"manufacturer-{i}",
+            "country": rng.choice(["US", "GB", "FR", "DE", "RU", "CN", "BR"]),
+            "name": f"Manufacturer {i}",
+            "nativeName": None,
+            "propertyValues": [],
+            "tags": [],
+            "url": f"https://example.com/manufacturers/{i}",
+        }
+        for i in range(sizes["manufacturers"])
+    ]
+
+    engines = []
+    for i in range(sizes["engine_models"]):
+        values = []
+        # Like the real data, some engines lack the values a turbojet needs
+        if rng.random() < 0.6:
+            values = [
+                {
+                    "property": engine.fan_diameter,
+                    "value": round(rng.uniform(0.3, 3.5), 2),
+                },
+                {
+                    "property": engine.compresser_ratio,
+                    "value": round(rng.uniform(3, 45), 1),
+                },
+                {"property": engine.weight, "value": rng.randint(100, 9000)},
+            ]
+        engines.append(
+            {
+                "id": f"engine-{i}",
+                "name": f"Engine {i}",
+                "nativeName": None,
+                "engineFamily": rng.choice(
+                    ["turbojet", "turbofan", "turboprop", "piston"]
+                ),
+                "propertyValues": values,
+                "tags": [],
+                "url": f"https://example.com/engines/{i}",
+            }
+        )
+
+    aircraft_types = [
+        {
+            "id": f"aircraft-type-{i}",
+            "aircraftFamily": rng.choice(["airplane", "helicopter", "gyroplane"]),
+            "engineCount": rng.randint(1, 4),
+            "engineFamily": rng.choice(["turbojet", "turbofan", "turboprop", "piston"]),
+            "engineModels": [
+                f"engine-{rng.randrange(sizes['engine_models'])}"
+                for _ in range(rng.choice([0, 1, 1, 1, 2]))
+            ],
+            "iataCode": None,
+            "icaoCode": f"T{i:05}",
+            "manufacturer": f"manufacturer-{rng.randrange(sizes['manufacturers'])}",
+            "name": f"Type {i}",
+            "nativeName": None,
+            "propertyValues": [
+                {"property": id, "value": rng.randint(1, 100_000)}
+                for id in rng.sample(numeric, 3)
+            ],
+            "tags": [],
+            "url": f"https://example.com/aircraft-types/{i}",
+        }
+        for i in range(sizes["aircraft_types"])
+    ]
+
+    aircraft_models = [
+        {
+            "id": f"aircraft-model-{i}",
+            "aircraftType": f"aircraft-type-{rng.randrange(sizes['aircraft_types'])}",
+            "url": f"https://example.com/aircraft-models/{i}",
+        }
+        for i in range(sizes["aircraft_models"])
+    ]
+
+    for filename, records in [
+        ("properties", properties),
+        ("manufacturers", manufacturers),
+        ("engine-models", engines),
+        ("aircraft-types", aircraft_types),
+        ("aircraft-models", aircraft_models),
+    ]:
+        with open(os.path.join(path, f"{filename}.json"), "w", encoding="utf8") as file:
+            json.dump(records, file)
+    # Written last, so an interrupted run is generated again
+    open(os.path.join(path, "complete"), "w").close()
+    return path
+
+
+# ============= DATASET BENCHMARKS ================
+
+
+@benchmark("db.load cold", dataset=True, repeat=3)
+def load_cold(path: str) -> Timed:
+    return None, lambda: load(path)
+
+
+@benchmark("db.load warm", dataset=True, repeat=3)
+def load_warm(path: str) -> Timed:
+    snapshot = os.path.join(path, "snapshot.bin")
+    load(path, snapshot=snapshot)
+    return None, lambda: load(path, snapshot=snapshot)
+
+
+@benchmark("EntryList.by", dataset=True)
+def entry_list_by(path: str) -> Timed:
+    types = list(load(path).aircraft_types.dict.values())
+
+    def setup():
+        for aircraft_type in types:
+            aircraft_type.engine_models.indexes = None
+
+    def run():
+        for aircraft_type in types:
+            aircraft_type.engine_models.by("engine_family", "turbojet")
+
+    return setup, run
+
+
+@benchmark("AircraftType.jet_information", dataset=True)
+def jet_information(path: str) -> Timed:
+    types = list(load(path).aircraft_types.dict.values())
+
+    def setup():
+        for aircraft_type in types:
+            aircraft_type.derived = None
+
+    def run():
+        for aircraft_type in types:
+            aircraft_type.jet_information
+
+    return setup, run
+
+
+@benchmark("jet_information_table", dataset=True)
+def jet_information_table(path: str) -> Timed:
+    aircraft_types = load(path).aircraft_types
+    return None, aircraft_types.jet_information_table
+
+
+@benchmark("Turbojet.calculate per type", dataset=True, repeat=3)
+def calculate_per_type(path: str) -> Timed:
+    table = load(path).aircraft_types.jet_information_table()
+    rows = [
+        tuple(float(getattr(table, name)[i]) for name in PARAMETERS)
+        for i in range(len(table.ids))
+    ]
+
+    def run():
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for row in rows:
+                Turbojet(*row).calculate(273 - 33, 200)
+
+    return None, run
+
+
+@benchmark("evaluate_fleet", dataset=True)
+def fleet(path: str) -> Timed:
+    from fleet import evaluate_fleet
+
+    table = load(path).aircraft_types.jet_information_table()
+    return None, lambda: evaluate_fleet(table)
+
+
+# ============= ENGINE, GAS AND RENDERING ================
+
+
+@benchmark("Turbojet.calculate")
+def calculate() -> Timed:
+    engine = Turbojet(0.6, 0.4, 50_000, 50_000, 9, 847 + 273, 30_000)
+    return None, lambda: engine.calculate(273 - 33, 200)
+
+
+@benchmark("Turbojet.calculate_grid 1000x1000")
+def calculate_grid() -> Timed:
+    engine = Turbojet(0.6, 0.4, 50_000, 50_000, 9, 847 + 273, 30_000)
+    area = np.linspace(0.1, 10, 1000)
+    ratio = np.linspace(2, 50, 1000)[:, None]
+    return None, lambda: engine.calculate_grid(
+        273 - 33, 200, inlet_area=area, compresser_ratio=ratio
+    )
+
+
+def gas_chain(name: str) -> Timed:
+    # The gas folder is run from inside, its modules import each other by name
+    sys.path.insert(0, os.path.join(SRC, "gas"))
+    try:
+        import gas
+        import gas_benchmark
+    finally:
+        sys.path.pop(0)
+
+    chain = gas_benchmark.random_chain(10_000)
+    return None, lambda: gas_benchmark.run_chain(getattr(gas, name), chain)
+
+
+@benchmark("Gas chain of 10000 transitions")
+def gas_chain_slow() -> Timed:
+    return gas_chain("Gas")
+
+
+@benchmark("FastGas chain of 10000 transitions")
+def gas_chain_fast() -> Timed:
+    return gas_chain("FastGas")
+
+
+def heatmap(size: int) -> Timed:
+    """
+    One plot of `main.py`, the data spanning `size` units on both axes (the
+    image is `size + 1000` pixels square)
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+    from main import clamp_array, plot_scatter_with_background_color
+
+    rng = random.Random(SEED)
+    data = [
+        (rng.uniform(0, size), rng.uniform(0, size), f"Type {i}") for i in range(50)
+    ]
+    data += [(0, 0, "min"), (size, size, "max")]
+    engine = Turbojet(0.6, 0.4, 50_000, 50_000, 9, 847 + 273, 30_000)
+
+    def coloring(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            field = engine.calculate_grid(
+                273 - 33, 200, inlet_area=x / 10 + 0.1, compresser_ratio=y / 10 + 2
+            )
+        return clamp_array(0, field.thrust / 1_500_000, 1)
+
+    step = max(1, size // 10)
+    return None, lambda: plot_scatter_with_background_color(
+        "x", "y", step, step, data, coloring, vectorized=True
+    )
+
+
+@benchmark("heatmap 1100x1100px", repeat=3)
+def heatmap_small() -> Timed:
+    return heatmap(100)
+
+
+@benchmark("heatmap 1500x1500px", repeat=3)
+def heatmap_medium() -> Timed:
+    return heatmap(500)
+
+
+@benchmark("heatmap 2500x2500px", repeat=3)
+def heatmap_large() -> Timed:
+    return heatmap(1500)
+
+
+# ============= RUNNING AND COMPARING ================
+
+
+def measure(
+    setup: Callable[[], Any] | None,
+    run: Callable[[], Any],
+    repeat: int,
+    min_time: float = 0.5,
+) -> list[float]:
+    """
+    Seconds per call of `run`, at least `repeat` samples and more until they
+    add up to `min_time`. Fast functions are called in loops long enough to
+    time. The garbage collector is off while timing, like `timeit`
+    """
+    loops = 1
+    if setup is None:
+        while True:
+            start = time.perf_counter()
+            for _ in range(loops):
+                run()
+            if time.perf_counter() - start >= 0.05 or loops >= 1 << 20:
+                break
+            loops *= 4
+
+    samples: list[float] = []
+    enabled = gc.isenabled()
+    try:
+        while len(samples) < repeat or (
+            sum(samples) * loops < min_time and len(samples) < 1000
+        ):
+            if setup is not None:
+                setup()
+            gc.disable()
+            start = time.perf_counter()
+            for _ in range(loops):
+                run()
+            samples.append((time.perf_counter() - start) / loops)
+            if enabled:
+                gc.enable()
+    finally:
+        if enabled:
+            gc.enable()
+    return samples
+
+
+def selected(
+    scales: list[int], text: str | None = None
+) -> list[tuple[str, Benchmark, int | None]]:
+    """
+    (result name, benchmark, scale or None) of every benchmark to run
+    """
+    chosen = []
+    for bench in BENCHMARKS:
+        for scale in scales if bench.dataset else [None]:
+            name = bench.name if scale is None else f"{bench.name} [x{scale}]"
+            if text is None or text in name:
+                chosen.append((name, bench, scale))
+    return chosen
+
+
+def run_benchmarks(
+    chosen: list[tuple[str, Benchmark, int | None]], verbose: bool = True
+) -> dict[str, Any]:
+    results = {}
+    for name, bench, scale in chosen:
+        setup, run = (
+            bench.prepare(generate(scale)) if scale is not None else bench.prepare()
+        )
+        samples = measure(setup, run, bench.repeat)
+        results[name] = {
+            "best": min(samples),
+            "median": statistics.median(samples),
+            "samples": samples,
+        }
+        if verbose:
+            print(f"{name:45} {format_time(min(samples)):>10}", flush=True)
+    return results
+
+
+def format_time(seconds: float) -> str:
+    for unit, factor in [("s", 1), ("ms", 1e-3), ("us", 1e-6)]:
+        if seconds >= factor:
+            return f"{seconds / factor:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+def metadata() -> dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def baseline_path(name: str) -> str:
+    """
+    A path as is, anything else is the name of a baseline in `BASELINES`
+    """
+    if os.path.exists(name) or name.endswith(".json"):
+        return name
+    return os.path.join(BASELINES, f"{name}.json")
+
+
+def read_run(name: str) -> dict[str, Any]:
+    with open(baseline_path(name), encoding="utf8") as file:
+        return json.load(file)
+
+
+def compare(
+    baseline: dict[str, Any], current: dict[str, Any], threshold: float
+) -> list[str]:
+    """
+    Prints both runs side by side, returns the benchmarks that regressed.
+
+    A benchmark regressed if its best time is more than `threshold` slower and
+    even its best run was slower than the baseline's median, so a few noisy
+    runs on either side are not flagged
+    """
+    regressions = []
+    print(f"{'':45} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before = baseline["results"][name]["best"]
+        after = result["best"]
+        change = after / before - 1
+        flag = ""
+        if change > threshold:
+            if after > baseline["results"][name]["median"]:
+                flag = "  REGRESSION"
+                regressions.append(name)
+            else:
+                flag = "  noisy"
+        elif change < -threshold / (1 + threshold):
+            flag = "  faster"
+        print(
+            f"{name:45} {format_time(before):>10} {format_time(after):>10} "
+            f"{change:+7.1%}{flag}"
+        )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks of the hot paths")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = commands.add_parser("generate", help="write the datasets")
+    generate_parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--scales", type=int, nargs="+", default=[1, 10])
+    run_parser.add_argument("--filter", help="only benchmarks with this in the name")
+    run_parser.add_argument("--save", metavar="NAME", help="save as a baseline")
+
+    compare_parser = commands.add_parser(
+        "compare", help="compare with a baseline, status 1 on regressions"
+    )
+    compare_parser.add_argument("baseline", help="baseline name or path")
+    compare_parser.add_argument(
+        "current",
+        nargs="?",
+        help="saved run to compare, runs the benchmarks if not given",
+    )
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="relative slowdown flagged as a regression (default 0.1)",
+    )
+    compare_parser.add_argument(
+        "--filter", help="only benchmarks with this in the name"
+    )
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        for scale in args.scales:
+            start = time.perf_counter()
+            path = generate(scale)
+            print(f"x{scale}: {path} ({time.perf_counter() - start:.1f}s)")
+
+    elif args.command == "run":
+        print(f"{'':45} {'best':>10}")
+        run = {
+            "meta": metadata(),
+            "results": run_benchmarks(selected(args.scales, args.filter)),
+        }
+        if args.save:
+            os.makedirs(BASELINES, exist_ok=True)
+            with open(baseline_path(args.save), "w", encoding="utf8") as file:
+                json.dump(run, file, indent=2)
+            print(f"saved to {baseline_path(args.save)}")
+
+    else:
+        baseline = read_run(args.baseline)
+        if args.current is not None:
+            current = read_run(args.current)
+        else:
+            # The benchmarks and scales of the baseline
+            names = set(baseline["results"])
+            scales = sorted(
+                {
+                    int(name.rsplit("[x", 1)[1][:-1])
+                    for name in names
+                    if name.endswith("]")
+                }
+            )
+            chosen = [
+                item for item in selected(scales, args.filter) if item[0] in names
+            ]
+            current = {"meta": metadata(), "results": run_benchmarks(chosen, False)}
+
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions above {args.threshold:.0%}")
+            sys.exit(1)
@@ -1,11 +1,28 @@
+from collections import OrderedDict
 from functools import cache
 import json
 import math
+import sys
 
-from types import SimpleNamespace
-from typing import Any, Type, TypeVar, Generic, Callable
+import numpy as np
 
-from loader import load_files
+from types import SimpleNamespace
+from typing import (
+    Any,
+    Iterable,
+    Iterator,
+    MutableMapping,
+    Type,
+    TypeVar,
+    Generic,
+    Callable,
+)
+
+from index import HashIndex, Index, Query, SortedIndex
+from instrument import count, span, timed
+from loader import iter_files_concurrently, load_files
+from property_store import PropertyStore, PropertyView
+from snapshot import Snapshot, open_snapshot
 
 T = TypeVar("T")
 
@@ -28,37 +45,196 @@ class DB:
     properties: "Database[Property]"
     manufacturers: "Database[Manufacturer]"
     engines: "Database[Engine]"
-    aircraft_types: "Database[AircraftType]"
+    aircraft_types: "AircraftTypeDatabase"
     aircraft_models: "Database[AircraftModel]"
 
 
+class LazyDict(MutableMapping[str, T]):
+    """
+    Keeps the raw records and only runs the loader on first access.
+    Built values are kept in an LRU cache of `cache_size` entries, so a value
+    that was evicted is built again (as a new object) on its next access
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[Js], T],
+        records: dict[str, Js],
+        cache_size: int | None = 1024,
+    ):
+        self.loader = loader
+        # Also holds the keys of assigned values (as None), to keep the order
+        self.records: dict[str, Js | None] = records  # type: ignore
+        self.cache_size = cache_size
+        self.built: OrderedDict[str, T] = OrderedDict()
+        # Values that were assigned instead of loaded, never evicted
+        self.assigned: dict[str, T] = {}
+
+    def __getitem__(self, key: str) -> T:
+        if key in self.assigned:
+            return self.assigned[key]
+        if key in self.built:
+            self.built.move_to_end(key)
+            return self.built[key]
+
+        value = self.loader(self.records[key])  # type: ignore
+        self.built[key] = value
+        if self.cache_size is not None and len(self.built) > self.cache_size:
+            self.built.popitem(last=False)
+        return value
+
+    def __setitem__(self, key: str, value: T) -> None:
+        self.built.pop(key, None)
+        self.records.setdefault(key, None)
+        self.assigned[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        del self.records[key]
+        self.built.pop(key, None)
+        self.assigned.pop(key, None)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.records
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.records)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+
 class Database(Generic[T]):
     """
     Must have id
+
+    With `lazy`, items are only built from their records on first access, see
+    `LazyDict`
+
+    `indexes` are built on their first lookup and then kept up to date by
+    `__setitem__` and `__delitem__`
     """
 
-    def __init__(self, loader: Callable[[Js], T], data: list[Js] = []):
+    def __init__(
+        self,
+        loader: Callable[[Js], T],
+        data: Iterable[Js] = [],
+        lazy: bool = False,
+        cache_size: int | None = 1024,
+        indexes: dict[str, Index] | None = None,
+    ):
         if isinstance(data, str):
             data = json.loads(data)
             # should be a list
             assert isinstance(data, list)
 
-        self.dict = {str(item["id"]): loader(item) for item in data}
+        self.dict: MutableMapping[str, T]
+        if lazy:
+            records = {str(item["id"]): item for item in data}
+            self.dict = LazyDict(loader, records, cache_size)
+        else:
+            self.dict = {str(item["id"]): loader(item) for item in data}
+
+        self.indexes = indexes if indexes is not None else {}
 
     def __getitem__(self, key: str) -> T:
         return self.dict[key]
 
     def __setitem__(self, key: str, value: T) -> None:
+        if key in self.dict:
+            self._unindex(key)
         self.dict[key] = value
+        for index in self.indexes.values():
+            if index.built:
+                index.add(key, value)
 
     def __delitem__(self, key: str) -> None:
         del self.dict[key]
+        self._unindex(key)
+
+    def _unindex(self, key: str):
+        for index in self.indexes.values():
+            if index.built:
+                index.remove(key)
+
+    def index(self, name: str) -> Any:
+        """
+        The index called `name`, built on first use
+        """
+        index = self.indexes[name]
+        if not index.built:
+            with span("db.index", index=name):
+                for key, value in self.dict.items():
+                    index.add(key, value)
+            index.built = True
+        return index
+
+    def query(self) -> Query:
+        """
+        Combines index lookups, e.g.
+        `db.query().where("manufacturer", id).range("compresser_ratio", 30).all()`
+        """
+        return Query(self)
+
+    def find(self, name: str, value: Any) -> list[T]:
+        """
+        Items whose hash index `name` matches `value`
+        """
+        return self.query().where(name, value).all()
+
+    def range(self, name: str, lo: float | None = None, hi: float | None = None):
+        """
+        Items with `lo <= value <= hi` in the sorted index `name`, ascending
+        """
+        return self.query().range(name, lo, hi).all()
+
+    def top(self, name: str, k: int, largest: bool = True) -> list[T]:
+        return self.query().top(name, k, largest)
 
     def __contains__(self, key: str) -> bool:
         return key in self.dict
 
 
+class derived(Generic[T]):
+    """
+    Property cached per instance, in its `derived` attribute.
+
+    The cached value is recomputed when `version(instance)` changes, so values
+    derived from property values follow edits to them. Unlike `functools.cache`,
+    nothing outlives the instance
+    """
+
+    def __init__(self, version: Callable[[Any], Any]):
+        self.version = version
+        self.function: Callable[[Any], T]
+        self.name = ""
+
+    def __call__(self, function: Callable[[Any], T]) -> "derived[T]":
+        self.function = function
+        self.name = function.__name__
+        return self
+
+    def __get__(self, instance: Any, owner: Any = None) -> T:
+        if instance is None:
+            return self  # type: ignore
+        cache = instance.derived
+        if cache is None:
+            cache = instance.derived = {}
+
+        version = self.version(instance)
+        if self.name in cache:
+            cached_version, value = cache[self.name]
+            if cached_version == version:
+                return value
+
+        value = self.function(instance)
+        cache[self.name] = (version, value)
+        return value
+
+
 class ILoadable:
+    # Subclasses list their attributes in __slots__ too, so instances have no __dict__
+    __slots__ = ("id",)
+
     def __init__(self):
         self.id: str
 
@@ -66,14 +242,48 @@ class ILoadable:
     def from_data(data: Js) -> "ILoadable":
         raise NotImplementedError
 
+    @staticmethod
+    def indexes() -> dict[str, Index]:
+        """
+        Secondary indexes of the database of this type, see `Database.index`
+        """
+        return {}
+
+
+def property_number(id: str) -> Callable[[Any], float | None]:
+    """
+    Index key of the numeric value of the property `id`, None when missing
+    """
+
+    def key(item: Any) -> float | None:
+        value = item.property_values.get(id)
+        return None if value is None else f(value.value)
+
+    return key
+
+
+def engine_property_number(id: str) -> Callable[[Any], float | None]:
+    """
+    Like `property_number`, for the first engine of an aircraft type
+    """
+    engine_key = property_number(id)
+
+    def key(item: Any) -> float | None:
+        first = item.engine_models.first()
+        return None if first is None else engine_key(first)
+
+    return key
+
 
 class Property(ILoadable):
+    __slots__ = ("name", "type", "unit")
+
     @staticmethod
     def from_data(data: Js) -> "Property":
         return Property(data["id"], data["name"], data["type"], data.get("unit"))
 
     def __init__(self, id: str, name: str, type: str, unit: str | None = None):
-        self.id = id
+        self.id = sys.intern(id)
         self.name = name
         self.type = type
         self.unit = unit
@@ -83,12 +293,15 @@ class Property(ILoadable):
 
 
 class PropertyValue(ILoadable):
+    __slots__ = ("property", "value")
+
     @staticmethod
     def from_data(data: Js) -> "PropertyValue":
         return PropertyValue(data["property"], data["value"])
 
     def __init__(self, property: str, value: Js):
-        self.id = property
+        # Thousands of values share a few property ids
+        self.id = sys.intern(property)
         self.property = DB.properties[property]
         self.value = value
 
@@ -104,17 +317,72 @@ ELT = TypeVar("ELT", bound=ILoadable)
 
 
 class EntryList(dict[str, ELT], Generic[ELT]):
+    __slots__ = ("indexes", "version")
+
     @staticmethod
     def from_data(Entry: Type[ELT], data: list[Js]) -> "EntryList[ELT]":
         return EntryList[ELT]([Entry.from_data(item) for item in data])
 
     def __init__(self, data: list[ELT] = []):
         super().__init__({item.id: item for item in data})
+        # property -> value -> first item, built by `by` and reset on changes
+        self.indexes: dict[str, dict[Any, ELT]] | None = None
+        # Bumped on every change, see `derived`
+        self.version = 0
+
+    def changed(self):
+        # Unpickling sets items before attributes
+        self.indexes = None
+        self.version = getattr(self, "version", 0) + 1
+
+    def __setitem__(self, key: str, value: ELT) -> None:
+        super().__setitem__(key, value)
+        self.changed()
+
+    def __delitem__(self, key: str) -> None:
+        super().__delitem__(key)
+        self.changed()
+
+    def pop(self, *args: Any) -> Any:
+        self.changed()
+        return super().pop(*args)
+
+    def popitem(self) -> tuple[str, ELT]:
+        self.changed()
+        return super().popitem()
+
+    def setdefault(self, key: str, default: ELT) -> ELT:  # type: ignore
+        self.changed()
+        return super().setdefault(key, default)
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        super().update(*args, **kwargs)
+        self.changed()
+
+    def clear(self) -> None:
+        super().clear()
+        self.changed()
 
     def by(self, property: str, value: Any):
-        for item in self.values():
-            if getattr(item, property) == value:
-                return item
+        if self.indexes is None:
+            self.indexes = {}
+        if property not in self.indexes:
+            index: dict[Any, ELT] = {}
+            try:
+                for item in self.values():
+                    index.setdefault(getattr(item, property), item)
+            except TypeError:
+                # Unhashable values, scan every time
+                for item in self.values():
+                    if getattr(item, property) == value:
+                        return item
+                return
+            self.indexes[property] = index
+
+        try:
+            return self.indexes[property].get(value)
+        except TypeError:
+            return
 
     def first(self) -> ELT | None:
         if len(self) == 0:
@@ -126,26 +394,61 @@ class EntryList(dict[str, ELT], Generic[ELT]):
         return list(self.values())
 
 
+PropertyValues = EntryList[PropertyValue] | PropertyView
+
+
+def load_property_values(
+    data: Js, store: PropertyStore | None = None
+) -> list[PropertyValue] | PropertyView:
+    """
+    The `propertyValues` of an entity, kept in `store` when it is given
+    """
+    if store is None:
+        return [PropertyValue.from_data(d) for d in data["propertyValues"]]
+    return store.add(data["id"], data["propertyValues"])
+
+
+def property_values_of(values: list[PropertyValue] | PropertyView) -> PropertyValues:
+    return values if isinstance(values, PropertyView) else EntryList(values)
+
+
 class Manufacturer(ILoadable):
+    __slots__ = (
+        "country",
+        "name",
+        "native_name",
+        "property_values",
+        "tags",
+        "url",
+    )
+
     @staticmethod
-    def from_data(data: Js) -> "Manufacturer":
+    def from_data(data: Js, store: PropertyStore | None = None) -> "Manufacturer":
         return Manufacturer(
             data["id"],
             data["country"],
             data["name"],
             data["nativeName"],
-            [PropertyValue.from_data(d) for d in data["propertyValues"]],
+            load_property_values(data, store),
             data["tags"],
             data["url"],
         )
 
+    @staticmethod
+    def indexes() -> dict[str, Index]:
+        return {
+            "country": HashIndex("country"),
+            "name": HashIndex("name"),
+            "tags": HashIndex("tags", multi=True),
+        }
+
     def __init__(
         self,
         id: str,
         country: str,
         name: str,
         native_name: str | None,
-        property_values: list[PropertyValue],
+        property_values: list[PropertyValue] | PropertyView,
         tags: list[str],
         url: str,
     ):
@@ -153,31 +456,52 @@ class Manufacturer(ILoadable):
         self.country = country
         self.name = name
         self.native_name = native_name
-        self.property_values = EntryList(property_values)
+        self.property_values = property_values_of(property_values)
         self.tags = tags
         self.url = url
 
 
 class Engine(ILoadable):
+    __slots__ = (
+        "name",
+        "native_name",
+        "engine_family",
+        "property_values",
+        "tags",
+        "url",
+    )
+
     @staticmethod
-    def from_data(data: Js) -> "Engine":
+    def from_data(data: Js, store: PropertyStore | None = None) -> "Engine":
         return Engine(
             data["id"],
             data["name"],
             data["nativeName"],
             data["engineFamily"],
-            [PropertyValue.from_data(d) for d in data["propertyValues"]],
+            load_property_values(data, store),
             data["tags"],
             data["url"],
         )
 
+    @staticmethod
+    def indexes() -> dict[str, Index]:
+        p = AircraftType.get_engine_properties()
+        return {
+            "name": HashIndex("name"),
+            "engine_family": HashIndex("engine_family"),
+            "tags": HashIndex("tags", multi=True),
+            "fan_diameter": SortedIndex(property_number(p.fan_diameter)),
+            "compresser_ratio": SortedIndex(property_number(p.compresser_ratio)),
+            "weight": SortedIndex(property_number(p.weight)),
+        }
+
     def __init__(
         self,
         id: str,
         name: str,
         native_name: str | None,
         engine_family: str,
-        property_values: list[PropertyValue],
+        property_values: list[PropertyValue] | PropertyView,
         tags: list[str],
         url: str,
     ):
@@ -185,7 +509,7 @@ class Engine(ILoadable):
         self.name = name
         self.native_name = native_name
         self.engine_family = engine_family
-        self.property_values = EntryList(property_values)
+        self.property_values = property_values_of(property_values)
         self.tags = tags
         self.url = url
 
@@ -211,10 +535,81 @@ class JetInformation(SimpleNamespace):
         self.diffuser_pressure_increase = diffuser_pressure_increase
         self.weight = weight
 
+    @staticmethod
+    def from_engine(
+        fan_diameter: Any, compresser_ratio: Any, weight: Any
+    ) -> "JetInformation":
+        """
+        Only uses arithmetic operators, so it works on floats and NumPy arrays alike
+        """
+        inlet_area = (fan_diameter / 2) ** 2 * math.pi
+
+        # This ration is not perfect, but it's close enough
+        exit_area = inlet_area * 0.6
+
+        # 50kPa, around 4km altitude
+        inlet_pressure = 50_000
+
+        exit_pressure = inlet_pressure
+
+        # Arbitrary values taken from book
+        inlet_temperature = 1120
+        diffuser_pressure_increase = 30_000
+
+        return JetInformation(
+            inlet_area,
+            exit_area,
+            inlet_pressure,
+            exit_pressure,
+            compresser_ratio,
+            inlet_temperature,
+            diffuser_pressure_increase,
+            weight,
+        )
+
+
+# Fields of `JetInformation`, in order
+JET_INFORMATION_FIELDS = (
+    "inlet_area",
+    "exit_area",
+    "inlet_pressure",
+    "exit_pressure",
+    "compresser_ratio",
+    "inlet_temperature",
+    "diffuser_pressure_increase",
+    "weight",
+)
+
+
+class JetInformationTable(SimpleNamespace):
+    """
+    `JetInformation` of many aircraft types. `ids` and `names` are lists and
+    every field of `JET_INFORMATION_FIELDS` is a NumPy array, row by row
+    """
+
+    ids: list[str]
+    names: list[str]
+
 
 class AircraftType(ILoadable):
+    __slots__ = (
+        "aircraft_family",
+        "engine_count",
+        "engine_family",
+        "engine_models",
+        "iata_code",
+        "icao_code",
+        "manufacturer",
+        "name",
+        "native_name",
+        "property_values",
+        "tags",
+        "url",
+        "derived",
+    )
+
     @staticmethod
-    def from_data(data: Js) -> "AircraftType":
+    def from_data(data: Js, store: PropertyStore | None = None) -> "AircraftType":
         return AircraftType(
             data["id"],
             data["aircraftFamily"],
@@ -226,11 +621,25 @@ class AircraftType(ILoadable):
             DB.manufacturers[data["manufacturer"]],
             data["name"],
             data["nativeName"],
-            [PropertyValue.from_data(d) for d in data["propertyValues"]],
+            load_property_values(data, store),
             data["tags"],
             data["url"],
         )
 
+    @staticmethod
+    def indexes() -> dict[str, Index]:
+        p = AircraftType.get_engine_properties()
+        return {
+            "icao_code": HashIndex("icao_code"),
+            "iata_code": HashIndex("iata_code"),
+            "manufacturer": HashIndex(lambda item: item.manufacturer.id),
+            "engine_family": HashIndex("engine_family"),
+            "tags": HashIndex("tags", multi=True),
+            "fan_diameter": SortedIndex(engine_property_number(p.fan_diameter)),
+            "compresser_ratio": SortedIndex(engine_property_number(p.compresser_ratio)),
+            "weight": SortedIndex(engine_property_number(p.weight)),
+        }
+
     def __init__(
         self,
         id: str,
@@ -243,7 +652,7 @@ class AircraftType(ILoadable):
         manufacturer: Manufacturer,
         name: str,
         native_name: str | None,
-        property_values: list[PropertyValue],
+        property_values: list[PropertyValue] | PropertyView,
         tags: list[str],
         url: str,
     ):
@@ -257,9 +666,10 @@ class AircraftType(ILoadable):
         self.manufacturer = manufacturer
         self.name = name
         self.native_name = native_name
-        self.property_values = EntryList(property_values)
+        self.property_values = property_values_of(property_values)
         self.tags = tags
         self.url = url
+        self.derived: dict[str, tuple[Any, Any]] | None = None
 
     @staticmethod
     @cache
@@ -275,49 +685,44 @@ class AircraftType(ILoadable):
             weight="1ec851b9-dc27-6438-b99a-c98b7ffb3c70",
         )
 
-    @property
-    @cache
-    def jet_information(self) -> JetInformation | None:
+    def engine_values(self) -> tuple[float, float, float] | None:
+        """
+        Fan diameter, compresser ratio and weight of the first engine
+        """
+        p = self.get_engine_properties()
+        first = self.engine_models.first()
+        if first is None:
+            return
+        pv = first.property_values
         try:
-            p = self.get_engine_properties()
-            first = self.engine_models.first()
-            if first is None:
-                return
-            pv = first.property_values
-
-            inlet_area = (f(pv[p.fan_diameter].value) / 2) ** 2 * math.pi
-
-            # This ration is not perfect, but it's close enough
-            exit_area = inlet_area * 0.6
-
-            # 50kPa, around 4km altitude
-            inlet_pressure = 50_000
-
-            exit_pressure = inlet_pressure
-
-            compresser_ratio = f(pv[p.compresser_ratio].value)
-
-            # Arbitrary values taken from book
-            inlet_temperature = 1120
-            diffuser_pressure_increase = 30_000
-
-            weight = f(pv[p.weight].value)
-
-            return JetInformation(
-                inlet_area,
-                exit_area,
-                inlet_pressure,
-                exit_pressure,
-                compresser_ratio,
-                inlet_temperature,
-                diffuser_pressure_increase,
-                weight,
+            return (
+                f(pv[p.fan_diameter].value),
+                f(pv[p.compresser_ratio].value),
+                f(pv[p.weight].value),
             )
         except KeyError:
             return
 
+    def engine_version(self) -> tuple[Any, ...]:
+        """
+        Changes whenever `engine_values` might
+        """
+        first = self.engine_models.first()
+        if first is None:
+            return (self.engine_models.version,)
+        return (self.engine_models.version, first, first.property_values.version)
+
+    @derived(engine_version)
+    def jet_information(self) -> JetInformation | None:
+        values = self.engine_values()
+        if values is None:
+            return
+        return JetInformation.from_engine(*values)
+
 
 class AircraftModel(ILoadable):
+    __slots__ = ("aircraft_type", "url")
+
     @staticmethod
     def from_data(data: Js) -> "AircraftModel":
         return AircraftModel(
@@ -326,6 +731,10 @@ class AircraftModel(ILoadable):
             data["url"],
         )
 
+    @staticmethod
+    def indexes() -> dict[str, Index]:
+        return {"aircraft_type": HashIndex("aircraft_type")}
+
     def __init__(
         self,
         id: str,
@@ -337,34 +746,180 @@ class AircraftModel(ILoadable):
         self.url = url
 
 
-def load(path: str) -> Type[DB]:
-    data: dict[str, list[Js]] = load_files(path)  # type: ignore
+class AircraftTypeDatabase(Database[AircraftType]):
+    def jet_information_table(self) -> JetInformationTable:
+        """
+        `jet_information` of every aircraft type that has one, computed in one
+        pass with NumPy
+        """
+        ids: list[str] = []
+        names: list[str] = []
+        values: list[tuple[float, float, float]] = []
+
+        for id, aircraft_type in self.dict.items():
+            engine_values = aircraft_type.engine_values()
+            if engine_values is not None:
+                ids.append(id)
+                names.append(aircraft_type.name)
+                values.append(engine_values)
+
+        columns = np.array(values, dtype=float).reshape(-1, 3).T
+        information = JetInformation.from_engine(*columns)
+
+        return JetInformationTable(
+            ids=ids,
+            names=names,
+            **{
+                name: np.broadcast_to(
+                    np.asarray(getattr(information, name), dtype=float), (len(ids),)
+                ).copy()
+                for name in JET_INFORMATION_FIELDS
+            },
+        )
 
-    DB.properties = Database[Property](Property.from_data, data["properties"])
-    DB.engines = Database[Engine](Engine.from_data, data["engine_models"])
-    DB.manufacturers = Database[Manufacturer](
-        Manufacturer.from_data, data["manufacturers"]
-    )
-    DB.aircraft_types = Database[AircraftType](
-        AircraftType.from_data, data["aircraft_types"]
-    )
-    DB.aircraft_models = Database[AircraftModel](
-        AircraftModel.from_data, data["aircraft_models"]
-    )
+
+# Database name -> entry type, data file, the databases its loader reads and
+# the class of the database
+TABLES: dict[str, tuple[Type[Any], str, tuple[str, ...], Type[Database[Any]]]] = {
+    "properties": (Property, "properties", (), Database),
+    "engines": (Engine, "engine_models", ("properties",), Database),
+    "manufacturers": (Manufacturer, "manufacturers", ("properties",), Database),
+    "aircraft_types": (
+        AircraftType,
+        "aircraft_types",
+        ("properties", "engines", "manufacturers"),
+        AircraftTypeDatabase,
+    ),
+    "aircraft_models": (AircraftModel, "aircraft_models", (), Database),
+}
+
+
+@timed("db.load")
+def load(
+    path: str,
+    snapshot: str | None = None,
+    lazy: bool = False,
+    cache_size: int | None = 1024,
+    stream: bool = False,
+    parallel: bool = False,
+    workers: int | None = None,
+    columnar: bool = False,
+) -> Type[DB]:
+    """
+    Loads every file in the `path` folder.
+
+    With `snapshot`, the data is read from the binary snapshot at that path,
+    which is rebuilt whenever the files in `path` change.
+
+    With `lazy`, objects are only built when they are first accessed, and at
+    most `cache_size` of them are kept per database.
+
+    With `stream`, records are decoded one at a time while the databases are
+    built, instead of decoding whole files first.
+
+    With `parallel`, files are read and decoded concurrently by up to `workers`
+    threads and processes, see `loader.iter_files_concurrently`.
+
+    With `columnar`, property values are kept in one `PropertyStore` per
+    database instead of one object each
+
+    Either way, each database is built as soon as its file is decoded and the
+    databases it depends on (`TABLES`) are built
+    """
+    files: Iterable[tuple[str, Iterable[Js]]]
+    opened: Snapshot | None = None
+    if parallel:
+        if snapshot is not None or stream:
+            raise ValueError("parallel cannot be combined with snapshot or stream")
+        files = iter_files_concurrently(path, workers)
+    elif snapshot is not None:
+        opened = open_snapshot(path, snapshot)
+        files = opened.items()
+    else:
+        files = load_files(path, stream).items()
+
+    decoded: dict[str, Iterable[Js]] = {}
+    built: set[str] = set()
+
+    def loader(Entry: Type[Any]) -> Callable[[Js], Any]:
+        if not columnar or Entry not in (Manufacturer, Engine, AircraftType):
+            return Entry.from_data
+        store = PropertyStore(lambda id: DB.properties[id].type, PropertyValue)
+        return lambda data: Entry.from_data(data, store)
+
+    def build_ready():
+        for name, (Entry, filename, dependencies, Table) in TABLES.items():
+            if (
+                name not in built
+                and filename in decoded
+                and built.issuperset(dependencies)
+            ):
+                with span("db.build", table=name):
+                    setattr(
+                        DB,
+                        name,
+                        Table(
+                            loader(Entry),
+                            decoded.pop(filename),
+                            lazy,
+                            cache_size,
+                            Entry.indexes(),
+                        ),
+                    )
+                count("db.records", len(getattr(DB, name).dict))
+                built.add(name)
+
+    try:
+        for filename, records in files:
+            decoded[filename] = records
+            build_ready()
+    finally:
+        # Every table has been unpickled
+        if opened is not None:
+            opened.close()
+
+    for name, (_, filename, _, _) in TABLES.items():
+        if name not in built:
+            raise KeyError(filename)
 
     # fixup
 
     an2 = "1ed012dc-450c-6c9c-9ea9-e93d5bae89a8"
 
-    for key, value in list(DB.aircraft_types.dict.items()):
-        if key == an2:
-            del DB.aircraft_types.dict[key]
-
-    for key, value in list(DB.aircraft_models.dict.items()):
-        if value.aircraft_type == an2:
-            del DB.aircraft_models.dict[key]
+    if an2 in DB.aircraft_types:
+        del DB.aircraft_types[an2]
+
+    models = DB.aircraft_models.dict
+    if isinstance(models, LazyDict):
+        # From the records, without building every model
+        removed = [
+            key
+            for key, record in models.records.items()
+            if record is not None and record["aircraftType"] == an2
+        ]
+    else:
+        removed = [key for key, value in models.items() if value.aircraft_type == an2]
+    for key in removed:
+        del DB.aircraft_models[key]
 
     return DB
 
 
+if __name__ == "__main__":
+    import gc
+    import tracemalloc
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "./data"
+
+    for options in [{}, {"columnar": True}]:
+        gc.collect()
+        tracemalloc.start()
+        load(path, **options)
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(
+            f"{options}: retained {retained / 2**20:.2f}MiB, peak {peak / 2**20:.2f}MiB"
+        )
+
 __all__ = ["load"]
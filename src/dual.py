@@ -0,0 +1,94 @@
+"""
+Forward-mode automatic differentiation with dual numbers
+
+A `Dual` carries a value and its derivatives with respect to several inputs.
+Code that only uses arithmetic operators (like `jet_engine.cycle`) computes
+derivatives when given duals instead of floats or arrays
+"""
+
+from typing import Any
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+
+class Dual:
+    """
+    `value` is a float or an array and `tangent` holds the derivatives of
+    `value` on its first axis, one entry per input.
+    All duals taking part in one computation must have values of the same shape
+    """
+
+    __slots__ = ("value", "tangent")
+
+    # Makes `array * dual` use `Dual.__rmul__` instead of looping over the array
+    __array_ufunc__ = None
+
+    def __init__(self, value: Any, tangent: np.ndarray):
+        self.value = value
+        self.tangent = tangent
+
+    @staticmethod
+    def variables(values: list[ArrayLike]) -> list["Dual"]:
+        """
+        One dual per value, each the derivative variable of its own position
+        """
+        arrays = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in values))
+        n = len(arrays)
+        seeds = np.eye(n).reshape((n, n) + (1,) * arrays[0].ndim)
+        return [
+            Dual(array, np.broadcast_to(seeds[i], (n,) + array.shape))
+            for i, array in enumerate(arrays)
+        ]
+
+    def __repr__(self) -> str:
+        return f"Dual({self.value!r}, {self.tangent!r})"
+
+    def __neg__(self) -> "Dual":
+        return Dual(-self.value, -self.tangent)
+
+    def __add__(self, other: Any) -> "Dual":
+        if isinstance(other, Dual):
+            return Dual(self.value + other.value, self.tangent + other.tangent)
+        return Dual(self.value + other, self.tangent)
+
+    __radd__ = __add__
+
+    def __sub__(self, other: Any) -> "Dual":
+        if isinstance(other, Dual):
+            return Dual(self.value - other.value, self.tangent - other.tangent)
+        return Dual(self.value - other, self.tangent)
+
+    def __rsub__(self, other: Any) -> "Dual":
+        return Dual(other - self.value, -self.tangent)
+
+    def __mul__(self, other: Any) -> "Dual":
+        if isinstance(other, Dual):
+            return Dual(
+                self.value * other.value,
+                self.tangent * other.value + other.tangent * self.value,
+            )
+        return Dual(self.value * other, self.tangent * other)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other: Any) -> "Dual":
+        if isinstance(other, Dual):
+            value = self.value / other.value
+            return Dual(value, (self.tangent - other.tangent * value) / other.value)
+        return Dual(self.value / other, self.tangent / other)
+
+    def __rtruediv__(self, other: Any) -> "Dual":
+        value = other / self.value
+        return Dual(value, -self.tangent * value / self.value)
+
+    def __pow__(self, exponent: Any) -> "Dual":
+        if isinstance(exponent, Dual):
+            return NotImplemented
+        return Dual(
+            self.value**exponent,
+            self.tangent * (exponent * self.value ** (exponent - 1)),
+        )
+
+
+__all__ = ["Dual"]
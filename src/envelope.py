@@ -0,0 +1,235 @@
+"""
+Flight envelopes: `Turbojet` outputs over altitude, airspeed and throttle
+
+Ambient conditions come from the International Standard Atmosphere instead of
+the fixed 50kPa / 240K of `JetInformation` and `main.py`. Every engine and
+flight point is evaluated in one broadcast call of `jet_engine.cycle`
+"""
+
+from types import SimpleNamespace
+from typing import Any
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from db import JetInformationTable
+from jet_engine import CURVE_FITS, cycle
+
+# Sea level, ISA
+SEA_LEVEL_TEMPERATURE = 288.15
+SEA_LEVEL_PRESSURE = 101_325
+GRAVITY = 9.80665
+# Specific gas constant of air, J / kg K
+R_AIR = 287.053
+GAMMA = 1.4
+
+# Base altitude (m) and temperature lapse rate (K / m) of each ISA layer
+LAYERS = (
+    (0, -0.0065),
+    (11_000, 0),
+    (20_000, 0.001),
+    (32_000, 0.0028),
+    (47_000, 0),
+)
+MAX_ALTITUDE = 51_000
+
+# Outputs kept in an envelope
+OUTPUTS = ("thrust", "power", "mass_flowrate", "heat_flowrate", "efficiency")
+
+
+class Atmosphere(SimpleNamespace):
+    """
+    ISA conditions, every field is an array of the altitude shape
+    """
+
+    temperature: np.ndarray
+    pressure: np.ndarray
+    density: np.ndarray
+    speed_of_sound: np.ndarray
+
+
+def _layer_bases() -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Base altitude, lapse rate, base temperature and base pressure of each layer
+    """
+    altitudes = np.array([base for base, _ in LAYERS], dtype=float)
+    lapse = np.array([rate for _, rate in LAYERS], dtype=float)
+    temperatures = [SEA_LEVEL_TEMPERATURE]
+    pressures = [float(SEA_LEVEL_PRESSURE)]
+    for i in range(1, len(LAYERS)):
+        height = altitudes[i] - altitudes[i - 1]
+        temperature, pressure = _in_layer(
+            height, lapse[i - 1], temperatures[-1], pressures[-1]
+        )
+        temperatures.append(float(temperature))
+        pressures.append(float(pressure))
+    return altitudes, lapse, np.array(temperatures), np.array(pressures)
+
+
+def _in_layer(
+    height: Any, lapse: Any, temperature: Any, pressure: Any
+) -> tuple[Any, Any]:
+    """
+    Temperature and pressure `height` above the base of a layer
+    """
+    top = temperature + lapse * height
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gradient = pressure * (top / temperature) ** (-GRAVITY / (R_AIR * lapse))
+    isothermal = pressure * np.exp(-GRAVITY * height / (R_AIR * temperature))
+    return top, np.where(lapse == 0, isothermal, gradient)
+
+
+BASES = _layer_bases()
+
+
+def atmosphere(altitude: ArrayLike) -> Atmosphere:
+    """
+    ISA at geopotential `altitude` (m), from 0 to 51km
+    """
+    altitude = np.asarray(altitude, dtype=float)
+    if np.any(altitude < 0) or np.any(altitude > MAX_ALTITUDE):
+        raise ValueError(f"Altitude must be between 0 and {MAX_ALTITUDE}m")
+
+    base_altitude, lapse, base_temperature, base_pressure = BASES
+    layer = np.searchsorted(base_altitude, altitude, side="right") - 1
+    temperature, pressure = _in_layer(
+        altitude - base_altitude[layer],
+        lapse[layer],
+        base_temperature[layer],
+        base_pressure[layer],
+    )
+    return Atmosphere(
+        temperature=temperature,
+        pressure=pressure,
+        density=pressure / (R_AIR * temperature),
+        speed_of_sound=np.sqrt(GAMMA * R_AIR * temperature),
+    )
+
+
+class Envelope(SimpleNamespace):
+    """
+    Outputs by engine, altitude, Mach number and turbine inlet temperature.
+    Every field of `OUTPUTS` is an array of shape
+    (engines, altitudes, Mach numbers, inlet temperatures)
+    """
+
+    ids: list[str]
+    names: list[str]
+    altitude: np.ndarray
+    mach: np.ndarray
+    inlet_temperature: np.ndarray
+    atmosphere: Atmosphere
+
+    def engine(self, id: str) -> dict[str, np.ndarray]:
+        """
+        Envelope of one engine, each output of shape
+        (altitudes, Mach numbers, inlet temperatures)
+        """
+        row = self.ids.index(id)
+        return {name: getattr(self, name)[row] for name in OUTPUTS}
+
+
+def envelope(
+    engines: JetInformationTable,
+    altitude: ArrayLike,
+    mach: ArrayLike,
+    inlet_temperature: ArrayLike | None = None,
+    chunk_size: int | None = None,
+    properties: Any = CURVE_FITS,
+    dtype: Any = np.float64,
+) -> Envelope:
+    """
+    Flight envelope of every engine in `engines` (like
+    `DB.aircraft_types.jet_information_table()`).
+
+    `altitude` (m) and `mach` are 1-D axes. `inlet_temperature` (K) is the
+    throttle axis, by default each engine's own (a single NaN entry in the
+    result). Inlet and exit pressure and
+    the temperature of the incoming air follow the ISA at each altitude, and
+    the airspeed is `mach` times the local speed of sound.
+
+    With `chunk_size`, at most that many engines are evaluated at once, which
+    bounds the memory of intermediate arrays. Outputs are stored as `dtype`
+    """
+    altitude = np.atleast_1d(np.asarray(altitude, dtype=float))
+    mach = np.atleast_1d(np.asarray(mach, dtype=float))
+    air = atmosphere(altitude)
+
+    own_throttle = inlet_temperature is None
+    throttle = (
+        np.array([np.nan])
+        if own_throttle
+        else np.atleast_1d(np.asarray(inlet_temperature, dtype=float))
+    )
+
+    # (altitude, mach, throttle) axes after the engine axis
+    temperature = air.temperature[:, None, None]
+    pressure = air.pressure[:, None, None]
+    velocity = (air.speed_of_sound[:, None] * mach[None, :])[:, :, None]
+
+    count = len(engines.ids)
+    shape = (count, len(altitude), len(mach), len(throttle))
+    result = {name: np.empty(shape, dtype=dtype) for name in OUTPUTS}
+
+    step = count if chunk_size is None else max(1, chunk_size)
+    for start in range(0, count, step):
+        rows = slice(start, start + step)
+
+        def column(name: str) -> np.ndarray:
+            return getattr(engines, name)[rows, None, None, None]
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            info = cycle(
+                column("inlet_area"),
+                column("exit_area"),
+                pressure,
+                pressure,
+                column("compresser_ratio"),
+                column("inlet_temperature") if own_throttle else throttle,
+                column("diffuser_pressure_increase"),
+                temperature,
+                velocity,
+                properties,
+            )
+        for name in OUTPUTS:
+            result[name][rows] = getattr(info, name)
+
+    return Envelope(
+        ids=list(engines.ids),
+        names=list(engines.names),
+        altitude=altitude,
+        mach=mach,
+        inlet_temperature=throttle,
+        atmosphere=air,
+        **result,
+    )
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from db import load
+
+    DB = load(sys.argv[1] if len(sys.argv) > 1 else "./data")
+    table = DB.aircraft_types.jet_information_table()
+
+    altitude = np.linspace(0, 12_000, 25)
+    mach = np.linspace(0.2, 0.9, 36)
+    throttle = np.linspace(900, 1400, 6)
+    points = len(altitude) * len(mach) * len(throttle)
+
+    start = time.perf_counter()
+    result = envelope(table, altitude, mach, throttle, chunk_size=256)
+    seconds = time.perf_counter() - start
+    print(
+        f"{len(table.ids)} engines x {points} flight points in {seconds * 1000:.0f}ms "
+        f"({len(table.ids) * points / seconds / 1e6:.1f}M points/s)"
+    )
+
+    if table.ids:
+        best = np.nanargmax(result.efficiency[:, 0, -1, -1])
+        print(
+            f"most efficient at sea level, Mach {mach[-1]:.2f}, {throttle[-1]:.0f}K: "
+            f"{result.names[best]} ({result.efficiency[best, 0, -1, -1]:.3f})"
+        )
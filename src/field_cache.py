@@ -0,0 +1,168 @@
+"""
+Cache of solved `Turbojet` fields
+
+`Turbojet.calculate_grid` returns every output at once, so one solve of an
+(attr_x, attr_y) grid can color the heatmap of every `Info` metric
+"""
+
+from collections import OrderedDict
+import hashlib
+import os
+import re
+import threading
+from typing import Callable
+
+import numpy as np
+
+import jet_engine
+from instrument import allocation, count, span
+from jet_engine import PARAMETERS, Turbojet
+
+Field = dict[str, np.ndarray]
+
+# Name of the files of the cache, from the model version and the field key.
+# Nothing else in its directory is ever removed
+FILENAME = re.compile(r"fieldcache-([0-9a-f]{12})-[0-9a-f]{40}\.npz")
+
+
+def model_version() -> str:
+    """
+    Hash of the engine model source. Any change to `jet_engine.py` invalidates
+    cached fields
+    """
+    with open(jet_engine.__file__, "rb") as file:
+        return hashlib.sha1(file.read()).hexdigest()[:12]
+
+
+def field_key(
+    engine: Turbojet,
+    temperature: float,
+    velocity: float,
+    axes: dict[str, np.ndarray],
+    shape: tuple[int, ...],
+) -> str:
+    """
+    Key of the `shape` field of `engine` at the given flight condition, with
+    the parameters in `axes` replaced by coordinate arrays.
+    The coordinate arrays are hashed as a whole, which covers their ranges and
+    resolution. The property backend is part of the key through its repr
+    """
+    digest = hashlib.sha1()
+    baseline = [(name, getattr(engine, name)) for name in PARAMETERS]
+    properties = repr(engine.properties)
+    digest.update(repr((baseline, properties, temperature, velocity, shape)).encode())
+    for name, axis in sorted(axes.items()):
+        axis = np.ascontiguousarray(axis, dtype=float)
+        digest.update(repr((name, axis.shape)).encode())
+        digest.update(axis.tobytes())
+    return digest.hexdigest()
+
+
+class FieldCache:
+    """
+    LRU cache of fields, bounded to `max_bytes` in memory.
+    With `directory`, fields are also kept there as `fieldcache-*.npz` files.
+    Safe to share between threads, which may compute the same field twice
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024**2, directory: str | None = None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.version = model_version()
+        self.fields: OrderedDict[str, Field] = OrderedDict()
+        self.nbytes = 0
+        self.lock = threading.Lock()
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._remove_stale_files()
+
+    def __getstate__(self):
+        # Fields stay in the process that computed them, only the disk cache is shared
+        state = self.__dict__.copy()
+        state["fields"] = OrderedDict()
+        state["nbytes"] = 0
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(
+            self.directory or "", f"fieldcache-{self.version}-{key}.npz"
+        )
+
+    def _remove_stale_files(self):
+        for filename in os.listdir(self.directory):
+            match = FILENAME.fullmatch(filename)
+            if match and match.group(1) != self.version:
+                os.remove(os.path.join(self.directory, filename))  # type: ignore
+
+    def _remember(self, key: str, field: Field):
+        if key in self.fields:
+            self.nbytes -= sum(a.nbytes for a in self.fields.pop(key).values())
+        self.fields[key] = field
+        self.nbytes += sum(a.nbytes for a in field.values())
+
+        while self.nbytes > self.max_bytes and len(self.fields) > 1:
+            _, evicted = self.fields.popitem(last=False)
+            self.nbytes -= sum(a.nbytes for a in evicted.values())
+
+    def get(self, key: str) -> Field | None:
+        with self.lock:
+            if key in self.fields:
+                count("field_cache.hits")
+                self.fields.move_to_end(key)
+                return self.fields[key]
+
+        if self.directory is not None and os.path.exists(self._path(key)):
+            count("field_cache.disk_hits")
+            with span("field_cache.read"), np.load(self._path(key)) as file:
+                field = {name: file[name] for name in file.files}
+            with self.lock:
+                self._remember(key, field)
+            return field
+
+        count("field_cache.misses")
+        return None
+
+    def put(self, key: str, field: Field) -> Field:
+        """
+        Keeps `field` and returns the contiguous copy kept
+        """
+        field = {name: np.ascontiguousarray(value) for name, value in field.items()}
+        allocation("field_cache.fields", sum(a.nbytes for a in field.values()))
+        with self.lock:
+            self._remember(key, field)
+
+        if self.directory is not None:
+            # Written under a temporary name so readers never see half a file
+            path = self._path(key)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with span("field_cache.write"), open(tmp, "wb") as file:
+                np.savez(file, **field)
+            os.replace(tmp, path)
+        return field
+
+    def get_or_compute(self, key: str, compute: Callable[[], Field]) -> Field:
+        field = self.get(key)
+        if field is None:
+            field = self.put(key, compute())
+        return field
+
+    def clear(self):
+        """
+        Drops every field, including the files of the cache on disk
+        """
+        with self.lock:
+            self.fields.clear()
+            self.nbytes = 0
+        if self.directory is not None:
+            for filename in os.listdir(self.directory):
+                if FILENAME.fullmatch(filename):
+                    os.remove(os.path.join(self.directory, filename))
+
+
+__all__ = ["FieldCache", "field_key", "model_version"]
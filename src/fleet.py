@@ -0,0 +1,162 @@
+"""
+Fleet-wide evaluation: the `Turbojet` outputs of every aircraft type's engine
+in one vectorized call, instead of a `Turbojet` and a `calculate` per type
+"""
+
+from types import SimpleNamespace
+from typing import Any
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from db import JET_INFORMATION_FIELDS, AircraftTypeDatabase, JetInformationTable
+from jet_engine import CURVE_FITS, OUTPUTS, cycle
+
+
+class FleetTable(SimpleNamespace):
+    """
+    One row per aircraft type, indexed by `ids` and `names`. Every field of
+    `JET_INFORMATION_FIELDS` (the inputs) and of `jet_engine.OUTPUTS` is an
+    array in row order
+    """
+
+    ids: list[str]
+    names: list[str]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def take(self, rows: ArrayLike) -> "FleetTable":
+        """
+        Table of the given rows (indices or a boolean mask), in that order
+        """
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        return FleetTable(
+            ids=[self.ids[i] for i in rows],
+            names=[self.names[i] for i in rows],
+            **{
+                name: getattr(self, name)[rows]
+                for name in JET_INFORMATION_FIELDS + OUTPUTS
+            },
+        )
+
+    def row(self, id: str) -> dict[str, Any]:
+        """
+        Inputs and outputs of aircraft type `id`
+        """
+        i = self.ids.index(id)
+        values: dict[str, Any] = {"id": id, "name": self.names[i]}
+        for name in JET_INFORMATION_FIELDS + OUTPUTS:
+            values[name] = getattr(self, name)[i].item()
+        return values
+
+    def range(
+        self, metric: str, lo: float | None = None, hi: float | None = None
+    ) -> "FleetTable":
+        """
+        Rows with `lo <= metric <= hi`, in table order. NaN never matches
+        """
+        values = getattr(self, metric)
+        keep = ~np.isnan(values)
+        if lo is not None:
+            keep &= values >= lo
+        if hi is not None:
+            keep &= values <= hi
+        return self.take(keep)
+
+    def rank(
+        self, metric: str, largest: bool = True, k: int | None = None
+    ) -> "FleetTable":
+        """
+        Rows sorted by `metric`, the `k` best only if given. NaN goes last
+        """
+        values = getattr(self, metric)
+        key = -values if largest else values
+        order = np.argsort(np.where(np.isnan(key), np.inf, key), kind="stable")
+        return self.take(order[:k])
+
+
+def evaluate_fleet(
+    aircraft_types: AircraftTypeDatabase | JetInformationTable,
+    temperature: float = 273 - 33,
+    velocity: float = 200,
+    chunk_size: int | None = None,
+    properties: Any = CURVE_FITS,
+) -> FleetTable:
+    """
+    `Turbojet(**jet_information).calculate(temperature, velocity)` of every
+    aircraft type that has `jet_information`, evaluated together.
+    With `chunk_size`, at most that many types are evaluated at once
+    """
+    table = (
+        aircraft_types.jet_information_table()
+        if isinstance(aircraft_types, AircraftTypeDatabase)
+        else aircraft_types
+    )
+    count = len(table.ids)
+    outputs = {name: np.empty(count) for name in OUTPUTS}
+
+    step = count if chunk_size is None else max(1, chunk_size)
+    for start in range(0, count, step):
+        rows = slice(start, start + step)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            info = cycle(
+                table.inlet_area[rows],
+                table.exit_area[rows],
+                table.inlet_pressure[rows],
+                table.exit_pressure[rows],
+                table.compresser_ratio[rows],
+                table.inlet_temperature[rows],
+                table.diffuser_pressure_increase[rows],
+                temperature,
+                velocity,
+                properties,
+            )
+        for name in OUTPUTS:
+            outputs[name][rows] = getattr(info, name)
+
+    return FleetTable(
+        ids=list(table.ids),
+        names=list(table.names),
+        **{name: getattr(table, name) for name in JET_INFORMATION_FIELDS},
+        **outputs,
+    )
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from db import load
+    from jet_engine import Turbojet
+
+    DB = load(sys.argv[1] if len(sys.argv) > 1 else "./data")
+
+    start = time.perf_counter()
+    for aircraft_type in DB.aircraft_types.dict.values():
+        information = aircraft_type.jet_information
+        if information is not None:
+            Turbojet(
+                information.inlet_area,
+                information.exit_area,
+                information.inlet_pressure,
+                information.exit_pressure,
+                information.compresser_ratio,
+                information.inlet_temperature,
+                information.diffuser_pressure_increase,
+            ).calculate(273 - 33, 200)
+    loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fleet = evaluate_fleet(DB.aircraft_types)
+    vectorized = time.perf_counter() - start
+
+    print(f"{len(fleet)} aircraft types")
+    print(f"  Turbojet per type: {loop * 1000:.1f}ms")
+    print(f"  evaluate_fleet:    {vectorized * 1000:.1f}ms")
+    print("most thrust:")
+    top = fleet.rank("thrust", k=5)
+    for name, thrust in zip(top.names, top.thrust):
+        print(f"  {name:30} {thrust:12.0f}N")
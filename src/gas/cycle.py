@@ -0,0 +1,311 @@
+"""
+Declarative thermodynamic cycles run on `Gas` or `GasArray`
+
+A cycle is a start state and a sequence of (process, variable, value) steps.
+`compile_cycle` checks it once and turns it into a plan of lock modes and
+value resolvers. Running the plan with scalar parameters drives one `Gas`,
+with arrays it drives a `GasArray`, so a sweep over thousands of parameter
+combinations is one run
+"""
+
+from types import SimpleNamespace
+from typing import Any, Callable, Literal, NamedTuple
+
+import numpy as np
+
+from gas import FastGas, Gas, GasArray
+
+Process = Literal["isothermal", "isobaric", "isometric", "adiabatic"]
+Variable = Literal["T", "P", "V"]
+
+# Variable each process keeps constant, None for adiabatic
+PROCESS_LOCK: dict[str, Variable | None] = {
+    "isothermal": "T",
+    "isobaric": "P",
+    "isometric": "V",
+    "adiabatic": None,
+}
+
+
+class State(NamedTuple):
+    T: Any
+    P: Any
+    V: Any
+
+
+# A number, the name of a cycle parameter or a function of the parameters and
+# the states so far (the first is the start, the last the current one)
+Value = float | str | Callable[[dict[str, Any], list[State]], Any]
+
+
+class Step(NamedTuple):
+    process: Process
+    var: Variable
+    value: Value
+
+
+class Cycle(NamedTuple):
+    name: str
+    # Two of T, P and V
+    start: tuple[tuple[Variable, Value], tuple[Variable, Value]]
+    steps: tuple[Step, ...]
+    # Parameters the cycle needs, "gamma" is always available (default 1.4)
+    parameters: tuple[str, ...]
+
+
+class CycleResult(SimpleNamespace):
+    """
+    `states` has the start state and the state after every step. `work`,
+    `heat` and `entropy` have one entry per step. Every value is a float for a
+    `Gas` and an array for a `GasArray`.
+
+    Isothermal work is R T ln(V1 / V0). `Gas` accumulates T ln(V1 / V0) in `W`
+    and `dW`, without the gas constant, so the work here differs from theirs
+    by a factor R on isothermal steps
+    """
+
+    states: list[State]
+    work: list[Any]
+    heat: list[Any]
+    entropy: list[Any]
+    net_work: Any
+    heat_in: Any
+    heat_out: Any
+    efficiency: Any
+
+
+def resolve(value: Value, parameters: dict[str, Any], states: list[State]) -> Any:
+    if isinstance(value, str):
+        return parameters[value]
+    if callable(value):
+        return value(parameters, states)
+    return value
+
+
+class Plan:
+    """
+    A checked cycle. Lock changes are worked out once, so a step only locks or
+    unlocks when the process differs from the one before
+    """
+
+    def __init__(self, cycle: Cycle):
+        self.cycle = cycle
+        # (lock to set, or False to keep the current one, variable, value,
+        # whether the process is isothermal)
+        self.operations: list[
+            tuple[Variable | None | Literal[False], Variable, Value, bool]
+        ] = []
+
+        locked: Variable | None | Literal[False] = False
+        for i, step in enumerate(cycle.steps):
+            if step.process not in PROCESS_LOCK:
+                raise ValueError(f"Step {i}: unknown process {step.process!r}")
+            if step.var not in ("T", "P", "V"):
+                raise ValueError(f"Step {i}: invalid variable {step.var!r}")
+            lock = PROCESS_LOCK[step.process]
+            if lock == step.var:
+                raise ValueError(
+                    f"Step {i}: {step.process} process cannot change {step.var}"
+                )
+            self.operations.append(
+                (
+                    lock if lock != locked else False,
+                    step.var,
+                    step.value,
+                    lock == "T",
+                )
+            )
+            locked = lock
+
+    def run(self, gas: Gas | GasArray | None = None, **parameters: Any) -> CycleResult:
+        """
+        Runs the cycle on `gas`, or on a new gas in the start state. Any array
+        parameter makes the new gas a `GasArray` of the broadcast shape
+        """
+        missing = set(self.cycle.parameters) - set(parameters)
+        if missing:
+            raise TypeError(f"Missing cycle parameters: {', '.join(sorted(missing))}")
+
+        parameters.setdefault("gamma", 1.4)
+        batched = isinstance(gas, GasArray) or (
+            gas is None and any(np.ndim(v) > 0 for v in parameters.values())
+        )
+        if gas is None:
+            gas = self._start(parameters, batched)
+        else:
+            parameters["gamma"] = gas.gamma
+
+        def value(x: Any) -> Any:
+            return np.asarray(x, dtype=float) if batched else float(x)
+
+        def state() -> State:
+            return State(value(gas.T), value(gas.P), value(gas.V))
+
+        states = [state()]
+        work, heat, entropy = [], [], []
+        # Reading dS and dW resets them: drop the changes from before the
+        # cycle, so every step reads its own
+        _ = gas.dS
+        _ = gas.dW
+
+        for lock, var, target, isothermal in self.operations:
+            if lock is None:
+                gas.unlock()
+            elif lock is not False:
+                gas.lock(lock)
+            before = gas.U
+            setattr(gas, var, value(resolve(target, parameters, states)))
+
+            w = value(gas.dW)
+            if isothermal:
+                # `Gas` leaves the gas constant out of isothermal work
+                w = gas.R * w
+            work.append(w)
+            # First law, with the work done by the gas
+            heat.append(value(gas.U - before) + w)
+            entropy.append(value(gas.dS))
+            states.append(state())
+
+        heat_in = sum(np.maximum(q, 0) for q in heat)
+        heat_out = -sum(np.minimum(q, 0) for q in heat)
+        net_work = sum(work)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            efficiency = net_work / heat_in
+
+        return CycleResult(
+            states=states,
+            work=work,
+            heat=heat,
+            entropy=entropy,
+            net_work=net_work,
+            heat_in=heat_in,
+            heat_out=heat_out,
+            efficiency=efficiency,
+        )
+
+    def _start(self, parameters: dict[str, Any], batched: bool) -> Gas | GasArray:
+        start = {var: resolve(v, parameters, []) for var, v in self.cycle.start}
+        if not batched:
+            return FastGas(
+                float(parameters["gamma"]), **{k: float(v) for k, v in start.items()}
+            )
+        # The gases cover every combination of the parameters
+        shape = np.broadcast_shapes(*(np.shape(v) for v in parameters.values()))
+        return GasArray(
+            parameters["gamma"],
+            **{k: np.broadcast_to(v, shape) for k, v in start.items()},
+        )
+
+
+def compile_cycle(cycle: Cycle) -> Plan:
+    return Plan(cycle)
+
+
+def carnot_pressure(p: dict[str, Any], pressure: str, hot: bool) -> Any:
+    """
+    Pressure where the isotherm of one reservoir meets the adiabat through
+    `pressure` at the other
+    """
+    g = p["gamma"]
+    ratio = (p["Th"] / p["Tc"]) ** (g / (g - 1))
+    return p[pressure] * ratio if hot else p[pressure] / ratio
+
+
+CARNOT = Cycle(
+    "Carnot",
+    (("T", "Th"), ("P", "P_high")),
+    (
+        Step("isothermal", "P", lambda p, s: carnot_pressure(p, "P_low", True)),
+        Step("adiabatic", "T", "Tc"),
+        Step("isothermal", "P", lambda p, s: carnot_pressure(p, "P_high", False)),
+        Step("adiabatic", "T", "Th"),
+    ),
+    ("Th", "Tc", "P_high", "P_low"),
+)
+
+OTTO = Cycle(
+    "Otto",
+    (("T", "T1"), ("P", "P1")),
+    (
+        Step("adiabatic", "V", lambda p, s: s[-1].V / p["compression_ratio"]),
+        Step("isometric", "T", "T3"),
+        Step("adiabatic", "V", lambda p, s: s[0].V),
+        Step("isometric", "T", "T1"),
+    ),
+    ("T1", "P1", "compression_ratio", "T3"),
+)
+
+DIESEL = Cycle(
+    "Diesel",
+    (("T", "T1"), ("P", "P1")),
+    (
+        Step("adiabatic", "V", lambda p, s: s[-1].V / p["compression_ratio"]),
+        Step("isobaric", "V", lambda p, s: s[-1].V * p["cutoff_ratio"]),
+        Step("adiabatic", "V", lambda p, s: s[0].V),
+        Step("isometric", "T", "T1"),
+    ),
+    ("T1", "P1", "compression_ratio", "cutoff_ratio"),
+)
+
+BRAYTON = Cycle(
+    "Brayton",
+    (("T", "T1"), ("P", "P1")),
+    (
+        Step("adiabatic", "P", lambda p, s: s[-1].P * p["pressure_ratio"]),
+        Step("isobaric", "T", "T3"),
+        Step("adiabatic", "P", "P1"),
+        Step("isobaric", "T", "T1"),
+    ),
+    ("T1", "P1", "pressure_ratio", "T3"),
+)
+
+CYCLES = {cycle.name: cycle for cycle in (CARNOT, OTTO, DIESEL, BRAYTON)}
+
+
+if __name__ == "__main__":
+    import time
+
+    carnot = compile_cycle(CARNOT)
+    result = carnot.run(Th=600, Tc=300, P_high=20 * 100_000, P_low=1 * 100_000)
+    print(
+        f"Carnot: efficiency {result.efficiency:.4f}, 1 - Tc/Th = {1 - 300 / 600:.4f}"
+    )
+
+    for name, parameters in [
+        ("Otto", dict(T1=300, P1=100_000, compression_ratio=8, T3=1800)),
+        ("Diesel", dict(T1=300, P1=100_000, compression_ratio=18, cutoff_ratio=2)),
+        ("Brayton", dict(T1=300, P1=100_000, pressure_ratio=10, T3=1400)),
+    ]:
+        result = compile_cycle(CYCLES[name]).run(**parameters)
+        closed = all(
+            np.isclose(a, b) for a, b in zip(result.states[0], result.states[-1])
+        )
+        print(
+            f"{name}: efficiency {result.efficiency:.4f}, "
+            f"net work {result.net_work:.1f}, closed {closed}"
+        )
+
+    # Sweep: 100 hot x 100 cold temperatures at 10 pressure ratios
+    Th = np.linspace(500, 1500, 100)[:, None, None]
+    Tc = np.linspace(250, 450, 100)[None, :, None]
+    P_high = np.linspace(10, 50, 10)[None, None, :] * 100_000
+    # Low enough that every isothermal step expands (P_low * (Th / Tc)^3.5 < P_high)
+    P_low = 1000
+
+    start = time.perf_counter()
+    sweep = carnot.run(Th=Th, Tc=Tc, P_high=P_high, P_low=P_low)
+    vectorized = time.perf_counter() - start
+    error = np.nanmax(np.abs(sweep.efficiency - (1 - Tc / Th)))
+
+    start = time.perf_counter()
+    for th in Th.ravel()[:10]:
+        for tc in Tc.ravel():
+            for p in P_high.ravel():
+                carnot.run(Th=th, Tc=tc, P_high=p, P_low=P_low)
+    loop = (time.perf_counter() - start) * 10
+
+    print(
+        f"Carnot sweep of {sweep.efficiency.size} cycles: {vectorized * 1000:.0f}ms "
+        f"vectorized, ~{loop * 1000:.0f}ms one Gas at a time, "
+        f"max error against 1 - Tc/Th {error:.1e}"
+    )
@@ -1,7 +1,10 @@
+import functools
 import math
 
-from typing import Literal
+from typing import Any, Literal, NamedTuple
 
+import numpy as np
+from numpy.typing import ArrayLike
 
 Fo = float | None
 
@@ -254,4 +257,450 @@ class Gas:
         return self.atomic_mass / self.V
 
 
-__all__ = ["Gas"]
+class Exponents(NamedTuple):
+    """
+    Exponents of the adiabatic relations for one gamma, as factors on
+    logarithms: setting T changes ln P by `t_p` times the change of ln T.
+    `C_p` is the heat capacity at constant pressure
+    """
+
+    C_v: float
+    C_p: float
+    t_p: float
+    t_v: float
+    p_t: float
+    p_v: float
+    v_t: float
+    v_p: float
+
+
+@functools.lru_cache(maxsize=None)
+def exponents(gamma: float) -> Exponents:
+    return Exponents(
+        C_v=Gas.R / (gamma - 1),
+        C_p=Gas.R / (gamma - 1) + Gas.R,
+        t_p=gamma / (gamma - 1),
+        t_v=-1 / (gamma - 1),
+        p_t=(gamma - 1) / gamma,
+        p_v=-1 / gamma,
+        v_t=1 - gamma,
+        v_p=-gamma,
+    )
+
+
+class FastGas(Gas):
+    """
+    `Gas` with its state also kept as ln T, ln P and ln V. A transition takes
+    the logarithm of the new value, moves the others by additions with the
+    exponents cached for gamma and needs at most one exp (adiabatic), the third
+    variable following from PV = RT. Entropy changes are differences of the
+    logarithms and adiabatic work is C_v (T0 - T), both exact for an ideal gas.
+
+    Same results as `Gas` to rounding, see `gas_benchmark.py`
+    """
+
+    def __init__(
+        self,
+        gamma: float = 1.4,
+        atomic_mass: float = 28.97,
+        T: Fo = None,
+        P: Fo = None,
+        V: Fo = None,
+    ):
+        super().__init__(gamma, atomic_mass, T, P, V)
+        self._exponents = exponents(gamma)
+        self._lnT = math.log(self._T)
+        self._lnP = math.log(self._P)
+        self._lnV = math.log(self._V)
+
+    @staticmethod
+    def stp_air():
+        return FastGas(T=Gas.st, P=Gas.sp)
+
+    @property
+    def T(self):
+        return self._T
+
+    @property
+    def P(self):
+        return self._P
+
+    @property
+    def V(self):
+        return self._V
+
+    def _advance(self, T: float, P: float, V: float, dlnT: float, dlnV: float):
+        """
+        Moves to the new state, accumulating entropy and work
+        """
+        self._current_S += self._exponents.C_v * dlnT + self.R * dlnV
+
+        if self.locked == "P":
+            self._current_work += P * (V - self._V)
+        elif self.locked == "T":
+            self._current_work += T * dlnV
+        elif self.locked is None:
+            self._current_work += self._exponents.C_v * (self._T - T)
+
+        self._T = T
+        self._P = P
+        self._V = V
+
+    @T.setter
+    def T(self, T: float):
+        self.check_lockmode("T")
+        d = math.log(T) - self._lnT
+        self._lnT += d
+
+        if self.locked == "P":
+            # The most common transition, inlined: only V follows T
+            V = self.R * T / self._P
+            self._lnV += d
+            self._current_S += self._exponents.C_p * d
+            self._current_work += self._P * (V - self._V)
+            self._T = T
+            self._V = V
+        elif self.locked == "V":
+            self._lnP += d
+            self._advance(T, self.R * T / self._V, self._V, d, 0)
+        elif self.locked is None:
+            self._lnP += d * self._exponents.t_p
+            self._lnV += d * self._exponents.t_v
+            P = math.exp(self._lnP)
+            self._advance(T, P, self.R * T / P, d, d * self._exponents.t_v)
+        else:
+            raise self._invalid_lock_exception()
+
+    @P.setter
+    def P(self, P: float):
+        self.check_lockmode("P")
+        d = math.log(P) - self._lnP
+        self._lnP += d
+
+        if self.locked == "V":
+            self._lnT += d
+            self._advance(P * self._V / self.R, P, self._V, d, 0)
+        elif self.locked == "T":
+            self._lnV -= d
+            self._advance(self._T, P, self.R * self._T / P, 0, -d)
+        elif self.locked is None:
+            self._lnT += d * self._exponents.p_t
+            self._lnV += d * self._exponents.p_v
+            T = math.exp(self._lnT)
+            self._advance(
+                T, P, self.R * T / P, d * self._exponents.p_t, d * self._exponents.p_v
+            )
+        else:
+            raise self._invalid_lock_exception()
+
+    @V.setter
+    def V(self, V: float):
+        self.check_lockmode("V")
+        d = math.log(V) - self._lnV
+        self._lnV += d
+
+        if self.locked == "P":
+            # Inlined like setting T at constant pressure
+            self._lnT += d
+            self._current_S += self._exponents.C_p * d
+            self._current_work += self._P * (V - self._V)
+            self._T = self._P * V / self.R
+            self._V = V
+        elif self.locked == "T":
+            self._lnP -= d
+            self._advance(self._T, self.R * self._T / V, V, 0, d)
+        elif self.locked is None:
+            self._lnT += d * self._exponents.v_t
+            self._lnP += d * self._exponents.v_p
+            T = math.exp(self._lnT)
+            self._advance(T, self.R * T / V, V, d * self._exponents.v_t, d)
+        else:
+            raise self._invalid_lock_exception()
+
+
+class GasArray:
+    """
+    Many `Gas` at once: T, P, V, S and W of every gas are NumPy arrays of one
+    shape, and every gas has its own lock mode. Transitions apply to all gases
+    (or those selected by `where`) with the same results as `Gas` element by
+    element, including the `dS` / `dW` accumulate-and-reset semantics
+    """
+
+    R = Gas.R
+
+    # Lock mode of every gas, "" is adiabatic (None for `Gas`)
+    lock_modes = ("P", "T", "V", "")
+
+    def __init__(
+        self,
+        gamma: ArrayLike = 1.4,
+        atomic_mass: ArrayLike = 28.97,
+        T: ArrayLike | None = None,
+        P: ArrayLike | None = None,
+        V: ArrayLike | None = None,
+    ):
+        """
+        Like `Gas`, with arrays (or scalars) that broadcast together
+        """
+        if (v := len([d for d in [T, P, V] if d is not None])) != 2:
+            raise ValueError(
+                f"Must specify exactly two of T, P, V. {v} variables given"
+            )
+        arrays = np.broadcast_arrays(
+            *(
+                np.asarray(value, dtype=float)
+                for value in (gamma, atomic_mass, T, P, V)
+                if value is not None
+            )
+        )
+        self.gamma, self.atomic_mass = (a.copy() for a in arrays[:2])
+        given = iter(arrays[2:])
+        _T, _P, _V = (next(given) if d is not None else None for d in [T, P, V])
+
+        self.C_v = self.R / (self.gamma - 1)
+
+        self._T = _T.copy() if _T is not None else f(_P) * f(_V) / self.R
+        self._P = _P.copy() if _P is not None else f(_V) * self.R / self._T
+        self._V = self.R * self._T / self._P
+
+        self.locked = np.full(self._T.shape, "", dtype="<U1")
+
+        self._S = np.zeros(self._T.shape)
+        self._current_S = np.zeros(self._T.shape)
+
+        self._W = np.zeros(self._T.shape)
+        self._current_work = np.zeros(self._T.shape)
+
+    @staticmethod
+    def stp_air(shape: int | tuple[int, ...] = 1) -> "GasArray":
+        return GasArray(T=np.full(shape, Gas.st), P=np.full(shape, Gas.sp))
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        return self._T.shape
+
+    def __len__(self) -> int:
+        return len(self._T)
+
+    @property
+    def T(self) -> np.ndarray:
+        return self._T
+
+    @property
+    def P(self) -> np.ndarray:
+        return self._P
+
+    @property
+    def V(self) -> np.ndarray:
+        return self._V
+
+    def lock(self, var: Literal["P", "T", "V"], where: ArrayLike | None = None):
+        """
+        Locks `var` of every gas, or of those selected by the mask or indices
+        `where`
+        """
+        if var not in ["P", "T", "V"]:
+            raise ValueError("Invalid variable. Must be P, T or V")
+        self.locked[self._selection(where)] = var
+
+    def unlock(self, where: ArrayLike | None = None):
+        self.locked[self._selection(where)] = ""
+
+    def _selection(self, where: ArrayLike | None) -> Any:
+        return ... if where is None else where
+
+    def _mask(self, where: ArrayLike | None) -> np.ndarray:
+        mask = np.zeros(self.shape, dtype=bool)
+        mask[self._selection(where)] = True
+        return mask
+
+    def _update_variables(
+        self, P: np.ndarray, V: np.ndarray, T: np.ndarray, mask: np.ndarray
+    ):
+        """
+        Also used to update entropy and work, of the gases in `mask` only
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dS = self.C_v * np.log(T / self._T) + self.R * np.log(V / self._V)
+
+            # Calculate work done, in the same order of cases as `Gas`
+            same_V = self._V == V
+            same_P = self._P == P
+            adiabatic = self.locked == ""
+            isothermal = self.locked == "T"
+            if np.any(mask & ~same_V & ~same_P & ~adiabatic & ~isothermal):
+                raise Exception("The code is wrong")
+
+            g = self.gamma
+            work = np.where(
+                same_V,
+                0,
+                np.where(
+                    same_P,
+                    P * (V - self._V),
+                    np.where(
+                        adiabatic,
+                        P * V**g * (V ** (1 - g) - self._V ** (1 - g)) / (1 - g),
+                        T * np.log(V / self._V),
+                    ),
+                ),
+            )
+
+        self._current_S += np.where(mask, dS, 0)
+        self._current_work += np.where(mask, work, 0)
+
+        self._P = np.where(mask, P, self._P)
+        self._V = np.where(mask, V, self._V)
+        self._T = np.where(mask, T, self._T)
+
+    def check_lockmode(self, var: Literal["P", "T", "V"], mask: np.ndarray):
+        locked = mask & (self.locked == var)
+        if locked.any():
+            raise ValueError(
+                f"Cannot change {Gas.symbol_meaning[var]} in "
+                f"{Gas.lock_mode_text[var]} process ({locked.sum()} gases)"
+            )
+
+    def set(
+        self,
+        var: Literal["P", "T", "V"],
+        value: ArrayLike,
+        where: ArrayLike | None = None,
+    ):
+        """
+        Changes `var` to `value` following the lock mode of each gas. With
+        `where`, only the selected gases change
+        """
+        mask = self._mask(where)
+        self.check_lockmode(var, mask)
+        value = np.broadcast_to(np.asarray(value, dtype=float), self.shape)
+        # Unselected gases go through a no-op transition
+        value = np.where(mask, value, getattr(self, f"_{var}"))
+
+        g = self.gamma
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if var == "T":
+                T = value
+                ratio = T / self._T
+                _P = np.select(
+                    [self.locked == "V", self.locked == ""],
+                    [self._P * ratio, self._P * (self._T / T) ** (g / (1 - g))],
+                    self._P,
+                )
+                _V = np.select(
+                    [self.locked == "P", self.locked == ""],
+                    [self._V * ratio, self._V * (self._T / T) ** (1 / (g - 1))],
+                    self._V,
+                )
+                self._update_variables(_P, _V, T, mask)
+            elif var == "P":
+                P = value
+                _T = np.select(
+                    [self.locked == "V", self.locked == ""],
+                    [self._T * (P / self._P), self._T * (self._P / P) ** ((1 - g) / g)],
+                    self._T,
+                )
+                _V = np.select(
+                    [self.locked == "T", self.locked == ""],
+                    [self._V * (self._P / P), self._V * (self._P / P) ** (1 / g)],
+                    self._V,
+                )
+                self._update_variables(P, _V, _T, mask)
+            elif var == "V":
+                V = value
+                _T = np.select(
+                    [self.locked == "P", self.locked == ""],
+                    [self._T * (V / self._V), self._T * (self._V / V) ** (g - 1)],
+                    self._T,
+                )
+                _P = np.select(
+                    [self.locked == "T", self.locked == ""],
+                    [self._P * (self._V / V), self._P * (self._V / V) ** g],
+                    self._P,
+                )
+                self._update_variables(_P, V, _T, mask)
+            else:
+                raise ValueError("Invalid variable. Must be P, T or V")
+
+    @T.setter
+    def T(self, T: ArrayLike):
+        self.set("T", T)
+
+    @P.setter
+    def P(self, P: ArrayLike):
+        self.set("P", P)
+
+    @V.setter
+    def V(self, V: ArrayLike):
+        self.set("V", V)
+
+    @property
+    def U(self) -> np.ndarray:
+        return self.R * self._T / (self.gamma - 1)
+
+    @property
+    def H(self) -> np.ndarray:
+        return self.U + self._P * self._V
+
+    @property
+    def S(self) -> np.ndarray:
+        """
+        Sets dS to 0 and returns current entropy
+        """
+        self.dS
+        return self._S.copy()
+
+    @property
+    def W(self) -> np.ndarray:
+        """
+        Sets dW to 0 and returns current work
+        """
+        self.dW
+        return self._W.copy()
+
+    @property
+    def dS(self) -> np.ndarray:
+        """
+        Returns entropy change. Obtaining this value will set this value to 0 and update absolute entropy
+        """
+        dS = self._current_S - self._S
+        self._S = self._current_S.copy()
+        return dS
+
+    @property
+    def dW(self) -> np.ndarray:
+        """
+        Returns work done. Obtaining this value will set this value to 0 and update total work
+        """
+        dW = self._current_work
+        self._W = self._W + self._current_work
+        self._current_work = np.zeros(self.shape)
+        return dW
+
+    @property
+    def density(self) -> np.ndarray:
+        return self.atomic_mass / self.V
+
+    def gas(self, index: Any) -> Gas:
+        """
+        The gas at `index` as a `Gas`, with its lock mode, entropy and work
+        """
+        gas = Gas(
+            float(self.gamma[index]),
+            float(self.atomic_mass[index]),
+            T=float(self._T[index]),
+            P=float(self._P[index]),
+        )
+        gas._V = float(self._V[index])
+        gas.locked = self.locked[index] or None  # type: ignore
+        gas._S = float(self._S[index])
+        gas._current_S = float(self._current_S[index])
+        gas._W = float(self._W[index])
+        gas._current_work = float(self._current_work[index])
+        return gas
+
+    def __repr__(self):
+        return f"GasArray(shape={self.shape}, T={self.T}, P={self.P}, V={self.V})"
+
+
+__all__ = ["Gas", "FastGas", "GasArray"]
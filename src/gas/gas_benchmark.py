@@ -0,0 +1,119 @@
+"""
+Microbenchmarks of `FastGas` against `Gas`, and a regression check that both
+stay within `TOLERANCE` over a long random chain of transitions.
+Exits with status 1 if they do not
+"""
+
+import random
+import sys
+import time
+
+from gas import FastGas, Gas
+
+# Relative difference allowed between `FastGas` and `Gas`
+TOLERANCE = 1e-9
+
+# (lock mode, variable set, the two values it alternates between)
+TRANSITIONS = [
+    ("T", "V", (0.02, 0.04)),
+    ("T", "P", (100_000, 200_000)),
+    ("P", "T", (300, 600)),
+    ("P", "V", (0.02, 0.04)),
+    ("V", "T", (300, 600)),
+    ("V", "P", (100_000, 200_000)),
+    (None, "T", (300, 600)),
+    (None, "P", (100_000, 200_000)),
+    (None, "V", (0.02, 0.04)),
+]
+
+
+def time_transition(cls: type[Gas], lock, var: str, values, steps: int) -> float:
+    """
+    Seconds per transition, best of 5
+    """
+    best = float("inf")
+    for _ in range(5):
+        gas = cls.stp_air()
+        if lock is not None:
+            gas.lock(lock)
+        a, b = values
+        start = time.perf_counter()
+        for _ in range(steps // 2):
+            setattr(gas, var, a)
+            setattr(gas, var, b)
+        best = min(best, time.perf_counter() - start)
+    return best / steps
+
+
+# Range of the values a random chain sets
+RANGES = {"T": (250, 1500), "P": (50_000, 5_000_000), "V": (0.001, 0.1)}
+
+
+def random_chain(steps: int, seed: int = 0) -> list:
+    """
+    Transitions (lock mode, variable, new value)
+    """
+    rng = random.Random(seed)
+    chain = []
+    for _ in range(steps):
+        lock = rng.choice(["P", "T", "V", None])
+        var = rng.choice([v for v in "TPV" if v != lock])
+        chain.append((lock, var, rng.uniform(*RANGES[var])))
+    return chain
+
+
+def run_chain(cls: type[Gas], chain: list) -> list[tuple[float, ...]]:
+    """
+    T, P, V, entropy and work after every transition
+    """
+    gas = cls(T=400, P=300_000)
+    states = []
+    for lock, var, value in chain:
+        if lock is None:
+            gas.unlock()
+        else:
+            gas.lock(lock)
+        setattr(gas, var, value)
+        states.append((gas.T, gas.P, gas.V, gas.S, gas.W))
+    return states
+
+
+def max_difference(expected: list, actual: list) -> float:
+    """
+    Largest difference, relative to the magnitude of each quantity
+    """
+    worst = 0.0
+    for column in range(len(expected[0])):
+        scale = max(abs(state[column]) for state in expected) or 1
+        for a, b in zip(expected, actual):
+            worst = max(worst, abs(a[column] - b[column]) / scale)
+    return worst
+
+
+if __name__ == "__main__":
+    steps = 100_000
+    print(f"{'lock':>6} {'set':>4} {'Gas':>9} {'FastGas':>9} {'speedup':>8}")
+    for lock, var, values in TRANSITIONS:
+        slow = time_transition(Gas, lock, var, values, steps)
+        fast = time_transition(FastGas, lock, var, values, steps)
+        print(
+            f"{lock or '-':>6} {var:>4} {slow * 1e9:7.0f}ns {fast * 1e9:7.0f}ns "
+            f"{slow / fast:7.2f}x"
+        )
+
+    chain = random_chain(steps)
+    start = time.perf_counter()
+    expected = run_chain(Gas, chain)
+    slow = time.perf_counter() - start
+    start = time.perf_counter()
+    actual = run_chain(FastGas, chain)
+    fast = time.perf_counter() - start
+    difference = max_difference(expected, actual)
+    print(
+        f"chain of {steps} random transitions: {slow * 1000:.0f}ms Gas, "
+        f"{fast * 1000:.0f}ms FastGas, max relative difference {difference:.1e}"
+    )
+
+    if not difference <= TOLERANCE:
+        print(f"regression: difference above {TOLERANCE:.0e}")
+        sys.exit(1)
@@ -0,0 +1,147 @@
+"""
+Secondary indexes over the items of a `db.Database`
+
+Indexes store item ids, so they work the same for eager and lazy databases
+"""
+
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right, insort
+from operator import attrgetter, itemgetter
+from typing import Any, Callable, Hashable, Iterable
+
+
+class Index(ABC):
+    """
+    Base class. `key` is an attribute name or a function of the item.
+    Subclasses implement `add` and `remove`
+    """
+
+    def __init__(self, key: str | Callable[[Any], Any]):
+        self.key: Callable[[Any], Any] = (
+            attrgetter(key) if isinstance(key, str) else key
+        )
+        # id -> indexed value, so items can be removed without rebuilding them
+        self.values: dict[str, Any] = {}
+        self.built = False
+
+    @abstractmethod
+    def add(self, id: str, item: Any):
+        pass
+
+    @abstractmethod
+    def remove(self, id: str):
+        pass
+
+
+class HashIndex(Index):
+    """
+    Equality index. With `multi`, the key returns several values (like tags) and
+    the item is found by any of them
+    """
+
+    def __init__(self, key: str | Callable[[Any], Any], multi: bool = False):
+        super().__init__(key)
+        self.multi = multi
+        # value -> ids, in insertion order
+        self.ids: dict[Hashable, dict[str, None]] = {}
+
+    def add(self, id: str, item: Any):
+        value = self.key(item)
+        self.values[id] = value
+        for v in value if self.multi else [value]:
+            self.ids.setdefault(v, {})[id] = None
+
+    def remove(self, id: str):
+        value = self.values.pop(id)
+        for v in value if self.multi else [value]:
+            ids = self.ids[v]
+            del ids[id]
+            if not ids:
+                del self.ids[v]
+
+    def get(self, value: Hashable) -> list[str]:
+        return list(self.ids.get(value, ()))
+
+
+class SortedIndex(Index):
+    """
+    Numeric index for range and top-k lookups.
+    Items whose key is None are left out
+    """
+
+    def __init__(self, key: str | Callable[[Any], Any]):
+        super().__init__(key)
+        self.entries: list[tuple[float, str]] = []
+
+    def add(self, id: str, item: Any):
+        value = self.key(item)
+        if value is None:
+            return
+        self.values[id] = value
+        insort(self.entries, (value, id))
+
+    def remove(self, id: str):
+        if id not in self.values:
+            return
+        entry = (self.values.pop(id), id)
+        del self.entries[bisect_left(self.entries, entry)]
+
+    def range(self, lo: float | None = None, hi: float | None = None) -> list[str]:
+        """
+        Ids with `lo <= value <= hi`, in ascending order of value
+        """
+        value = itemgetter(0)
+        start = 0 if lo is None else bisect_left(self.entries, lo, key=value)
+        end = (
+            len(self.entries)
+            if hi is None
+            else bisect_right(self.entries, hi, key=value)
+        )
+        return [id for _, id in self.entries[start:end]]
+
+    def top(self, k: int, largest: bool = True) -> list[str]:
+        entries = self.entries[::-1] if largest else self.entries
+        return [id for _, id in entries[:k]]
+
+
+class Query:
+    """
+    Intersection of index lookups on a database, built with `Database.query`
+    """
+
+    def __init__(self, database: Any):
+        self.database = database
+        self.ids: list[str] | None = None
+
+    def _narrow(self, ids: Iterable[str]) -> "Query":
+        if self.ids is None:
+            self.ids = list(ids)
+        else:
+            keep = set(ids)
+            self.ids = [id for id in self.ids if id in keep]
+        return self
+
+    def where(self, name: str, value: Hashable) -> "Query":
+        return self._narrow(self.database.index(name).get(value))
+
+    def range(
+        self, name: str, lo: float | None = None, hi: float | None = None
+    ) -> "Query":
+        return self._narrow(self.database.index(name).range(lo, hi))
+
+    def top(self, name: str, k: int, largest: bool = True) -> list[Any]:
+        index: SortedIndex = self.database.index(name)
+        if self.ids is None:
+            return [self.database[id] for id in index.top(k, largest)]
+        ids = [id for id in self.ids if id in index.values]
+        ids.sort(key=index.values.__getitem__, reverse=largest)
+        return [self.database[id] for id in ids[:k]]
+
+    def ids_list(self) -> list[str]:
+        return list(self.database.dict) if self.ids is None else list(self.ids)
+
+    def all(self) -> list[Any]:
+        return [self.database[id] for id in self.ids_list()]
+
+
+__all__ = ["Index", "HashIndex", "SortedIndex", "Query"]
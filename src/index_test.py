@@ -0,0 +1,102 @@
+"""
+Checks that index lookups of `db.Database` match a linear scan of its items.
+Runs with pytest or as a script from src/
+"""
+
+import random
+from types import SimpleNamespace
+
+from db import Database
+from index import HashIndex, SortedIndex
+
+
+def records(n: int = 500, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"item-{i}",
+            "country": rng.choice(["FR", "US", "RU", "CN"]),
+            "tags": rng.sample(["a", "b", "c", "d"], rng.randint(0, 3)),
+            # Some items have no value and are left out of the sorted index
+            "weight": rng.choice([None, rng.uniform(0, 100), 50.0]),
+        }
+        for i in range(n)
+    ]
+
+
+def database(lazy: bool) -> Database:
+    return Database(
+        lambda data: SimpleNamespace(**data),
+        records(),
+        lazy=lazy,
+        cache_size=16,
+        indexes={
+            "country": HashIndex("country"),
+            "tags": HashIndex("tags", multi=True),
+            "weight": SortedIndex("weight"),
+        },
+    )
+
+
+def ids(items: list) -> list[str]:
+    return [item.id for item in items]
+
+
+def check(db: Database):
+    items = [db[id] for id in db.dict]
+    weighted = [item for item in items if item.weight is not None]
+
+    for country in ["FR", "US", "RU", "CN", "XX"]:
+        assert ids(db.find("country", country)) == [
+            item.id for item in items if item.country == country
+        ]
+    for tag in "abcde":
+        assert ids(db.find("tags", tag)) == [
+            item.id for item in items if tag in item.tags
+        ]
+
+    for lo, hi in [(None, None), (10, 60), (50, 50), (None, 20), (90, None)]:
+        expected = sorted(
+            (item.weight, item.id)
+            for item in weighted
+            if (lo is None or lo <= item.weight) and (hi is None or item.weight <= hi)
+        )
+        assert ids(db.range("weight", lo, hi)) == [id for _, id in expected]
+
+    by_weight = sorted(weighted, key=lambda item: (item.weight, item.id))
+    assert [item.weight for item in db.top("weight", 10)] == [
+        item.weight for item in by_weight[::-1][:10]
+    ]
+    assert ids(db.top("weight", 10, largest=False)) == ids(by_weight[:10])
+
+    # Combined lookups are intersections
+    query = db.query().where("country", "FR").range("weight", 20, 80)
+    assert query.ids_list() == [
+        item.id
+        for item in items
+        if item.country == "FR" and item.weight is not None and 20 <= item.weight <= 80
+    ]
+
+
+def test_lookups_match_scan():
+    for lazy in [False, True]:
+        check(database(lazy))
+
+
+def test_indexes_follow_changes():
+    for lazy in [False, True]:
+        db = database(lazy)
+        check(db)
+        del db["item-3"]
+        del db["item-10"]
+        db["item-4"] = SimpleNamespace(
+            id="item-4", country="XX", tags=["e"], weight=1.5
+        )
+        db["new"] = SimpleNamespace(id="new", country="FR", tags=[], weight=None)
+        check(db)
+
+
+if __name__ == "__main__":
+    test_lookups_match_scan()
+    test_indexes_follow_changes()
+    print("index lookups match a linear scan")
@@ -0,0 +1,326 @@
+"""
+Timing spans, call counters and allocation counters for the hot paths
+
+The loader, `db.load`, the engine model and the renderer report here. Nothing
+is recorded until `enable()`; until then `span` hands out one shared no-op
+context manager and `count` / `allocation` return after checking a flag, so
+the calls can stay in hot paths. Recordings export as a JSON report or a
+Chrome trace (chrome://tracing, Perfetto), and worker processes send theirs
+back with `collect` / `merge`
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+from typing import Any, Callable
+
+ENABLED = False
+# Spans also record the net bytes allocated in them (tracemalloc, slow)
+MEMORY = False
+
+# (name, start ns, duration ns, pid, thread id, args, bytes allocated or None)
+Event = tuple[str, int, int, int, int, dict[str, Any], int | None]
+
+_events: list[Event] = []
+# name -> number of calls or items
+_counters: dict[str, int] = {}
+# name -> [allocations, bytes]
+_allocations: dict[str, list[int]] = {}
+_lock = threading.Lock()
+# Start of the recording, trace timestamps are relative to it
+_origin = time.perf_counter_ns()
+
+_NULL = nullcontext()
+
+
+class Span:
+    """
+    Times the block it wraps into one event
+    """
+
+    __slots__ = ("name", "args", "start", "memory")
+
+    def __init__(self, name: str, args: dict[str, Any]):
+        self.name = name
+        self.args = args
+
+    def __enter__(self) -> "Span":
+        self.memory = tracemalloc.get_traced_memory()[0] if MEMORY else None
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc: Any):
+        end = time.perf_counter_ns()
+        allocated = None
+        if self.memory is not None:
+            allocated = tracemalloc.get_traced_memory()[0] - self.memory
+        _events.append(
+            (
+                self.name,
+                self.start - _origin,
+                end - self.start,
+                os.getpid(),
+                threading.get_ident(),
+                self.args,
+                allocated,
+            )
+        )
+
+
+def span(name: str, **args: Any) -> Any:
+    """
+    Context manager timing its block as `name`, `args` are kept in the trace
+    """
+    if not ENABLED:
+        return _NULL
+    return Span(name, args)
+
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    """
+    Decorator timing every call of a function as `name`
+    """
+
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not ENABLED:
+                return function(*args, **kwargs)
+            with Span(name, {}):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(name: str, n: int = 1):
+    """
+    Adds `n` to the counter `name`
+    """
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def allocation(name: str, nbytes: int):
+    """
+    Records one allocation of `nbytes` under `name`, like a new array's `nbytes`
+    """
+    if not ENABLED:
+        return
+    with _lock:
+        totals = _allocations.setdefault(name, [0, 0])
+        totals[0] += 1
+        totals[1] += nbytes
+
+
+def enable(memory: bool = False):
+    """
+    Starts recording. With `memory`, spans also record net allocated bytes
+    """
+    global ENABLED, MEMORY
+    ENABLED = True
+    MEMORY = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    global ENABLED, MEMORY
+    ENABLED = False
+    MEMORY = False
+
+
+def reset():
+    """
+    Drops everything recorded so far
+    """
+    global _origin
+    with _lock:
+        _events.clear()
+        _counters.clear()
+        _allocations.clear()
+        _origin = time.perf_counter_ns()
+
+
+def recording() -> dict[str, Any]:
+    """
+    Everything recorded in this process, picklable for `merge`
+    """
+    with _lock:
+        return {
+            "origin": _origin,
+            "events": list(_events),
+            "counters": dict(_counters),
+            "allocations": {name: list(v) for name, v in _allocations.items()},
+        }
+
+
+def merge(other: dict[str, Any]):
+    """
+    Adds a `recording` from another process
+    """
+    # perf_counter_ns is system wide on Linux, so events line up with ours
+    shift = other["origin"] - _origin
+    with _lock:
+        for name, start, duration, *rest in other["events"]:
+            _events.append((name, start + shift, duration, *rest))  # type: ignore
+        for name, n in other["counters"].items():
+            _counters[name] = _counters.get(name, 0) + n
+        for name, (allocations, nbytes) in other["allocations"].items():
+            totals = _allocations.setdefault(name, [0, 0])
+            totals[0] += allocations
+            totals[1] += nbytes
+
+
+def collect(
+    enabled: bool, memory: bool, function: Callable, *args: Any
+) -> tuple[Any, Any]:
+    """
+    Runs `function(*args)` in a worker process, recording if `enabled` (with
+    allocations if `memory`, see `enable`). The flags are passed in because
+    the worker's own globals depend on how it was started.
+    Returns its result and the recording (None if not enabled) for `merge`
+    """
+    if not enabled:
+        return function(*args), None
+    # Workers are reused for later tasks, which get the state they had before
+    previous = ENABLED, MEMORY
+    started = memory and not tracemalloc.is_tracing()
+    reset()
+    enable(memory)
+    try:
+        return function(*args), recording()
+    finally:
+        reset()
+        disable()
+        if started:
+            tracemalloc.stop()
+        if previous[0]:
+            enable(previous[1])
+
+
+def report() -> dict[str, Any]:
+    """
+    Totals per span name (seconds), counters and allocation counters
+    """
+    spans: dict[str, dict[str, Any]] = {}
+    with _lock:
+        for name, _, duration, _, _, _, allocated in _events:
+            seconds = duration / 1e9
+            entry = spans.setdefault(
+                name, {"calls": 0, "total": 0.0, "min": seconds, "max": seconds}
+            )
+            entry["calls"] += 1
+            entry["total"] += seconds
+            entry["min"] = min(entry["min"], seconds)
+            entry["max"] = max(entry["max"], seconds)
+            if allocated is not None:
+                entry["allocated"] = entry.get("allocated", 0) + allocated
+        counters = dict(_counters)
+        allocations = {
+            name: {"allocations": n, "bytes": nbytes}
+            for name, (n, nbytes) in _allocations.items()
+        }
+    for entry in spans.values():
+        entry["mean"] = entry["total"] / entry["calls"]
+    return {
+        "spans": dict(sorted(spans.items(), key=lambda item: -item[1]["total"])),
+        "counters": dict(sorted(counters.items())),
+        "allocations": dict(sorted(allocations.items())),
+    }
+
+
+def chrome_trace() -> dict[str, Any]:
+    """
+    The recording in the Chrome trace event format, timestamps in microseconds
+    """
+    with _lock:
+        events = list(_events)
+        counters = dict(_counters)
+        allocations = {name: v[1] for name, v in _allocations.items()}
+
+    trace: list[dict[str, Any]] = []
+    for name, start, duration, pid, tid, args, allocated in events:
+        if allocated is not None:
+            args = {**args, "allocated": allocated}
+        trace.append(
+            {
+                "name": name,
+                "cat": name.split(".")[0],
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": duration / 1000,
+                "pid": pid,
+                "tid": tid,
+                "args": {key: str(value) for key, value in args.items()},
+            }
+        )
+    # Final counter values, at the end of the recording
+    end = max((e[1] + e[2] for e in events), default=0) / 1000
+    for name, value in [*counters.items(), *allocations.items()]:
+        trace.append(
+            {
+                "name": name,
+                "ph": "C",
+                "ts": end,
+                "pid": os.getpid(),
+                "args": {"value": value},
+            }
+        )
+    return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+
+def write_report(path: str):
+    with open(path, "w", encoding="utf8") as file:
+        json.dump(report(), file, indent=2)
+
+
+def write_chrome_trace(path: str):
+    with open(path, "w", encoding="utf8") as file:
+        json.dump(chrome_trace(), file)
+
+
+def summary(limit: int = 20) -> str:
+    """
+    The report as a table of the slowest spans and every counter
+    """
+    data = report()
+    lines = [f"{'span':40} {'calls':>7} {'total':>10} {'mean':>10}"]
+    for name, entry in list(data["spans"].items())[:limit]:
+        lines.append(
+            f"{name:40} {entry['calls']:7} {entry['total'] * 1000:8.1f}ms "
+            f"{entry['mean'] * 1000:8.2f}ms"
+        )
+    for name, value in data["counters"].items():
+        lines.append(f"{name:40} {value:7}")
+    for name, entry in data["allocations"].items():
+        lines.append(
+            f"{name:40} {entry['allocations']:7} {entry['bytes'] / 2**20:8.1f}MiB"
+        )
+    return "\n".join(lines)
+
+
+__all__ = [
+    "span",
+    "timed",
+    "count",
+    "allocation",
+    "enable",
+    "disable",
+    "reset",
+    "recording",
+    "merge",
+    "collect",
+    "report",
+    "chrome_trace",
+    "write_report",
+    "write_chrome_trace",
+    "summary",
+]
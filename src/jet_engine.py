@@ -2,8 +2,17 @@
 File containing Ideal open Brayton cycle jet engines excluding ramjets and scramjets
 """
 
-
 from types import SimpleNamespace
+from typing import Any
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from dual import Dual
+from instrument import count, span
+
+# float or NumPy array
+Num = Any
 
 
 def kt_to_ms(kt: float) -> float:
@@ -41,6 +50,23 @@ def h_to_temp(h: float) -> float:
     return h - (h / 130) ** 2
 
 
+class CurveFits:
+    """
+    Air properties from the approximations above. The default backend of
+    `Turbojet`, see `air_tables.PropertyTable` for the tabulated one
+    """
+
+    temp_to_p_r = staticmethod(temp_to_p_r)
+    p_r_to_temp = staticmethod(p_r_to_temp)
+    temp_to_h = staticmethod(temp_to_h)
+
+    def __repr__(self) -> str:
+        return "CurveFits()"
+
+
+CURVE_FITS = CurveFits()
+
+
 class JetEngine:
     @staticmethod
     def efficiency(
@@ -84,6 +110,106 @@ class Info(SimpleNamespace):
     pass
 
 
+# Constructor parameters of `Turbojet`, in order
+PARAMETERS = (
+    "inlet_area",
+    "exit_area",
+    "inlet_pressure",
+    "exit_pressure",
+    "compresser_ratio",
+    "inlet_temperature",
+    "diffuser_pressure_increase",
+)
+
+# Inputs `Turbojet.jacobian` differentiates by
+INPUTS = PARAMETERS + ("temperature", "velocity")
+
+# Fields of the `Info` returned by `Turbojet.calculate`
+OUTPUTS = ("mass_flowrate", "thrust", "power", "heat_flowrate", "efficiency")
+
+
+def cycle(
+    inlet_area: Num,
+    exit_area: Num,
+    inlet_pressure: Num,
+    exit_pressure: Num,
+    compresser_ratio: Num,
+    inlet_temperature: Num,
+    diffuser_pressure_increase: Num,
+    temperature: Num,
+    velocity: Num,
+    properties: Any = CURVE_FITS,
+) -> Info:
+    """
+    Directly taken from p. 424
+
+    Only uses arithmetic operators, so it works on floats and NumPy arrays alike.
+    `properties` provides `temp_to_p_r`, `p_r_to_temp` and `temp_to_h`
+    """
+    count("jet_engine.cycle")
+    P1 = inlet_pressure
+    T1 = temperature
+
+    P2 = P1 + diffuser_pressure_increase
+    P3 = P2 * compresser_ratio
+
+    P4 = P3
+
+    T4 = inlet_temperature
+    P6 = exit_pressure
+
+    # states 1 and 3 are connected by an isentropic path
+    P13r = P3 / P1
+
+    # Temperature at state 3 may be determined using reduced pressure value
+    Pr1 = properties.temp_to_p_r(T1)
+    Pr3 = P13r * Pr1
+    T3 = properties.p_r_to_temp(Pr3)
+    H3 = properties.temp_to_h(T3)
+
+    # print("T3 (should be 511)", T3)
+
+    # states 4 and 6 are connected by an isentropic path
+    P64r = P6 / P4
+    Pr4 = properties.temp_to_p_r(T4)
+    H4 = properties.temp_to_h(T4)
+    Pr6 = P64r * Pr4
+    T6 = properties.p_r_to_temp(Pr6)
+
+    # print("T6 (should be 557)", T6)
+
+    # mass flow rate
+    mass_flowrate = (P1 / (R * T1)) * inlet_area * velocity
+
+    V6 = mass_flowrate * R * T6 / (P6 * exit_area)
+
+    # print("V6 (should be 697)", V6)
+
+    thrust = mass_flowrate * (V6 - velocity)
+
+    # print("thrust (should be 43300", thrust)
+
+    # unit: kW
+    power = thrust * velocity / 1000
+
+    # print("power (should be 8660kW)", int(power))
+
+    # unit: kW
+    heat_flowrate = mass_flowrate * (H4 - H3)
+
+    # print("heat flowrate (should be 58309kW)", heat_flowrate)
+
+    efficiency = power / heat_flowrate
+
+    return Info(
+        mass_flowrate=mass_flowrate,
+        thrust=thrust,
+        power=power,
+        heat_flowrate=heat_flowrate,
+        efficiency=efficiency,
+    )
+
+
 class Turbojet:
     """
     Turbojet engine
@@ -98,7 +224,12 @@ class Turbojet:
         compresser_ratio: float,
         inlet_temperature: float,
         diffuser_pressure_increase: float,
+        properties: Any = CURVE_FITS,
     ):
+        """
+        `properties` is the air property backend, like
+        `air_tables.PropertyTable.from_curve_fits()`
+        """
         self.inlet_area = inlet_area
         self.exit_area = exit_area
         self.inlet_pressure = inlet_pressure
@@ -106,71 +237,111 @@ class Turbojet:
         self.compresser_ratio = compresser_ratio
         self.inlet_temperature = inlet_temperature
         self.diffuser_pressure_increase = diffuser_pressure_increase
+        self.properties = properties
 
     def calculate(self, temperature: float, velocity: float) -> Info:
         """
         Directly taken from p. 424
         """
-        P1 = self.inlet_pressure
-        T1 = temperature
-
-        P2 = P1 + self.diffuser_pressure_increase
-        P3 = P2 * self.compresser_ratio
-
-        P4 = P3
-
-        T4 = self.inlet_temperature
-        P6 = self.exit_pressure
-
-        # states 1 and 3 are connected by an isentropic path
-        P13r = P3 / P1
-
-        # Temperature at state 3 may be determined using reduced pressure value
-        Pr1 = temp_to_p_r(T1)
-        Pr3 = P13r * Pr1
-        T3 = p_r_to_temp(Pr3)
-        H3 = temp_to_h(T3)
-
-        # print("T3 (should be 511)", T3)
-
-        # states 4 and 6 are connected by an isentropic path
-        P64r = P6 / P4
-        Pr4 = temp_to_p_r(T4)
-        H4 = temp_to_h(T4)
-        Pr6 = P64r * Pr4
-        T6 = p_r_to_temp(Pr6)
-
-        # print("T6 (should be 557)", T6)
-
-        # mass flow rate
-        mass_flowrate = (P1 / (R * T1)) * self.inlet_area * velocity
-
-        V6 = mass_flowrate * R * T6 / (P6 * self.exit_area)
-
-        # print("V6 (should be 697)", V6)
-
-        thrust = mass_flowrate * (V6 - velocity)
-
-        # print("thrust (should be 43300", thrust)
-
-        # unit: kW
-        power = thrust * velocity / 1000
-
-        # print("power (should be 8660kW)", int(power))
+        return cycle(
+            self.inlet_area,
+            self.exit_area,
+            self.inlet_pressure,
+            self.exit_pressure,
+            self.compresser_ratio,
+            self.inlet_temperature,
+            self.diffuser_pressure_increase,
+            temperature,
+            velocity,
+            self.properties,
+        )
 
-        # unit: kW
-        heat_flowrate = mass_flowrate * (H4 - H3)
+    def calculate_grid(
+        self, temperature: ArrayLike, velocity: ArrayLike, **parameters: ArrayLike
+    ) -> Info:
+        """
+        Vectorized `calculate`
 
-        # print("heat flowrate (should be 58309kW)", heat_flowrate)
+        Any constructor parameter can be overridden with an array. All inputs are
+        broadcast together like NumPy does and every field of the result is an
+        array of the broadcast shape
+        """
+        inputs = self._inputs(temperature, velocity, parameters)
+        with span("jet_engine.calculate_grid"):
+            result = cycle(*inputs, self.properties)
+        count("jet_engine.points", np.size(result.thrust))
+        return result
 
-        efficiency = power / heat_flowrate
+    def jacobian(
+        self,
+        temperature: ArrayLike,
+        velocity: ArrayLike,
+        wrt: tuple[str, ...] = INPUTS,
+        **parameters: ArrayLike,
+    ) -> tuple[Info, Info]:
+        """
+        `calculate_grid` with derivatives
 
-        return Info(
-            mass_flowrate=mass_flowrate,
-            thrust=thrust,
-            power=power,
-            heat_flowrate=heat_flowrate,
-            efficiency=efficiency,
+        Returns the outputs and, for every output, a dict from each input in
+        `wrt` (constructor parameters, temperature and velocity) to the
+        derivative of that output by that input, as arrays of the broadcast
+        shape. Outputs that do not depend on any input in `wrt` have zero
+        derivatives. Computed in one forward pass with dual numbers
+        """
+        unknown = set(wrt) - set(INPUTS)
+        if unknown:
+            raise TypeError(f"Unknown Turbojet inputs: {', '.join(sorted(unknown))}")
+        duplicates = {name for name in wrt if wrt.count(name) > 1}
+        if duplicates:
+            raise TypeError(
+                f"Duplicate Turbojet inputs: {', '.join(sorted(duplicates))}"
+            )
+
+        values = dict(zip(INPUTS, self._inputs(temperature, velocity, parameters)))
+        if wrt:
+            variables = Dual.variables([values[name] for name in wrt])
+            for name, dual in zip(wrt, variables):
+                values[name] = dual
+
+        with span("jet_engine.jacobian"), np.errstate(
+            invalid="ignore", divide="ignore"
+        ):
+            result = cycle(*values.values(), self.properties)
+
+        outputs = Info()
+        derivatives = Info()
+        for name in OUTPUTS:
+            field = getattr(result, name)
+            if not isinstance(field, Dual):
+                # Computed from inputs outside `wrt` only
+                field = Dual(field, np.zeros((len(wrt),) + np.shape(field)))
+            setattr(outputs, name, field.value)
+            setattr(derivatives, name, dict(zip(wrt, field.tangent)))
+        return outputs, derivatives
+
+    def _inputs(
+        self,
+        temperature: ArrayLike,
+        velocity: ArrayLike,
+        parameters: dict[str, ArrayLike],
+    ) -> list[np.ndarray]:
+        """
+        Every input of `cycle` in order, with `parameters` overriding the
+        attributes of the engine, broadcast together
+        """
+        unknown = set(parameters) - set(PARAMETERS)
+        if unknown:
+            raise TypeError(
+                f"Unknown Turbojet parameters: {', '.join(sorted(unknown))}"
+            )
+
+        return np.broadcast_arrays(
+            *(
+                np.asarray(parameters.get(name, getattr(self, name)), dtype=float)
+                for name in PARAMETERS
+            ),
+            np.asarray(temperature, dtype=float),
+            np.asarray(velocity, dtype=float),
         )
 
 
@@ -0,0 +1,59 @@
+"""
+Checks of `Turbojet.jacobian` with some of the inputs in `wrt`.
+Runs with pytest or as a script from src/
+"""
+
+import numpy as np
+
+from jet_engine import INPUTS, OUTPUTS, Turbojet
+
+
+def engine() -> Turbojet:
+    return Turbojet(0.6, 0.4, 50_000, 50_000, 9, 847 + 273, 30_000)
+
+
+def test_subset_matches_all_inputs():
+    everything = engine().jacobian(240, 200)
+    for wrt in [("exit_area",), ("compresser_ratio", "velocity")]:
+        outputs, derivatives = engine().jacobian(240, 200, wrt=wrt)
+        for name in OUTPUTS:
+            assert np.array_equal(getattr(outputs, name), getattr(everything[0], name))
+            assert set(getattr(derivatives, name)) == set(wrt)
+            for input in wrt:
+                expected = getattr(everything[1], name)[input]
+                assert np.allclose(getattr(derivatives, name)[input], expected)
+
+
+def test_subset_over_arrays():
+    ratios = np.linspace(5, 15, 4)
+    outputs, derivatives = engine().jacobian(
+        240, 200, wrt=("exit_area",), compresser_ratio=ratios
+    )
+    for name in OUTPUTS:
+        derivative = getattr(derivatives, name)["exit_area"]
+        assert np.shape(derivative) == np.shape(getattr(outputs, name))
+
+
+def test_no_inputs():
+    outputs, derivatives = engine().jacobian(240, 200, wrt=())
+    expected = engine().calculate_grid(240, 200)
+    for name in OUTPUTS:
+        assert np.array_equal(getattr(outputs, name), getattr(expected, name))
+        assert getattr(derivatives, name) == {}
+
+
+def test_bad_inputs():
+    for wrt in [("exit_area", "exit_area"), ("nozzle",)]:
+        try:
+            engine().jacobian(240, 200, wrt=wrt)
+        except TypeError:
+            continue
+        raise AssertionError(f"wrt={wrt} was accepted")
+
+
+if __name__ == "__main__":
+    test_subset_matches_all_inputs()
+    test_subset_over_arrays()
+    test_no_inputs()
+    test_bad_inputs()
+    print(f"jacobian checks passed for subsets of {len(INPUTS)} inputs")
@@ -2,10 +2,18 @@ import json
 import os
 import re
 
-from typing import Any
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Any, Iterator, TextIO
+
+from instrument import count, span
 
 Js = dict[str, Any]
 
+# Files that are loaded, a top level JSON array or JSON Lines
+DATA_EXTENSIONS = (".json", ".jsonl")
+
+WHITESPACE = re.compile(r"[ \t\r\n]*")
+
 
 def normalize_filename(filename: str) -> str:
     """
@@ -28,21 +36,205 @@ def get_filename_without_extension(path: str) -> str:
     return os.path.splitext(path)[0]
 
 
-def load_files(folder: str) -> dict[str, Js]:
+def data_files(folder: str) -> list[str]:
+    """
+    Enumerate the files in a directory that `load_files` loads
+    """
+    return [
+        filename
+        for filename in enumerate_files(folder)
+        if os.path.splitext(filename)[1] in DATA_EXTENSIONS
+    ]
+
+
+def iter_json_array(file: TextIO, chunk_size: int = 64 * 1024) -> Iterator[Any]:
+    """
+    Yield the items of a top level JSON array one at a time.
+    Only the current item and one chunk of text are held in memory
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def fill(size: int) -> bool:
+        nonlocal buffer, pos, eof
+        chunk = file.read(size)
+        if not chunk:
+            eof = True
+            return False
+        # Drop what was already decoded
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    def skip_whitespace() -> str:
+        """
+        Next non-whitespace character, empty at the end of the file
+        """
+        nonlocal pos
+        while True:
+            pos = WHITESPACE.match(buffer, pos).end()  # type: ignore
+            if pos < len(buffer):
+                return buffer[pos]
+            if not fill(chunk_size):
+                return ""
+
+    if skip_whitespace() != "[":
+        raise ValueError("Expected a JSON array")
+    pos += 1
+
+    if skip_whitespace() == "]":
+        return
+
+    while True:
+        skip_whitespace()
+        size = chunk_size
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                # An item is complete once the separator after it was read,
+                # before that a number might continue in the next chunk
+                after = WHITESPACE.match(buffer, end).end()  # type: ignore
+                if eof or buffer[after : after + 1] in (",", "]"):
+                    break
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            # The item is longer than the buffer, read more (more every time)
+            fill(size)
+            size *= 2
+
+        pos = end
+        yield item
+
+        separator = skip_whitespace()
+        pos += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(f"Expected ',' or ']' in JSON array, got {separator!r}")
+
+
+def iter_json_lines(file: TextIO) -> Iterator[Any]:
+    """
+    Yield the values of a JSON Lines file one at a time
+    """
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_records(path: str) -> Iterator[Any]:
+    """
+    Yield the records of a data file one at a time, the file is closed once
+    every record was read
+    """
+    count("loader.files")
+    with open(path, encoding="utf8") as file:
+        if path.endswith(".jsonl"):
+            yield from iter_json_lines(file)
+        else:
+            yield from iter_json_array(file)
+
+
+def read_file(path: str) -> Any:
+    count("loader.files")
+    with span("loader.read_file", file=path), open(path, encoding="utf8") as file:
+        if path.endswith(".jsonl"):
+            return list(iter_json_lines(file))
+        return json.load(file)
+
+
+def load_files(folder: str, stream: bool = False) -> dict[str, Any]:
     """
     Load all files in a folder
+
+    With `stream`, every file maps to an iterator over its records instead,
+    which only reads the file as it is consumed
     """
+    read = iter_records if stream else read_file
     return {
-        normalize_filename(get_filename_without_extension(filename)): json.load(
-            open(os.path.join(folder, filename), encoding="utf8")
+        normalize_filename(get_filename_without_extension(filename)): read(
+            os.path.join(folder, filename)
         )
-        for filename in enumerate_files(folder)
+        for filename in data_files(folder)
     }
 
 
+def decode(raw: bytes, jsonl: bool) -> Any:
+    if jsonl:
+        return [json.loads(line) for line in raw.splitlines() if line.strip()]
+    return json.loads(raw)
+
+
+def iter_files_concurrently(
+    folder: str, workers: int | None = None, process_size: int = 1024 * 1024
+) -> Iterator[tuple[str, Any]]:
+    """
+    Read and decode all files in a folder concurrently, yields the same
+    (name, value) pairs as `load_files` in the order the files finish.
+
+    Files are read by threads, files of at least `process_size` bytes are
+    decoded in worker processes (decoding holds the GIL)
+    """
+    with ThreadPoolExecutor(workers) as threads, ProcessPoolExecutor(
+        workers
+    ) as processes:
+        # No processes are started unless a file is large enough
+
+        def read(filename: str) -> Any:
+            path = os.path.join(folder, filename)
+            count("loader.files")
+            with span("loader.read", file=path), open(path, "rb") as file:
+                raw = file.read()
+            jsonl = path.endswith(".jsonl")
+            if len(raw) >= process_size:
+                return processes.submit(decode, raw, jsonl).result()
+            with span("loader.decode", file=path):
+                return decode(raw, jsonl)
+
+        futures = {
+            threads.submit(read, filename): filename for filename in data_files(folder)
+        }
+        for future in as_completed(futures):
+            name = normalize_filename(get_filename_without_extension(futures[future]))
+            yield name, future.result()
+
+
 if __name__ == "__main__":
-    files = load_files("data")
+    import subprocess
+    import sys
+
+    folder = sys.argv[1] if len(sys.argv) > 1 else "data"
+
+    files = load_files(folder)
     print(f"Found {len(files)} files")
     print(f"Names: {', '.join(files.keys())}")
 
+    if "--benchmark" in sys.argv:
+        src = os.path.dirname(os.path.abspath(__file__))
+
+        def run(option: str) -> tuple[float, float]:
+            # A fresh interpreter every time, so peak RSS only covers this load
+            code = (
+                "import resource, time; start = time.perf_counter(); "
+                f"from db import load; DB = load({os.path.abspath(folder)!r}, {option}); "
+                "print(time.perf_counter() - start, "
+                "resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+            )
+            out = subprocess.run(
+                [sys.executable, "-c", code], cwd=src, capture_output=True, check=True
+            )
+            seconds, rss = out.stdout.split()
+            return float(seconds), int(rss) / 1024
+
+        for name, option in [
+            ("json.load", ""),
+            ("streaming", "stream=True"),
+            ("parallel", "parallel=True"),
+        ]:
+            seconds, rss = min(run(option) for _ in range(3))
+            print(f"{name:>10}: {seconds * 1000:.0f}ms, peak RSS {rss:.1f}MiB")
+
 __all__ = ["load_files"]
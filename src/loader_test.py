@@ -0,0 +1,76 @@
+"""
+Checks of the streaming JSON array parser `loader.iter_json_array`: every
+chunk size gives the items `json.loads` gives, and malformed input is an
+error. Runs with pytest or as a script from src/
+"""
+
+import io
+import json
+import random
+
+from loader import iter_json_array
+
+CHUNK_SIZES = [1, 2, 3, 5, 7, 16, 64 * 1024]
+
+
+def parse(text: str, chunk_size: int) -> list:
+    return list(iter_json_array(io.StringIO(text), chunk_size))
+
+
+def random_value(rng: random.Random, depth: int = 0):
+    kind = rng.choice(["int", "float", "string", "bool", "null", "list", "dict"])
+    if depth > 2 or kind == "int":
+        return rng.randint(-(10**12), 10**12)
+    if kind == "float":
+        return rng.uniform(-1e6, 1e6)
+    if kind == "string":
+        # Separators and escapes inside strings must not end an item
+        return "".join(rng.choice('ab],[ "\\\n{}é✈') for _ in range(rng.randint(0, 12)))
+    if kind == "bool":
+        return rng.random() < 0.5
+    if kind == "null":
+        return None
+    if kind == "list":
+        return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return {f"key{i}": random_value(rng, depth + 1) for i in range(rng.randint(0, 4))}
+
+
+def test_matches_json_loads():
+    rng = random.Random(0)
+    for _ in range(30):
+        items = [random_value(rng) for _ in range(rng.randint(0, 20))]
+        for indent in [None, 2]:
+            text = json.dumps(items, indent=indent, ensure_ascii=rng.random() < 0.5)
+            for chunk_size in CHUNK_SIZES:
+                assert parse(text, chunk_size) == items
+
+
+def test_numbers_across_chunks():
+    # A number cut by a chunk boundary is not decoded before it is complete
+    text = "[123456789, 1.5e10, -0.25,7]"
+    for chunk_size in CHUNK_SIZES:
+        assert parse(text, chunk_size) == [123456789, 1.5e10, -0.25, 7]
+
+
+def test_whitespace_and_empty():
+    for text in ["[]", "  [ ]  ", "\n[\n]\n", " [ 1 ,\t2 ] \n"]:
+        for chunk_size in CHUNK_SIZES:
+            assert parse(text, chunk_size) == json.loads(text)
+
+
+def test_malformed():
+    for text in ["", "   ", '{"a": 1}', "[1,", "[1 2]", "[1,]", '["abc', "[1", "[tru]"]:
+        for chunk_size in CHUNK_SIZES:
+            try:
+                parse(text, chunk_size)
+            except ValueError:
+                continue
+            raise AssertionError(f"{text!r} was accepted with chunks of {chunk_size}")
+
+
+if __name__ == "__main__":
+    test_matches_json_loads()
+    test_numbers_across_chunks()
+    test_whitespace_and_empty()
+    test_malformed()
+    print("iter_json_array matches json.loads")
@@ -1,10 +1,21 @@
+import argparse
+import hashlib
 import itertools
-from typing import Any, Callable
-from db import load
-from jet_engine import Turbojet
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Callable, Iterable, NamedTuple
+from db import DB, load
+from adaptive import adaptive, progressive
+from field_cache import Field, FieldCache, field_key, model_version
+import instrument
+from instrument import allocation, count, span
+from jet_engine import OUTPUTS, PARAMETERS, Turbojet
+from tiles import TILE_SIZE, Raster, Tile, Tiling, composite, render, split
 
 from PIL import Image, ImageDraw
 import matplotlib.pyplot as plt
+import numpy as np
 
 plt: Any = plt
 
@@ -52,14 +63,88 @@ def heat_rgb(value: float) -> tuple[int, int, int]:
     return hsv_to_rgb(240 * (1 - value), 1, 1)
 
 
+def hsv_to_rgb_array(h: np.ndarray, s: float, v: float) -> np.ndarray:
+    """
+    Vectorized `hsv_to_rgb`, gives the exact same colors.
+    Returns an array of shape `h.shape + (3,)` with dtype uint8
+    """
+    h = np.asarray(h, dtype=float) / 60
+    i = np.trunc(h)
+    f = h - i
+    p = np.full_like(h, v * (1 - s))
+    q = v * (1 - f * s)
+    t = v * (1 - (1 - f) * s)
+    v_ = np.full_like(h, v)
+    conditions = [i == 0, i == 1, i == 2, i == 3, i == 4]
+    r = np.select(conditions, [v_, q, p, p, t], v_)
+    g = np.select(conditions, [t, v_, v_, q, p], p)
+    b = np.select(conditions, [p, p, t, v_, v_], q)
+    return (np.stack([r, g, b], axis=-1) * 255).astype(np.uint8)
+
+
+def clamp_array(mini: float, value: np.ndarray, maxi: float) -> np.ndarray:
+    """
+    Vectorized `clamp`. NaN is clamped to `mini`
+    """
+    return np.nan_to_num(np.clip(value, mini, maxi), nan=mini)
+
+
+def heat_rgb_array(values: np.ndarray) -> np.ndarray:
+    """
+    Vectorized `heat_rgb`. Maps values from 0 to 1 to colors from blue to red
+    """
+    return hsv_to_rgb_array(240 * (1 - np.asarray(values, dtype=float)), 1, 1)
+
+
 def plot_scatter_with_background_color(
     x_label: str,
     y_label: str,
     x_width: int,
     y_width: int,
     data: list[tuple[float, float, str]],
-    color_function: Callable[[float, float], tuple[int, int, int]],
+    color_function: (
+        Callable[[float, float], tuple[int, int, int]]
+        | Callable[[np.ndarray, np.ndarray], np.ndarray]
+    ),
+    vectorized: bool = False,
+    colormap: Callable[[np.ndarray], np.ndarray] = heat_rgb_array,
+    tolerance: float | None = None,
+    on_preview: Callable[[Image.Image], None] | None = None,
+    tiling: Tiling | None = None,
+    background_path: str | None = None,
+    inputs: str = "",
+    summarize: Callable[[np.ndarray], Any] | None = None,
+    on_summaries: Callable[[list[Any]], None] | None = None,
 ):
+    """
+    By default `color_function` is called once per pixel with plot coordinates
+    and returns an rgb tuple.
+
+    With `vectorized`, it is called once with arrays of plot coordinates for the
+    whole background and returns values, which `colormap` turns into rgb (the
+    default maps 0 to 1 from blue to red). `summarize(values)` then sums up
+    the values of the background, like their range, and `on_summaries` gets
+    it in a list.
+
+    With `tolerance` as well, it is only called for the pixels `adaptive`
+    needs, the others are interpolated to within about `tolerance`.
+    `on_preview(background)` then gets the background after every level of
+    refinement, coarse first.
+
+    With `vectorized` and `tiling`, the background is rendered tile by tile
+    into a raster on disk (at `background_path` if given) and composited with
+    the plot a tile at a time, so the field is never in memory as a whole.
+    The scatter plot is still drawn by matplotlib into one RGBA buffer of the
+    whole image, so tiling bounds the memory of the field and its colors, not
+    that of the image: about 4 bytes a pixel remain.
+    `tolerance` then applies to every tile and `on_preview` is not called.
+    `inputs` identifies everything `color_function` depends on besides the
+    coordinates: tiles of an existing raster at `background_path` are only
+    rendered again if it, `tolerance` or their coordinates changed.
+    `summarize` is called on the values of every tile rendered, in its thread,
+    and its result is kept with the tile in the raster. `on_summaries` then
+    gets those of every tile, rendered now or reused
+    """
     # Calculate the size of the image needed to display all data points
     w: tuple[list[float], list[float], list[str]] = zip(*data)  # type: ignore
     x_values, y_values, labels = w
@@ -71,126 +156,474 @@ def plot_scatter_with_background_color(
     height = int(max_y - min_y + 1000)
 
     # Create the scatter plot
-    fig, ax = plt.subplots(figsize=(width / 100, height / 100), dpi=100)
-    ax.set_xticks(range(min_x, max_x + 1, x_width))
-    ax.set_yticks(range(min_y, max_y + 1, y_width))
-    ax.set_xlabel(x_label)
-    ax.set_ylabel(y_label)
+    with span("render.figure"):
+        fig, ax = plt.subplots(figsize=(width / 100, height / 100), dpi=100)
+        ax.set_xticks(range(min_x, max_x + 1, x_width))
+        ax.set_yticks(range(min_y, max_y + 1, y_width))
+        ax.set_xlabel(x_label)
+        ax.set_ylabel(y_label)
 
-    # Set axis limits
-    ax.set_xlim(min_x, max_x)
-    ax.set_ylim(min_y, max_y)
+        # Set axis limits
+        ax.set_xlim(min_x, max_x)
+        ax.set_ylim(min_y, max_y)
 
-    ax.set_title("Scatter Plot")
+        ax.set_title("Scatter Plot")
 
     # ============= BACKGROUND ================
-    # Create the image and draw the background color
-    img = Image.new("RGBA", (width, height), (255, 255, 255, 255))
-    # draw: Any = ImageDraw.Draw(img)
-
     def to_display(x: float, y: float) -> tuple[int, int]:
         return ax.transData.transform((x, y))
 
-    def to_plot(x: float, y: float) -> tuple[int, int]:
-        return ax.transData.inverted().transform((x, y))
-
     left, bottom = to_display(min_x, min_y)
     right, top = to_display(max_x, max_y)
 
-    # print(left, bottom, right, top)
-    for x in range(int(left), int(right)):
-        for y in range(int(bottom), int(top)):
-            plot_x, plot_y = to_plot(x, y)
-            img.putpixel((x + 1, height - y), color_function(plot_x, plot_y))
+    # The inverse transform is the same for every pixel, build it once
+    inverse = ax.transData.inverted()
 
-    # ============= SCATTER ================
-    ax.scatter(x_values, y_values)
-    for i, label in enumerate(labels):
-        ax.annotate(label, (x_values[i], y_values[i]))
+    if vectorized and tiling is not None:
+        background = Raster(height, width, background_path)
+
+        def coordinates(rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+            # Image rows count down from the top, display y up from the bottom
+            return inverse.transform(np.column_stack([cols - 1, height - rows]))
+
+        def render_tile(tile: Tile) -> tuple[np.ndarray, Any]:
+            if tolerance is None:
+                with span("render.transform"):
+                    rows, cols = np.mgrid[tile.rows, tile.cols]
+                    plot = coordinates(rows.ravel(), cols.ravel())
+                count("render.pixels", rows.size)
+                values = color_function(  # type: ignore
+                    plot[:, 0].reshape(rows.shape), plot[:, 1].reshape(rows.shape)
+                )
+            else:
+
+                def field(rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+                    with span("render.transform"):
+                        plot = coordinates(tile.top + rows, tile.left + cols)
+                    count("render.pixels", len(rows))
+                    return color_function(plot[:, 0], plot[:, 1])  # type: ignore
+
+                values = adaptive(field, (tile.height, tile.width), tolerance).values
+            with span("render.colormap"):
+                pixels = colormap(values)
+            return pixels, summarize(values) if summarize is not None else None
+
+        def tile_key(tile: Tile) -> str:
+            corners = coordinates(
+                np.array([tile.top, tile.top + tile.height - 1]),
+                np.array([tile.left, tile.left + tile.width - 1]),
+            )
+            key = (inputs, tolerance, tile, corners.tolist())
+            return hashlib.sha1(repr(key).encode()).hexdigest()
+
+        # The pixels of the background are those of the untiled path below
+        region = split(
+            height - int(top) + 1,
+            int(left) + 1,
+            int(top) - int(bottom),
+            int(right) - int(left),
+            tiling.size,
+        )
+        summaries = render(background, region, render_tile, tile_key, tiling.workers)
+        if on_summaries is not None:
+            on_summaries(summaries)
+    elif vectorized:
+        xs = np.arange(int(left), int(right))
+        ys = np.arange(int(bottom), int(top))
+
+        def paint(values: np.ndarray) -> Image.Image:
+            background = np.full((height, width, 4), 255, dtype=np.uint8)
+            allocation("render.background", background.nbytes)
+            with span("render.colormap"):
+                background[height - ys[:, None], xs[None, :] + 1, :3] = colormap(values)
+            return Image.fromarray(background, "RGBA")
+
+        if tolerance is None:
+            with span("render.transform"):
+                grid_x, grid_y = np.meshgrid(xs, ys)
+                plot = inverse.transform(
+                    np.column_stack([grid_x.ravel(), grid_y.ravel()])
+                )
+                plot_x = plot[:, 0].reshape(grid_x.shape)
+                plot_y = plot[:, 1].reshape(grid_y.shape)
+            count("render.pixels", plot_x.size)
+            values = color_function(plot_x, plot_y)  # type: ignore
+        else:
+
+            def field(rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+                with span("render.transform"):
+                    plot = inverse.transform(
+                        np.column_stack([int(left) + cols, int(bottom) + rows])
+                    )
+                count("render.pixels", len(rows))
+                return color_function(plot[:, 0], plot[:, 1])  # type: ignore
+
+            shape = (len(ys), len(xs))
+            if on_preview is None:
+                values = adaptive(field, shape, tolerance).values
+            else:
+                for sampled in progressive(field, shape, tolerance):
+                    values = sampled.values
+                    if sampled.step > 1:
+                        on_preview(paint(values))
+
+        img = paint(values)
+        if summarize is not None and on_summaries is not None:
+            on_summaries([summarize(values)])
+    else:
+        # Create the image and draw the background color
+        img = Image.new("RGBA", (width, height), (255, 255, 255, 255))
+
+        def to_plot(x: float, y: float) -> tuple[int, int]:
+            return inverse.transform((x, y))
 
-    # fig.canvas.draw()
-    fig.savefig("plot.png", transparent=True)
-    # Convert the plot to an image and paste it onto the background image
-    # buf = fig.canvas.tostring_argb()
+        with span("render.putpixel"):
+            for x in range(int(left), int(right)):
+                for y in range(int(bottom), int(top)):
+                    plot_x, plot_y = to_plot(x, y)
+                    img.putpixel((x + 1, height - y), color_function(plot_x, plot_y))  # type: ignore
+        count("render.pixels", (int(right) - int(left)) * (int(top) - int(bottom)))
 
+    # ============= SCATTER ================
+    with span("render.scatter"):
+        ax.scatter(x_values, y_values)
+        for i, label in enumerate(labels):
+            ax.annotate(label, (x_values[i], y_values[i]))
+
+    # What savefig(transparent=True) does, without encoding a PNG
+    fig.patch.set_facecolor("none")
+    fig.patch.set_edgecolor("none")
+    ax.patch.set_facecolor("none")
+    ax.patch.set_edgecolor("none")
+    with span("render.draw"):
+        fig.canvas.draw()
+
+    # Composited straight from the canvas memory, before the figure is closed
+    with span("render.composite"):
+        rgba = fig.canvas.buffer_rgba()  # type: ignore
+        if vectorized and tiling is not None:
+            overlay = np.asarray(rgba)
+            with composite(background, overlay, tiling.size, tiling.workers) as result:
+                img = result.image()
+            background.close()
+        else:
+            size = fig.canvas.get_width_height()
+            plot_img = Image.frombuffer("RGBA", size, rgba, "raw", "RGBA", 0, 1)
+            img = Image.alpha_composite(img, plot_img)
     plt.close(fig)
-    plot_img = Image.open("plot.png")  # type: ignore
-    # plot_img.show()
-    img = Image.alpha_composite(img, plot_img)
 
     return img
 
 
-if __name__ == "__main__":
-    DB = load("./data")
+class PlotJob(NamedTuple):
+    """
+    Everything needed to render one plot, so it can be sent to another process
+    """
 
-    def show(
-        attr_x: str,
-        attr_y: str,
-        info: str,
-        info_range: tuple[float, float],
-        x_label: str,
-        y_label: str,
-        x_width: int,
-        y_width: int,
-        x_ratio: float,
-        y_ratio: float,
-    ):
-        print("=" * 80)
-        print(f"rendering plot of {attr_x} vs {attr_y} with background {info}")
-        data: list[tuple[float, float, str]] = []
-
-        for air in DB.aircraft_types.dict.values():
-            jetinfo = air.jet_information
-            if jetinfo is None:
-                continue
-            data.append((getattr(jetinfo, attr_x) * x_ratio, getattr(jetinfo, attr_y) * y_ratio, air.name))  # type: ignore
-
-        print("data calculation done, plotting...")
-
-        tj = Turbojet(0.6, 0.4, 50_000, 50_000, 9, 847 + 273, 30_000)
-
-        mini = 100000000
-        maxi = -100000000
-
-        def coloring(x: float, y: float) -> tuple[int, int, int]:
-            setattr(tj, attr_x, x / x_ratio)
-            setattr(tj, attr_y, y / y_ratio)
-            v = getattr(tj.calculate(273 - 33, 200), info) - info_range[0]
-            nonlocal mini, maxi
-            mini = min(mini, v)
-            maxi = max(maxi, v)
-            return heat_rgb(
-                clamp(
-                    0,
-                    v / (info_range[1] - info_range[0]),
-                    1,
-                )
-            )
+    attr_x: str
+    attr_y: str
+    info: str
+    info_range: tuple[float, float]
+    x_label: str
+    y_label: str
+    x_width: int
+    y_width: int
+    x_ratio: float
+    y_ratio: float
+    data: list[tuple[float, float, str]]
+    # Adaptive sampling of the background, see `plot_scatter_with_background_color`
+    tolerance: float | None = None
+    # Tiled rendering of the background, see `plot_scatter_with_background_color`
+    tiling: Tiling | None = None
+
+    @property
+    def filename(self) -> str:
+        return f"plots/plot of {self.attr_x}-{self.attr_y} bg-{self.info}.png"
+
+    @property
+    def background_path(self) -> str | None:
+        if self.tiling is None or self.tiling.directory is None:
+            return None
+        name = f"{self.attr_x}-{self.attr_y} bg-{self.info}.npy"
+        return os.path.join(self.tiling.directory, name)
+
+
+class PlotResult(NamedTuple):
+    job: PlotJob
+    mini: float
+    maxi: float
+    seconds: float
+
+
+def scatter_data(
+    db: type[DB], attr_x: str, attr_y: str, x_ratio: float, y_ratio: float
+) -> list[tuple[float, float, str]]:
+    table = db.aircraft_types.jet_information_table()
+    x_values = (getattr(table, attr_x) * x_ratio).tolist()
+    y_values = (getattr(table, attr_y) * y_ratio).tolist()
+    return list(zip(x_values, y_values, table.names))
+
+
+def show(job: PlotJob, cache: FieldCache | None = None) -> PlotResult:
+    """
+    Renders and saves one plot. Only uses its arguments, so it is safe to run
+    in a worker process.
+
+    With `cache`, the engine field is solved once for every output and reused
+    by later jobs over the same axes. Adaptive jobs (with a `tolerance`) only
+    solve the points they sample and do not use it.
 
+    With `job.tiling`, backgrounds kept in its directory by an earlier run
+    only have the tiles whose inputs changed rendered again
+    """
+    start = time.perf_counter()
+    attr_x, attr_y, info, info_range = job.attr_x, job.attr_y, job.info, job.info_range
+    x_ratio, y_ratio = job.x_ratio, job.y_ratio
+    if job.tolerance is not None:
+        cache = None
+
+    # Every job gets its own engine
+    tj = Turbojet(0.6, 0.4, 50_000, 50_000, 9, 847 + 273, 30_000)
+
+    mini = 100000000
+    maxi = -100000000
+    scale = info_range[1] - info_range[0]
+
+    def coloring(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        # Axes that are not engine parameters (like weight) do not change the result
+        parameters = {
+            attr: value
+            for attr, value in ((attr_x, x / x_ratio), (attr_y, y / y_ratio))
+            if attr in PARAMETERS
+        }
+
+        def solve() -> Field:
+            with span("render.solve"):
+                result = tj.calculate_grid(273 - 33, 200, **parameters)
+            return {
+                name: np.broadcast_to(getattr(result, name), x.shape)
+                for name in OUTPUTS
+            }
+
+        if cache is None:
+            field = solve()
+        else:
+            key = field_key(tj, 273 - 33, 200, parameters, x.shape)
+            field = cache.get_or_compute(key, solve)
+
+        return field[info] - info_range[0]
+
+    def colormap(v: np.ndarray) -> np.ndarray:
+        return heat_rgb_array(clamp_array(0, v / scale, 1))
+
+    def value_range(v: np.ndarray) -> list[float]:
+        return [float(v.min()), float(v.max())]
+
+    def merge_ranges(summaries: list[Any]):
+        # Reused tiles are not colored, their ranges come from the raster
+        nonlocal mini, maxi
+        for summary in summaries:
+            if summary is not None:
+                mini = min(mini, summary[0])
+                maxi = max(maxi, summary[1])
+
+    with span("render.plot", plot=job.filename):
         img = plot_scatter_with_background_color(
-            x_label
+            job.x_label
             + " with background heatmap "
             + info
             + " range from "
             + str(info_range[0])
             + " to "
             + str(info_range[1]),
-            y_label,
-            x_width,
-            y_width,
-            data,
+            job.y_label,
+            job.x_width,
+            job.y_width,
+            job.data,
             coloring,
+            vectorized=True,
+            colormap=colormap,
+            # Interpolated to within a fraction of the color range
+            tolerance=None if job.tolerance is None else job.tolerance * scale,
+            tiling=job.tiling,
+            background_path=job.background_path,
+            inputs=repr(
+                (
+                    model_version(),
+                    field_key(tj, 273 - 33, 200, {}, ()),
+                    attr_x,
+                    attr_y,
+                    x_ratio,
+                    y_ratio,
+                    info,
+                    info_range,
+                )
+            ),
+            summarize=value_range,
+            on_summaries=merge_ranges,
         )
 
-        print(f"min: {mini}, max: {maxi}")
-        print("plotting done, saving...")
+        with span("render.save"):
+            img.save(job.filename)
+
+    return PlotResult(job, mini, maxi, time.perf_counter() - start)
+
 
-        fname = f"plots/plot of {attr_x}-{attr_y} bg-{info}.png"
-        img.save(fname)
+def show_all(jobs: list[PlotJob], cache: FieldCache | None = None) -> list[PlotResult]:
+    return [show(job, cache) for job in jobs]
+
+
+def render_plots(
+    jobs: Iterable[PlotJob],
+    workers: int | None = None,
+    on_done: Callable[[int, int, PlotResult], None] | None = None,
+    cache: FieldCache | None = None,
+) -> list[PlotResult]:
+    """
+    Renders every job over a process pool of `workers` processes
+    (`os.cpu_count()` by default). `workers=1` renders in this process.
 
-        print(f"saved to {fname}")
-        # img.show()
+    With `cache`, the field of every pair of axes is solved once. If the cache
+    only lives in memory, jobs over the same axes are rendered together by one
+    worker, so no more workers are busy than there are pairs of axes. With a
+    cache `directory`, only the first job of each pair waits for its field to
+    be solved; the others are then rendered separately, reading it from disk.
+
+    `on_done(done, total, result)` is called as each job finishes.
+    Results are returned in the order of `jobs`
+    """
+    jobs = list(jobs)
+    results: list[PlotResult | None] = [None] * len(jobs)
+    done = 0
+
+    # Indices of jobs that are rendered together
+    batches: dict[Any, list[int]] = {}
+    for index, job in enumerate(jobs):
+        group = (job.attr_x, job.attr_y, job.x_ratio, job.y_ratio)
+        batches.setdefault(group if cache is not None else index, []).append(index)
+
+    def finish(indices: list[int], batch_results: list[PlotResult]):
+        nonlocal done
+        for index, result in zip(indices, batch_results):
+            done += 1
+            results[index] = result
+            if on_done is not None:
+                on_done(done, len(jobs), result)
+
+    if workers == 1:
+        for indices in batches.values():
+            finish(indices, show_all([jobs[i] for i in indices], cache))
+    else:
+        shared = cache is not None and cache.directory is not None
+        pending: dict[Future, list[int]] = {}
+        # First job of a pair of axes -> the jobs rendered once it is done
+        followers: dict[int, list[int]] = {}
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+
+            def submit(indices: list[int]):
+                # Workers send back what they recorded with their results
+                future = executor.submit(
+                    instrument.collect,
+                    instrument.ENABLED,
+                    instrument.MEMORY,
+                    show_all,
+                    [jobs[i] for i in indices],
+                    cache,
+                )
+                pending[future] = indices
+
+            for indices in batches.values():
+                if shared:
+                    followers[indices[0]] = indices[1:]
+                    submit(indices[:1])
+                else:
+                    submit(indices)
+
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    indices = pending.pop(future)
+                    batch_results, recording = future.result()
+                    if recording is not None:
+                        instrument.merge(recording)
+                    finish(indices, batch_results)
+                    # The field is on disk now
+                    for index in followers.pop(indices[0], []):
+                        submit([index])
+
+    return results  # type: ignore
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the plot matrix into plots/")
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="number of worker processes, 1 renders serially. With the field "
+        "cache in memory only, at most one per pair of axes is busy",
+    )
+    parser.add_argument(
+        "--no-field-cache",
+        action="store_true",
+        help="solve the engine field separately for every plot",
+    )
+    parser.add_argument(
+        "--field-cache-dir",
+        help="also keep solved fields in this directory across runs",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        help="sample backgrounds adaptively, interpolating pixels to within "
+        "this fraction of the color range (like 0.002) instead of solving all",
+    )
+    parser.add_argument(
+        "--tile-size",
+        type=int,
+        metavar="PIXELS",
+        help="render backgrounds in tiles of this size through a raster on disk "
+        f"instead of in memory (default {TILE_SIZE} with the other tile options); "
+        "the plot drawn over them still takes about 4 bytes a pixel",
+    )
+    parser.add_argument(
+        "--tile-workers",
+        type=int,
+        default=1,
+        help="number of threads rendering tiles of each plot",
+    )
+    parser.add_argument(
+        "--raster-dir",
+        help="keep tiled backgrounds in this directory, later runs only "
+        "render the tiles whose inputs changed",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="write timings and counters of the run to this JSON file",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="write a Chrome trace (chrome://tracing, Perfetto) of the run",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="also record bytes allocated in every span (slower)",
+    )
+    args = parser.parse_args()
+
+    if args.profile or args.trace or args.profile_memory:
+        instrument.enable(memory=args.profile_memory)
+
+    tiling = None
+    if args.tile_size or args.tile_workers != 1 or args.raster_dir:
+        tiling = Tiling(args.tile_size or TILE_SIZE, args.tile_workers, args.raster_dir)
+
+    DB = load("./data")
 
     attributes = [
         ("inlet_area", "Inlet Area (m^2)", 2, 1),
@@ -211,6 +644,49 @@ if __name__ == "__main__":
         ("power", (0, 1500_000)),
     ]
 
-    for info_attr, info_range in info:
-        for (ax, xn, xw, xr), (ay, yn, yw, yr) in itertools.combinations(attributes, 2):
-            show(ax, ay, info_attr, info_range, xn, yn, xw, yw, xr, yr)
+    print("=" * 80)
+    print("calculating scatter data...")
+    pairs = list(itertools.combinations(attributes, 2))
+    data = {
+        (ax, ay): scatter_data(DB, ax, ay, xr, yr)
+        for (ax, _, _, xr), (ay, _, _, yr) in pairs
+    }
+
+    jobs = [
+        PlotJob(
+            ax,
+            ay,
+            info_attr,
+            info_range,
+            xn,
+            yn,
+            xw,
+            yw,
+            xr,
+            yr,
+            data[ax, ay],
+            args.tolerance,
+            tiling,
+        )
+        for info_attr, info_range in info
+        for (ax, xn, xw, xr), (ay, yn, yw, yr) in pairs
+    ]
+
+    def report(done: int, total: int, result: PlotResult):
+        print(
+            f"[{done}/{total}] saved to {result.job.filename} in {result.seconds:.1f}s"
+            f" (min: {result.mini}, max: {result.maxi})"
+        )
+
+    print(f"rendering {len(jobs)} plots with {args.workers} workers...")
+    start = time.perf_counter()
+    cache = None if args.no_field_cache else FieldCache(directory=args.field_cache_dir)
+    render_plots(jobs, args.workers, report, cache)
+    print(f"done in {time.perf_counter() - start:.1f}s")
+
+    if instrument.ENABLED:
+        print(instrument.summary())
+        if args.profile:
+            instrument.write_report(args.profile)
+        if args.trace:
+            instrument.write_chrome_trace(args.trace)
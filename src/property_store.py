@@ -0,0 +1,150 @@
+"""
+Columnar storage of property values
+
+Each property is one typed array across every entity of a table, and every
+entity keeps a `PropertyView` (the store and its row number) instead of its
+own dict of property value objects
+"""
+
+from array import array
+from collections.abc import Mapping
+from typing import Any, Callable, Iterator
+
+# Property type -> array typecode, other types are kept in lists
+TYPECODES = {"integer": "q", "float": "d", "boolean": "b"}
+
+
+class PropertyColumn:
+    """
+    Values of one property by row. Rows past the end are missing
+    """
+
+    __slots__ = ("type", "values", "present")
+
+    def __init__(self, type: str):
+        self.type = type
+        self.values: array[Any] | list[Any] = (
+            array(TYPECODES[type]) if type in TYPECODES else []
+        )
+        self.present = bytearray()
+
+    def set(self, row: int, value: Any):
+        if len(self.present) <= row:
+            missing = row + 1 - len(self.present)
+            self.present.extend(bytes(missing))
+            self.values.extend([0] * missing if isinstance(self.values, array) else [None] * missing)  # type: ignore
+
+        try:
+            if isinstance(self.values, array) and isinstance(value, str):
+                raise TypeError
+            self.values[row] = value
+        except (TypeError, OverflowError):
+            # The data does not match the property type, keep the values as they are
+            self.values = self.get_all()
+            self.values[row] = value
+        self.present[row] = 1
+
+    def has(self, row: int) -> bool:
+        return row < len(self.present) and self.present[row] == 1
+
+    def get(self, row: int) -> Any:
+        value = self.values[row]
+        if self.type == "boolean" and isinstance(self.values, array):
+            return bool(value)
+        return value
+
+    def get_all(self) -> list[Any]:
+        return [self.get(row) for row in range(len(self.values))]
+
+
+class PropertyStore:
+    """
+    Property values of one table. `types` gives the type of a property id and
+    `factory(property, value)` builds the value objects handed out by views
+    """
+
+    def __init__(self, types: Callable[[str], str], factory: Callable[[str, Any], Any]):
+        self.types = types
+        self.factory = factory
+        self.columns: dict[str, PropertyColumn] = {}
+        # entity id -> row
+        self.rows: dict[str, int] = {}
+        # Bumped whenever the values of an existing row are set again
+        self.version = 0
+
+    def add(self, id: str, values: list[dict[str, Any]]) -> "PropertyView":
+        """
+        Stores the `propertyValues` records of entity `id`. Adding an entity
+        again (like a lazy database rebuilding it) reuses its row
+        """
+        row = self.rows.setdefault(id, len(self.rows))
+        if row < len(self.rows) - 1 or any(c.has(row) for c in self.columns.values()):
+            # Set again, drop the previous values
+            self.version += 1
+            for column in self.columns.values():
+                if column.has(row):
+                    column.present[row] = 0
+        for value in values:
+            property = value["property"]
+            if property not in self.columns:
+                self.columns[property] = PropertyColumn(self.types(property))
+            self.columns[property].set(row, value["value"])
+        return PropertyView(self, row)
+
+    def column(self, property: str) -> tuple[list[Any], list[bool]]:
+        """
+        Values and presence of `property` for every row
+        """
+        column = self.columns.get(property)
+        rows = len(self.rows)
+        if column is None:
+            return [None] * rows, [False] * rows
+        values = column.get_all() + [None] * (rows - len(column.values))
+        present = [column.has(row) for row in range(rows)]
+        return values, present
+
+
+class PropertyView(Mapping[str, Any]):
+    """
+    Property values of one entity, with the same read API as `db.EntryList`.
+    Iterates in the order the store first saw each property
+    """
+
+    __slots__ = ("store", "row")
+
+    def __init__(self, store: PropertyStore, row: int):
+        self.store = store
+        self.row = row
+
+    def __getitem__(self, property: str) -> Any:
+        column = self.store.columns.get(property)
+        if column is None or not column.has(self.row):
+            raise KeyError(property)
+        return self.store.factory(property, column.get(self.row))
+
+    def __iter__(self) -> Iterator[str]:
+        for property, column in self.store.columns.items():
+            if column.has(self.row):
+                yield property
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    @property
+    def version(self) -> int:
+        return self.store.version
+
+    def by(self, property: str, value: Any):
+        for item in self.values():
+            if getattr(item, property) == value:
+                return item
+
+    def first(self) -> Any:
+        return next(iter(self.values()), None)
+
+    @property
+    def list(self) -> list[Any]:
+        return list(self.values())
+
+
+__all__ = ["PropertyColumn", "PropertyStore", "PropertyView"]
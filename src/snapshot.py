@@ -0,0 +1,243 @@
+"""
+Binary snapshot of a data folder, so `db.load` does not have to decode JSON
+on every start
+
+Layout:
+    magic (8 bytes) | index length (8 bytes, little endian) | index | tables
+
+The index is a pickle holding the fingerprint of every source file and the
+offset and length of every table. Each table is its own protocol 5 pickle
+with interned strings, so it is only decoded when it is first used
+"""
+
+import hashlib
+import mmap
+import os
+import pickle
+import sys
+from collections.abc import Mapping
+from typing import Any, Iterable, Iterator
+
+from loader import data_files, load_files
+
+Js = dict[str, Any]
+
+MAGIC = b"JEASNAP1"
+
+# size, mtime in ns, sha1
+Fingerprint = tuple[int, int, str]
+
+
+def sha1_file(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_files(folder: str, exclude: str | None = None) -> list[str]:
+    """
+    Files of `folder` that end up in the snapshot
+    """
+    exclude = os.path.abspath(exclude) if exclude is not None else None
+    return sorted(
+        filename
+        for filename in data_files(folder)
+        if os.path.abspath(os.path.join(folder, filename)) != exclude
+    )
+
+
+def fingerprint(path: str) -> Fingerprint:
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns, sha1_file(path)
+
+
+def intern(value: Any) -> Any:
+    """
+    Interns every string in a JSON value. Repeated strings (keys, property ids)
+    then share one object and are written once per table
+    """
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, dict):
+        return {sys.intern(k): intern(v) for k, v in value.items()}  # type: ignore
+    if isinstance(value, list):
+        return [intern(v) for v in value]  # type: ignore
+    return value
+
+
+def compile_snapshot(folder: str, path: str) -> None:
+    """
+    Writes the snapshot of every file in `folder` to `path`
+    """
+    filenames = source_files(folder, exclude=path)
+    # Before reading, so a file edited meanwhile makes the snapshot stale
+    sources = {
+        filename: fingerprint(os.path.join(folder, filename)) for filename in filenames
+    }
+    data = load_files(folder)
+
+    blobs = {
+        name: pickle.dumps(intern(value), protocol=5) for name, value in data.items()
+    }
+
+    tables: dict[str, tuple[int, int]] = {}
+    offset = 0
+    for name, blob in blobs.items():
+        tables[name] = (offset, len(blob))
+        offset += len(blob)
+
+    write_snapshot(path, sources, tables, blobs.values())
+
+
+def write_snapshot(
+    path: str,
+    sources: dict[str, Fingerprint],
+    tables: dict[str, tuple[int, int]],
+    blobs: Iterable[bytes],
+) -> None:
+    index = pickle.dumps({"sources": sources, "tables": tables}, protocol=5)
+
+    # Written under a temporary name so readers never see half a snapshot
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as file:
+        file.write(MAGIC)
+        file.write(len(index).to_bytes(8, "little"))
+        file.write(index)
+        for blob in blobs:
+            file.write(blob)
+    os.replace(tmp, path)
+
+
+class Snapshot(Mapping[str, list[Js]]):
+    """
+    Read-only view of a snapshot, maps the same names as `loader.load_files`.
+    Tables are unpickled from a memory map on first access, until `close`
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.mmap[: len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a snapshot")
+
+        start = len(MAGIC) + 8
+        length = int.from_bytes(self.mmap[len(MAGIC) : start], "little")
+        index = pickle.loads(self.mmap[start : start + length])
+        self.sources: dict[str, Fingerprint] = index["sources"]
+        self.tables: dict[str, tuple[int, int]] = index["tables"]
+        self.data_start = start + length
+        self.loaded: dict[str, list[Js]] = {}
+        # Files whose stats changed but not their content, see `is_fresh`
+        self.touched: dict[str, Fingerprint] = {}
+
+    def close(self):
+        """
+        Unmaps the file. Tables loaded so far stay available
+        """
+        self.mmap.close()
+
+    def __getitem__(self, name: str) -> list[Js]:
+        if name not in self.loaded:
+            offset, length = self.tables[name]
+            offset += self.data_start
+            self.loaded[name] = pickle.loads(
+                memoryview(self.mmap)[offset : offset + length]
+            )
+        return self.loaded[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.tables)
+
+    def __len__(self) -> int:
+        return len(self.tables)
+
+    def is_fresh(self, folder: str) -> bool:
+        """
+        Whether the snapshot still matches the files in `folder`.
+        Files whose size or mtime changed are compared by hash, the ones that
+        still match are kept in `touched` with their new fingerprint
+        """
+        filenames = source_files(folder, exclude=self.path)
+        if filenames != sorted(self.sources):
+            return False
+
+        for filename in filenames:
+            path = os.path.join(folder, filename)
+            size, mtime, sha1 = self.sources[filename]
+            stat = os.stat(path)
+            if (stat.st_size, stat.st_mtime_ns) == (size, mtime):
+                continue
+            if stat.st_size != size or sha1_file(path) != sha1:
+                return False
+            self.touched[filename] = (stat.st_size, stat.st_mtime_ns, sha1)
+
+        return True
+
+    def refresh(self) -> "Snapshot":
+        """
+        The snapshot with the fingerprints of `touched` files updated, so
+        they are not hashed again on the next start. Closes this one
+        """
+        if not self.touched:
+            return self
+        sources = {**self.sources, **self.touched}
+        data = self.mmap[self.data_start :]
+        self.close()
+        write_snapshot(self.path, sources, self.tables, [data])
+        return Snapshot(self.path)
+
+
+def open_snapshot(folder: str, path: str) -> Snapshot:
+    """
+    Opens the snapshot of `folder` at `path`, (re)building it first when it is
+    missing or out of date
+    """
+    if os.path.exists(path):
+        try:
+            snapshot = Snapshot(path)
+            if snapshot.is_fresh(folder):
+                return snapshot.refresh()
+            snapshot.close()
+        except (ValueError, pickle.UnpicklingError):
+            pass
+
+    compile_snapshot(folder, path)
+    return Snapshot(path)
+
+
+if __name__ == "__main__":
+    import subprocess
+    import tempfile
+
+    folder = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else "data")
+    path = os.path.join(tempfile.mkdtemp(), "data.snapshot")
+    src = os.path.dirname(os.path.abspath(__file__))
+
+    def cold_start(snapshot: str | None) -> float:
+        # A fresh interpreter every time, so nothing is warm
+        code = (
+            "import time; start = time.perf_counter(); from db import load; "
+            f"load({folder!r}, snapshot={snapshot!r}); "
+            "print(time.perf_counter() - start)"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", code], cwd=src, capture_output=True, check=True
+        )
+        return float(out.stdout)
+
+    compile_snapshot(folder, path)
+    print(f"snapshot: {os.path.getsize(path) / 1024:.0f} KiB")
+
+    runs = 5
+    json_time = min(cold_start(None) for _ in range(runs))
+    snapshot_time = min(cold_start(path) for _ in range(runs))
+    print(f"cold start from JSON:     {json_time * 1000:.1f}ms")
+    print(f"cold start from snapshot: {snapshot_time * 1000:.1f}ms")
+    print(f"speedup: {json_time / snapshot_time:.2f}x")
+
+__all__ = ["Snapshot", "compile_snapshot", "open_snapshot"]
@@ -0,0 +1,299 @@
+"""
+Inverse design: find `Turbojet` parameters that give target outputs
+
+Instead of reading a rendered heatmap by eye, pick the outputs (like thrust)
+and the parameters that may change (with bounds), and solve whole batches of
+targets at once
+"""
+
+from types import SimpleNamespace
+from typing import Any
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from jet_engine import OUTPUTS, PARAMETERS, Turbojet
+
+
+class Solution(SimpleNamespace):
+    """
+    `parameters` maps every free parameter to an array of the batch shape,
+    NaN where no solution was found. `converged` tells which targets were met
+    and `residuals` maps every target output to `output - target`
+    """
+
+    parameters: dict[str, np.ndarray]
+    converged: np.ndarray
+    residuals: dict[str, np.ndarray]
+    iterations: int
+
+
+def evaluate(
+    engine: Turbojet,
+    outputs: list[str],
+    free: dict[str, np.ndarray],
+    temperature: ArrayLike,
+    velocity: ArrayLike,
+) -> np.ndarray:
+    """
+    Outputs of `engine` with the free parameters replaced, stacked on the
+    last axis
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        info = engine.calculate_grid(temperature, velocity, **free)
+    return np.stack([getattr(info, name) for name in outputs], axis=-1)
+
+
+def solve(
+    engine: Turbojet,
+    targets: dict[str, ArrayLike],
+    free: dict[str, tuple[float, float]],
+    temperature: ArrayLike = 273 - 33,
+    velocity: ArrayLike = 200,
+    tolerance: float = 1e-10,
+    max_iterations: int = 100,
+    samples: int = 64,
+) -> Solution:
+    """
+    Finds values of the `free` parameters, within their (low, high) bounds, for
+    which the outputs of `engine` equal `targets`. Parameters that are not free
+    keep the values of `engine`.
+
+    Targets are arrays that broadcast together, every element is solved
+    separately. There must be as many free parameters as targets.
+    `tolerance` is relative to each target.
+
+    One parameter is bracketed by sampling its range and refined with
+    Illinois (safeguarded secant) steps, taking the lowest root in range.
+    Several parameters start from the best few points of a coarse grid and
+    take damped Newton steps kept inside the bounds
+    """
+    outputs = list(targets)
+    names = list(free)
+    unknown = (set(outputs) - set(OUTPUTS)) | (set(names) - set(PARAMETERS))
+    if unknown:
+        raise ValueError(f"Unknown outputs or parameters: {', '.join(sorted(unknown))}")
+    if len(outputs) != len(names):
+        raise ValueError(
+            f"Need as many free parameters as targets, got {len(names)} and {len(outputs)}"
+        )
+
+    target = np.stack(
+        np.broadcast_arrays(*(np.asarray(targets[o], dtype=float) for o in outputs)),
+        axis=-1,
+    )
+    shape = np.broadcast_shapes(
+        target.shape[:-1], np.shape(temperature), np.shape(velocity)
+    )
+    target = np.broadcast_to(target, shape + target.shape[-1:])
+    scale = np.maximum(np.abs(target), 1e-300)
+    low = np.array([free[name][0] for name in names], dtype=float)
+    high = np.array([free[name][1] for name in names], dtype=float)
+
+    def residual(x: np.ndarray, expand: bool = False, derivatives: bool = False) -> Any:
+        """
+        Relative residual at x of shape batch + (samples...,) + (n,).
+        With `derivatives`, also its Jacobian by x
+        """
+        t, v = np.asarray(temperature), np.asarray(velocity)
+        goal, size = target, scale
+        if expand:
+            # x has an extra sample axis before the last one
+            t, v = t[..., None], v[..., None]
+            goal, size = target[..., None, :], scale[..., None, :]
+        parameters = {name: x[..., i] for i, name in enumerate(names)}
+        if not derivatives:
+            return (evaluate(engine, outputs, parameters, t, v) - goal) / size
+
+        info, d = engine.jacobian(t, v, wrt=tuple(names), **parameters)
+        value = np.stack([getattr(info, o) for o in outputs], axis=-1)
+        jacobian = np.stack(
+            [np.stack([getattr(d, o)[name] for name in names], -1) for o in outputs],
+            axis=-2,
+        )
+        return (value - goal) / size, jacobian / size[..., None]
+
+    if len(names) == 1:
+        x, iterations = _solve_bracketed(
+            residual,
+            low[0],
+            high[0],
+            shape,
+            samples,
+            tolerance,
+            max_iterations,
+        )
+    else:
+        x, iterations = _solve_newton(
+            residual, low, high, shape, tolerance, max_iterations
+        )
+
+    r = residual(np.where(np.isnan(x), (low + high) / 2, x))
+    converged = np.all(np.abs(r) <= tolerance, axis=-1) & ~np.any(np.isnan(x), axis=-1)
+    x = np.where(converged[..., None], x, np.nan)
+
+    return Solution(
+        parameters={name: x[..., i] for i, name in enumerate(names)},
+        converged=converged,
+        residuals={o: r[..., i] * scale[..., i] for i, o in enumerate(outputs)},
+        iterations=iterations,
+    )
+
+
+def _solve_bracketed(
+    residual: Any,
+    low: float,
+    high: float,
+    shape: tuple[int, ...],
+    samples: int,
+    tolerance: float,
+    max_iterations: int,
+) -> tuple[np.ndarray, int]:
+    # Sample the range for every target at once and keep the first sign change
+    grid = np.broadcast_to(np.linspace(low, high, samples), shape + (samples,))
+    r = residual(grid[..., None], expand=True)[..., 0]
+    with np.errstate(invalid="ignore"):
+        change = r[..., :-1] * r[..., 1:] <= 0
+    found = change.any(axis=-1)
+    first = np.argmax(change, axis=-1)[..., None]
+
+    a = np.take_along_axis(grid, first, -1)[..., 0]
+    b = np.take_along_axis(grid, first + 1, -1)[..., 0]
+    fa = np.take_along_axis(r, first, -1)[..., 0]
+    fb = np.take_along_axis(r, first + 1, -1)[..., 0]
+
+    done = ~found | (np.abs(fb) <= tolerance)
+    iterations = 0
+    while not done.all() and iterations < max_iterations:
+        iterations += 1
+        with np.errstate(invalid="ignore", divide="ignore"):
+            c = b - fb * (b - a) / (fb - fa)
+        # Fall back to bisection when the secant leaves the bracket
+        bad = ~np.isfinite(c) | (c <= np.minimum(a, b)) | (c >= np.maximum(a, b))
+        c = np.where(bad, (a + b) / 2, c)
+        fc = residual(c[..., None])[..., 0]
+
+        # Illinois: keep the bracket, halve the stale end point
+        crossed = fc * fb < 0
+        a = np.where(done, a, np.where(crossed, b, a))
+        fa = np.where(done, fa, np.where(crossed, fb, fa / 2))
+        b = np.where(done, b, c)
+        fb = np.where(done, fb, fc)
+        done |= (np.abs(fb) <= tolerance) | (a == b)
+
+    return np.where(found, b, np.nan)[..., None], iterations
+
+
+def _solve_newton(
+    residual: Any,
+    low: np.ndarray,
+    high: np.ndarray,
+    shape: tuple[int, ...],
+    tolerance: float,
+    max_iterations: int,
+    samples: int = 17,
+    starts: int = 4,
+) -> tuple[np.ndarray, int]:
+    n = len(low)
+
+    def local(x: np.ndarray, derivatives: bool = False) -> Any:
+        # x has a start axis before the last one
+        return residual(x, expand=True, derivatives=derivatives)
+
+    # Start from the best few points of a coarse grid, the residual can have
+    # local minima that are not solutions
+    axes = [np.linspace(lo, hi, samples) for lo, hi in zip(low, high)]
+    grid = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, n)
+    r = local(np.broadcast_to(grid, shape + grid.shape))
+    cost = np.nan_to_num((r**2).sum(-1), nan=np.inf)
+    best = np.argsort(cost, axis=-1)[..., :starts]
+    x = grid[best]
+    f = np.take_along_axis(r, best[..., None], -2)
+    cost = (f**2).sum(-1)
+    shape = x.shape[:-1]
+
+    # Newton steps damped Levenberg-Marquardt style: a step that does not
+    # lower the residual (like one clipped by the bounds) is retried shorter
+    # and closer to steepest descent
+    damping = np.full(shape, 1e-3)
+    iterations = 0
+    for iterations in range(1, max_iterations + 1):
+        # A target is done once any of its starts meets it
+        done = (np.abs(f).max(-1) <= tolerance).any(-1, keepdims=True)
+        if done.all():
+            break
+
+        _, jacobian = local(x, derivatives=True)
+        jt = np.swapaxes(jacobian, -1, -2)
+        normal = jt @ jacobian
+        normal += (
+            damping[..., None, None]
+            * np.eye(n)
+            * np.diagonal(normal, axis1=-2, axis2=-1)[..., None, :]
+        )
+        gradient = (jt @ f[..., None])[..., 0]
+        ok = np.isfinite(normal).all((-1, -2)) & (np.linalg.det(normal) != 0)
+        dx = np.linalg.solve(
+            np.where(ok[..., None, None], normal, np.eye(n)), -gradient[..., None]
+        )[..., 0]
+
+        trial = np.clip(x + np.where(ok[..., None], dx, 0), low, high)
+        f_trial = local(trial)
+        cost_trial = np.nan_to_num((f_trial**2).sum(-1), nan=np.inf)
+        better = (cost_trial < cost) & ~done
+
+        x = np.where(better[..., None], trial, x)
+        f = np.where(better[..., None], f_trial, f)
+        cost = np.where(better, cost_trial, cost)
+        damping = np.clip(np.where(better, damping / 3, damping * 4), 1e-12, 1e12)
+
+    best = np.argmin(cost, axis=-1)[..., None, None]
+    return np.take_along_axis(x, best, -2)[..., 0, :], iterations
+
+
+if __name__ == "__main__":
+    import time
+
+    engine = Turbojet(0.6, 0.4, 50_000, 50_000, 9, 847 + 273, 30_000)
+    targets = np.linspace(20_000, 400_000, 1000)
+
+    start = time.perf_counter()
+    solution = solve(engine, {"thrust": targets}, {"inlet_area": (0.1, 10)})
+    solver_time = time.perf_counter() - start
+
+    # Brute force: evaluate a fine grid (like a heatmap row) and take the closest
+    start = time.perf_counter()
+    grid = np.linspace(0.1, 10, 100_000)
+    thrust = engine.calculate_grid(273 - 33, 200, inlet_area=grid).thrust
+    closest = grid[np.abs(thrust[None, :] - targets[:, None]).argmin(axis=1)]
+    grid_time = time.perf_counter() - start
+
+    def error(inlet_area: np.ndarray) -> float:
+        thrust = engine.calculate_grid(273 - 33, 200, inlet_area=inlet_area).thrust
+        return float(np.max(np.abs(thrust - targets) / targets))
+
+    print("1000 thrust targets, free inlet_area")
+    print(
+        f"  solver:      {solver_time * 1000:7.1f}ms, "
+        f"max relative error {error(solution.parameters['inlet_area']):.1e}"
+    )
+    print(
+        f"  grid search: {grid_time * 1000:7.1f}ms, max relative error {error(closest):.1e}"
+    )
+
+    # Targets reachable by construction: outputs of random designs
+    rng = np.random.default_rng(0)
+    area, ratio = rng.uniform(0.5, 5, 100), rng.uniform(5, 30, 100)
+    info = engine.calculate_grid(273 - 33, 200, inlet_area=area, compresser_ratio=ratio)
+
+    start = time.perf_counter()
+    solution = solve(
+        engine,
+        {"thrust": info.thrust, "heat_flowrate": info.heat_flowrate},
+        {"inlet_area": (0.1, 10), "compresser_ratio": (2, 50)},
+    )
+    print(
+        f"100 thrust + heat_flowrate targets, free inlet_area and compresser_ratio: "
+        f"{(time.perf_counter() - start) * 1000:.1f}ms, "
+        f"{solution.converged.sum()} converged"
+    )
@@ -0,0 +1,267 @@
+"""
+Parallel `Turbojet` sweeps over the full grid of several input axes
+
+The grid is split into chunks of flat indices run in a `ProcessPoolExecutor`.
+Axes and outputs live in `multiprocessing.shared_memory` blocks, so a chunk is
+sent as a few names and numbers and writes its outputs in place. Outputs are
+laid out by grid index, so their order never depends on which chunk finishes
+first
+"""
+
+import math
+import os
+import sys
+import threading
+from concurrent.futures import CancelledError, ProcessPoolExecutor, as_completed
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, NamedTuple
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from jet_engine import INPUTS, OUTPUTS, Info, Turbojet, cycle
+
+
+class SweepChunk(NamedTuple):
+    """
+    Flat grid indices `start` to `stop` of a sweep, small enough to pickle
+    """
+
+    # Shared memory holding the axes one after another, and the outputs
+    inputs: str
+    outputs: str
+    names: tuple[str, ...]
+    lengths: tuple[int, ...]
+    # Inputs that are not swept
+    fixed: tuple[tuple[str, float], ...]
+    output_names: tuple[str, ...]
+    properties: Any
+    # Chunks cover whole sub-grids of the axes from `split` on
+    split: int
+    start: int
+    stop: int
+
+
+def attach(name: str) -> SharedMemory:
+    """
+    Opens shared memory created by another process, without this process
+    taking ownership of it
+    """
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name, track=False)  # type: ignore
+    # Before 3.13 attaching registers the block with the resource tracker, which
+    # shares one registry with the creator and would unlink it too early
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return SharedMemory(name)
+    finally:
+        resource_tracker.register = register
+
+
+def run_chunk(chunk: SweepChunk) -> tuple[int, int]:
+    """
+    Evaluates one chunk into the shared outputs
+    """
+    inputs = attach(chunk.inputs)
+    outputs = attach(chunk.outputs)
+    try:
+        axes = np.ndarray((sum(chunk.lengths),), dtype=float, buffer=inputs.buf)
+        out = np.ndarray(
+            (len(chunk.output_names), math.prod(chunk.lengths)),
+            dtype=float,
+            buffer=outputs.buf,
+        )
+
+        # Leading axes are gathered for the rows of this chunk, the others
+        # broadcast as a sparse grid
+        lengths = chunk.lengths
+        inner = math.prod(lengths[chunk.split :])
+        rows = np.arange(chunk.start // inner, chunk.stop // inner)
+        outer = np.unravel_index(rows, lengths[: chunk.split]) if chunk.split else ()
+        shape = (len(rows),) + lengths[chunk.split :]
+
+        values: dict[str, Any] = dict(chunk.fixed)
+        offset = 0
+        for axis, (name, length) in enumerate(zip(chunk.names, lengths)):
+            array = axes[offset : offset + length]
+            offset += length
+            if axis < chunk.split:
+                values[name] = array[outer[axis]].reshape(
+                    (-1,) + (1,) * (len(shape) - 1)
+                )
+            else:
+                position = axis - chunk.split + 1
+                values[name] = array.reshape(
+                    (1,) * position + (-1,) + (1,) * (len(shape) - position - 1)
+                )
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            info = cycle(*(values[name] for name in INPUTS), chunk.properties)
+        for row, name in enumerate(chunk.output_names):
+            out[row, chunk.start : chunk.stop].reshape(shape)[...] = getattr(info, name)
+
+        # Views must be gone before the memory is closed
+        del axes, out
+    finally:
+        inputs.close()
+        outputs.close()
+    return chunk.start, chunk.stop
+
+
+def sweep(
+    engine: Turbojet,
+    axes: dict[str, ArrayLike],
+    temperature: float = 273 - 33,
+    velocity: float = 200,
+    outputs: tuple[str, ...] = OUTPUTS,
+    workers: int | None = None,
+    chunk_size: int = 1 << 16,
+    on_progress: Callable[[int, int], None] | None = None,
+    cancel: threading.Event | None = None,
+) -> Info:
+    """
+    `engine` over every combination of the 1-D `axes`, which map constructor
+    parameters, "temperature" or "velocity" to values. Inputs that are not
+    swept keep the values of `engine` and the given flight condition.
+
+    Every requested output is an array of shape `(len(axis) for axis in axes)`,
+    the same values as `calculate_grid` on the broadcast axes.
+
+    `workers` defaults to every CPU, 1 runs in this process.
+    `on_progress(done, total)` is called with grid points as chunks finish.
+    Setting `cancel` stops the sweep with `CancelledError`
+    """
+    unknown = (set(axes) - set(INPUTS)) | (set(outputs) - set(OUTPUTS))
+    if unknown:
+        raise TypeError(f"Unknown inputs or outputs: {', '.join(sorted(unknown))}")
+
+    names = tuple(axes)
+    arrays = [np.ravel(np.asarray(axes[name], dtype=float)) for name in names]
+    lengths = tuple(len(array) for array in arrays)
+    total = math.prod(lengths)
+
+    fixed = {name: float(getattr(engine, name)) for name in INPUTS[:-2]}
+    fixed.update(temperature=float(temperature), velocity=float(velocity))
+    for name in names:
+        del fixed[name]
+
+    # Empty blocks are not allowed
+    inputs = SharedMemory(create=True, size=max(8, 8 * sum(lengths)))
+    results = SharedMemory(create=True, size=max(8, 8 * len(outputs) * total))
+    try:
+        if arrays:
+            shared = np.ndarray((sum(lengths),), dtype=float, buffer=inputs.buf)
+            shared[:] = np.concatenate(arrays)
+            del shared
+
+        # Split after as few leading axes as keep a sub-grid within chunk_size
+        split = next(
+            (
+                i
+                for i in range(len(lengths) + 1)
+                if math.prod(lengths[i:]) <= chunk_size
+            ),
+            len(lengths),
+        )
+        inner = math.prod(lengths[split:])
+        step = max(1, chunk_size // inner) * inner
+
+        chunks = [
+            SweepChunk(
+                inputs.name,
+                results.name,
+                names,
+                lengths,
+                tuple(fixed.items()),
+                tuple(outputs),
+                engine.properties,
+                split,
+                start,
+                min(start + step, total),
+            )
+            for start in range(0, total, step)
+        ]
+        _run(chunks, workers, total, on_progress, cancel)
+
+        out = np.ndarray((len(outputs), total), dtype=float, buffer=results.buf)
+        info = Info(
+            **{name: out[i].reshape(lengths).copy() for i, name in enumerate(outputs)}
+        )
+        del out
+        return info
+    finally:
+        for memory in (inputs, results):
+            memory.close()
+            memory.unlink()
+
+
+def _run(
+    chunks: list[SweepChunk],
+    workers: int | None,
+    total: int,
+    on_progress: Callable[[int, int], None] | None,
+    cancel: threading.Event | None,
+):
+    done = 0
+
+    def finished(start: int, stop: int):
+        nonlocal done
+        done += stop - start
+        if on_progress is not None:
+            on_progress(done, total)
+
+    if workers == 1:
+        for chunk in chunks:
+            if cancel is not None and cancel.is_set():
+                raise CancelledError
+            finished(*run_chunk(chunk))
+        return
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [executor.submit(run_chunk, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            if cancel is not None and cancel.is_set():
+                raise CancelledError
+            finished(*future.result())
+    finally:
+        # Waits for running chunks, they write into memory that is about to go
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    import time
+
+    engine = Turbojet(0.6, 0.4, 50_000, 50_000, 9, 847 + 273, 30_000)
+    axes = {
+        "inlet_area": np.linspace(0.1, 10, 24),
+        "exit_area": np.linspace(0.1, 5, 16),
+        "compresser_ratio": np.linspace(2, 50, 20),
+        "inlet_temperature": np.linspace(900, 1400, 16),
+        "velocity": np.linspace(50, 300, 25),
+    }
+    points = math.prod(len(axis) for axis in axes.values())
+    cpus = os.cpu_count() or 1
+    print(f"{points} points, {cpus} CPUs")
+
+    # Reference: one vectorized call in this process
+    start = time.perf_counter()
+    grid = np.meshgrid(*axes.values(), indexing="ij", sparse=True)
+    reference = engine.calculate_grid(273 - 33, **dict(zip(axes, grid)))
+    single = time.perf_counter() - start
+    print(f"  calculate_grid: {single * 1000:8.0f}ms")
+
+    for workers in sorted({1, 2, 4, cpus}):
+        start = time.perf_counter()
+        result = sweep(engine, axes, workers=workers)
+        seconds = time.perf_counter() - start
+        assert all(
+            np.array_equal(getattr(result, name), getattr(reference, name), True)
+            for name in OUTPUTS
+        )
+        print(
+            f"  {workers} workers:     {seconds * 1000:8.0f}ms, "
+            f"scaling efficiency {single / seconds / workers:.0%}"
+        )
@@ -0,0 +1,234 @@
+"""
+Tiled rendering of large images into memory-mapped rasters
+
+A raster is an RGBA array mapped from a file, so the pixels of a huge canvas
+stay on disk and only the tiles being worked on are in memory. `render` fills
+tiles from a function, a few at a time in threads. A raster kept at a path
+remembers the key (and a summary) of every tile it holds, so rendering into it
+again only redoes the tiles whose key changed
+"""
+
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Any, Callable, NamedTuple
+
+import numpy as np
+from PIL import Image
+
+from instrument import count, span
+
+TILE_SIZE = 256
+
+
+class Tile(NamedTuple):
+    """
+    `height` rows from `top` and `width` columns from `left` of a raster
+    """
+
+    top: int
+    left: int
+    height: int
+    width: int
+
+    @property
+    def rows(self) -> slice:
+        return slice(self.top, self.top + self.height)
+
+    @property
+    def cols(self) -> slice:
+        return slice(self.left, self.left + self.width)
+
+    @property
+    def name(self) -> str:
+        return f"{self.top},{self.left},{self.height},{self.width}"
+
+
+class Tiling(NamedTuple):
+    """
+    Render in tiles of `size` pixels square, `workers` at a time.
+    With `directory`, backgrounds are kept there between renders
+    """
+
+    size: int = TILE_SIZE
+    workers: int = 1
+    directory: str | None = None
+
+
+def split(top: int, left: int, height: int, width: int, size: int) -> list[Tile]:
+    """
+    Tiles of at most `size` square covering a rectangle, row by row
+    """
+    return [
+        Tile(r, c, min(size, top + height - r), min(size, left + width - c))
+        for r in range(top, top + height, size)
+        for c in range(left, left + width, size)
+    ]
+
+
+def to_image(pixels: np.ndarray) -> Image.Image:
+    """
+    RGBA image sharing the memory of `pixels` when it is contiguous
+    """
+    pixels = np.ascontiguousarray(pixels)
+    height, width, _ = pixels.shape
+    return Image.frombuffer("RGBA", (width, height), pixels, "raw", "RGBA", 0, 1)
+
+
+class Raster:
+    """
+    White RGBA raster of `height` by `width` pixels mapped from a file.
+
+    With `path`, it is the `.npy` file there, reused with the keys and
+    summaries of its tiles (in `path + ".json"`) if it already has this size.
+    Otherwise the file is temporary and removed once the raster is closed and
+    its pixels no longer used
+    """
+
+    def __init__(self, height: int, width: int, path: str | None = None):
+        self.path = path
+        self.file: IO[bytes] | None = None
+        # Tile name -> key of its inputs / summary of its values, see `render`
+        self.keys: dict[str, str] = {}
+        self.summaries: dict[str, Any] = {}
+        shape = (height, width, 4)
+
+        if path is not None and os.path.exists(path) and os.path.exists(self.manifest):
+            pixels = np.load(path, mmap_mode="r+")
+            if pixels.shape == shape and pixels.dtype == np.uint8:
+                self.pixels = pixels
+                with open(self.manifest, encoding="utf8") as file:
+                    manifest = json.load(file)
+                self.keys = manifest.get("keys", {})
+                self.summaries = manifest.get("summaries", {})
+                return
+            del pixels
+
+        if path is None:
+            self.file = tempfile.TemporaryFile()
+            self.pixels = np.memmap(self.file, dtype=np.uint8, mode="w+", shape=shape)
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.pixels = np.lib.format.open_memmap(
+                path, mode="w+", dtype=np.uint8, shape=shape
+            )
+            self.save_keys()
+        # A block of rows at a time, so only the pages being filled are dirty
+        for start in range(0, height, TILE_SIZE):
+            self.pixels[start : start + TILE_SIZE] = 255
+
+    @property
+    def manifest(self) -> str:
+        return f"{self.path}.json"
+
+    def save_keys(self):
+        """
+        Writes the pixels and then the keys and summaries of their tiles to disk
+        """
+        if self.path is None:
+            return
+        self.pixels.flush()
+        # Written under a temporary name so readers never see half a file
+        tmp = f"{self.manifest}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf8") as file:
+            json.dump({"keys": self.keys, "summaries": self.summaries}, file)
+        os.replace(tmp, self.manifest)
+
+    def close(self):
+        """
+        Closes the temporary file. The mapping of the pixels (and images of
+        them) stays readable until they are no longer used
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self) -> "Raster":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def image(self) -> Image.Image:
+        """
+        The raster as an image, without copying it into memory
+        """
+        return to_image(self.pixels)
+
+
+def render(
+    raster: Raster,
+    tiles: list[Tile],
+    function: Callable[[Tile], tuple[np.ndarray, Any]],
+    key: Callable[[Tile], str] | None = None,
+    workers: int = 1,
+) -> list[Any]:
+    """
+    `function(tile)` returns the rgb or rgba pixels of a tile and a summary
+    of them (JSON, like the range of the values behind the pixels, or None).
+    The pixels are written into `tiles` of `raster` and the summary is kept
+    with the tile. Up to `workers` tiles are rendered at a time in threads, so
+    `function` must be thread safe.
+
+    With `key(tile)`, identifying everything the pixels of a tile depend on,
+    tiles whose key has not changed since the last render into the raster are
+    skipped.
+
+    Returns the summary of every tile, rendered now or kept from before, None
+    where there is none
+    """
+    keys = {tile: key(tile) for tile in tiles} if key is not None else {}
+    stale = [
+        tile
+        for tile in tiles
+        if key is None or raster.keys.get(tile.name) != keys[tile]
+    ]
+    # Forgotten before they are overwritten, in case rendering is interrupted
+    for tile in stale:
+        raster.keys.pop(tile.name, None)
+        raster.summaries.pop(tile.name, None)
+    raster.save_keys()
+
+    def draw(tile: Tile) -> tuple[Tile, Any]:
+        with span("tiles.render", tile=tile.name):
+            pixels, summary = function(tile)
+            raster.pixels[tile.rows, tile.cols, : pixels.shape[-1]] = pixels
+        return tile, summary
+
+    # The pool starts no thread until something is submitted
+    with ThreadPoolExecutor(workers) as threads:
+        done = map(draw, stale) if workers == 1 else threads.map(draw, stale)
+        for tile, summary in done:
+            if summary is not None:
+                raster.summaries[tile.name] = summary
+            if key is not None:
+                raster.keys[tile.name] = keys[tile]
+
+    count("tiles.rendered", len(stale))
+    count("tiles.reused", len(tiles) - len(stale))
+    raster.save_keys()
+    return [raster.summaries.get(tile.name) for tile in tiles]
+
+
+def composite(
+    background: Raster, overlay: np.ndarray, size: int = TILE_SIZE, workers: int = 1
+) -> Raster:
+    """
+    A temporary raster of `overlay` (an RGBA array of the same size, like a
+    canvas buffer) alpha composited over `background`, tile by tile. The
+    caller closes it
+    """
+    height, width, _ = background.pixels.shape
+    result = Raster(height, width)
+
+    def over(tile: Tile) -> tuple[np.ndarray, None]:
+        under = to_image(background.pixels[tile.rows, tile.cols])
+        above = to_image(overlay[tile.rows, tile.cols])
+        return np.asarray(Image.alpha_composite(under, above)), None
+
+    render(result, split(0, 0, height, width, size), over, workers=workers)
+    return result
+
+
+__all__ = ["Raster", "Tile", "Tiling", "composite", "render", "split"]
@@ -0,0 +1,132 @@
+"""
+Checks of tiled rendering into rasters: tiles are reused while their key holds,
+rendered again when it changes, and temporary rasters close their file.
+Runs with pytest or as a script from src/
+"""
+
+import os
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+from tiles import Raster, Tile, composite, render, split
+
+HEIGHT, WIDTH, SIZE = 70, 90, 32
+
+
+def pattern(tile: Tile, version: int = 0) -> np.ndarray:
+    rows, cols = np.mgrid[tile.rows, tile.cols]
+    return np.stack([rows, cols, (rows * cols + version) % 256], axis=-1).astype(
+        np.uint8
+    )
+
+
+class Renderer:
+    """
+    Renders `pattern` with `versions` of the tiles, recording the tiles drawn
+    """
+
+    def __init__(self):
+        self.versions: dict[str, int] = {}
+        self.drawn: list[str] = []
+
+    def draw(self, tile: Tile) -> tuple[np.ndarray, list[int]]:
+        self.drawn.append(tile.name)
+        version = self.versions.get(tile.name, 0)
+        return pattern(tile, version), [tile.top, version]
+
+    def key(self, tile: Tile) -> str:
+        return str(self.versions.get(tile.name, 0))
+
+
+def expected(tiles: list[Tile], versions: dict[str, int]) -> np.ndarray:
+    pixels = np.full((HEIGHT, WIDTH, 4), 255, dtype=np.uint8)
+    for tile in tiles:
+        pixels[tile.rows, tile.cols, :3] = pattern(tile, versions.get(tile.name, 0))
+    return pixels
+
+
+def test_split_covers_once():
+    tiles = split(3, 5, HEIGHT - 3, WIDTH - 5, SIZE)
+    covered = np.zeros((HEIGHT, WIDTH), dtype=int)
+    for tile in tiles:
+        assert 0 < tile.height <= SIZE and 0 < tile.width <= SIZE
+        covered[tile.rows, tile.cols] += 1
+    assert (covered[3:, 5:] == 1).all() and covered.sum() == (HEIGHT - 3) * (WIDTH - 5)
+
+
+def test_reuse_and_invalidate():
+    tiles = split(0, 0, HEIGHT, WIDTH, SIZE)
+    renderer = Renderer()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "raster.npy")
+        with Raster(HEIGHT, WIDTH, path) as raster:
+            summaries = render(raster, tiles, renderer.draw, renderer.key)
+        assert sorted(renderer.drawn) == sorted(tile.name for tile in tiles)
+        assert summaries == [[tile.top, 0] for tile in tiles]
+
+        # Nothing changed: every tile and its summary comes from the file
+        renderer.drawn.clear()
+        with Raster(HEIGHT, WIDTH, path) as raster:
+            assert render(raster, tiles, renderer.draw, renderer.key) == summaries
+            assert np.array_equal(raster.pixels, expected(tiles, {}))
+        assert renderer.drawn == []
+
+        # Only the tiles whose key changed are rendered again
+        changed = [tiles[1].name, tiles[-1].name]
+        renderer.versions = {name: 7 for name in changed}
+        with Raster(HEIGHT, WIDTH, path) as raster:
+            summaries = render(raster, tiles, renderer.draw, renderer.key, workers=3)
+            assert np.array_equal(raster.pixels, expected(tiles, renderer.versions))
+        assert sorted(renderer.drawn) == sorted(changed)
+        assert summaries == [
+            [tile.top, renderer.versions.get(tile.name, 0)] for tile in tiles
+        ]
+
+        # A raster of another size starts over
+        renderer.drawn.clear()
+        with Raster(HEIGHT + 1, WIDTH, path) as raster:
+            render(
+                raster,
+                split(0, 0, HEIGHT + 1, WIDTH, SIZE),
+                renderer.draw,
+                renderer.key,
+            )
+        assert len(renderer.drawn) == len(split(0, 0, HEIGHT + 1, WIDTH, SIZE))
+
+
+def test_without_key_renders_all():
+    tiles = split(0, 0, HEIGHT, WIDTH, SIZE)
+    renderer = Renderer()
+    with Raster(HEIGHT, WIDTH) as raster:
+        render(raster, tiles, renderer.draw)
+        render(raster, tiles, renderer.draw)
+        assert np.array_equal(raster.pixels, expected(tiles, {}))
+    assert len(renderer.drawn) == 2 * len(tiles)
+
+
+def test_composite_and_close():
+    rng = np.random.default_rng(0)
+    overlay = rng.integers(0, 256, (HEIGHT, WIDTH, 4), dtype=np.uint8)
+    with Raster(HEIGHT, WIDTH) as background:
+        render(background, split(0, 0, HEIGHT, WIDTH, SIZE), Renderer().draw)
+        with composite(background, overlay, SIZE, workers=2) as result:
+            files = [background.file, result.file]
+            image = result.image()
+        under = Image.fromarray(np.array(background.pixels), "RGBA")
+    assert all(file.closed for file in files)
+
+    # The image stays readable once the raster is closed
+    above = Image.fromarray(overlay, "RGBA")
+    assert np.array_equal(
+        np.asarray(image), np.asarray(Image.alpha_composite(under, above))
+    )
+
+
+if __name__ == "__main__":
+    test_split_covers_once()
+    test_reuse_and_invalidate()
+    test_without_key_renders_all()
+    test_composite_and_close()
+    print("tiled rendering checks passed")